@@ -10,6 +10,9 @@ class AmountChecker:
     CHECK_RESULT_BOTH_AMOUNT_OVER = 3
     CHECK_RESULT_MARGIN_TRADING_LIMIT_OVER = 4
 
+    # 信用取引の限度（総資産に対する倍率）
+    MARGIN_TRADING_LIMIT_RATE = 3.3
+
     def __init__(self) -> None:
         """
         空売り・買い注文の総額が総資産を超過しているかのチェッカーを初期化する
@@ -42,7 +45,7 @@ class AmountChecker:
         assets = current_trading_info.assets
 
         # 注文総額と総資産を比較する
-        if short_amount + long_amount >= assets * 3.3:
+        if short_amount + long_amount >= assets * self.MARGIN_TRADING_LIMIT_RATE:
             return self.CHECK_RESULT_MARGIN_TRADING_LIMIT_OVER
 
         if short_amount > assets:
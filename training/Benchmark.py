@@ -0,0 +1,588 @@
+import argparse
+import contextlib
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import StockInfo as si
+import OrderExecution as oe
+import Trading as tr
+import CSVLoader as cl
+import TradingHistoryBinary as thb
+import TradingHistoryStorage as ths
+import UniverseStore as us
+import VectorizedSimulation as vs
+import data_analysis.OutputAnalysis as oa
+import integration.OrdersToTradingView as ottv
+import integration.RktToTradingView as rkttv
+
+# 結果のJSONの形式のバージョン（項目を変更した場合に上げる）
+RESULT_FORMAT_VERSION = 1
+
+# 合成データの規模・計測の回数のデフォルト値
+DEFAULT_PARAMS = {
+    'bars': 5000,           # 1銘柄の株価データの足の数
+    'orders': 1000,         # Trading で行う注文の数
+    'operations': 100,      # 取り消し・メモ・履歴表示を繰り返す回数
+    'sessions': 100,        # CSVLoader で読み込むトレードの数（1トレードは close/open/opcl の3ファイル）
+    'history_rows': 50000,  # 集計・TradingView出力に使うトレード履歴の行数
+    'history_codes': 50,    # 集計・TradingView出力に使うトレード履歴の銘柄数
+    'fills': 100000,        # 楽天証券の注文照合結果の約定の数
+    'repeat': 3,            # 計測の回数
+}
+
+# 前回の結果（基準値）より中央値がこの倍率以上遅い場合は性能の劣化とする
+DEFAULT_REGRESSION_RATIO = 1.2
+
+# 合成データの銘柄コード・開始日
+TRV_CODE = '7203'
+CHG_CODE = '6758'
+START_DATE = dt.date(2001, 1, 1)
+RKT_CODES = [1300 + i for i in range(100)]
+
+# 一括計算のシミュレーションの検証で使う注文の条件（名前, 資産額, 総資産超過を許可するか, 注文ごとのロットサイズ・成立しない注文を含めるか）
+VERIFY_SCENARIOS = [
+    ('large_assets', 1e12, False, False),
+    ('small_assets', 2e5, False, False),
+    ('small_assets_allow_over', 2e5, True, False),
+    ('mixed_orders', 1e7, False, True),
+]
+
+# 起動時間の計測で実行するCLIと、入力待ちになったことを判定するプロンプト
+CLI_PATH = Path(__file__).resolve().parent.joinpath('TradingTraining-CLI.py')
+CLI_COMMAND_PROMPT = '★ コマンド：'
+CLI_REOPEN_PROMPT = '再開したいトレードの番号を入力してください：'
+
+class BenchmarkCase:
+
+    name:str            # ベンチマークの名前
+    unit_count:int      # 1回の計測で処理する件数（1件あたりの時間の算出用）
+    setup:object        # 計測前の準備を行う関数（計測しない）。戻り値は run に渡される
+    run:object          # 計測する関数
+    teardown:object     # 計測後の後始末を行う関数（計測しない）。run の戻り値が渡される
+
+    def __init__(self, name:str, unit_count:int, setup, run, teardown=None) -> None:
+        """
+        1つのベンチマークの定義
+        Args:
+            name (str): ベンチマークの名前
+            unit_count (int): 1回の計測で処理する件数
+            setup (callable): 計測前の準備を行う関数（計測しない）。戻り値は run に渡される
+            run (callable): 計測する関数
+            teardown (callable, optional): 計測後の後始末を行う関数（計測しない）。run の戻り値が渡される. Defaults to None.
+        Returns:
+            None
+        """
+        self.name = name
+        self.unit_count = unit_count
+        self.setup = setup
+        self.run = run
+        self.teardown = teardown
+
+def write_trv_csv(path:Path, bars:int, seed:int=0) -> pd.DatetimeIndex:
+    """
+    TradingView形式の合成の株価データを出力する
+    Args:
+        path (Path): 出力先
+        bars (int): 足の数
+        seed (int, optional): 乱数のシード. Defaults to 0.
+    Returns:
+        pd.DatetimeIndex: 足の日付
+    """
+    dates = pd.bdate_range(START_DATE, periods=bars)
+    df = _build_prices(dates, seed)
+    df.insert(0, 'time', dates.strftime('%Y-%m-%d'))
+    df.to_csv(path, index=False)
+    return dates
+
+def write_chg_txt(path:Path, code:str, bars:int, seed:int=1) -> pd.DatetimeIndex:
+    """
+    チャートギャラリー形式の合成の株価データを出力する
+    Args:
+        path (Path): 出力先
+        code (str): 銘柄コード（1行目の見出しに使う）
+        bars (int): 足の数
+        seed (int, optional): 乱数のシード. Defaults to 1.
+    Returns:
+        pd.DatetimeIndex: 足の日付
+    """
+    dates = pd.bdate_range(START_DATE, periods=bars)
+    df = _build_prices(dates, seed)
+    lines = (dates.strftime('%y/%m/%d') + '\t' + df['open'].map('{:.1f}'.format) + '\t' + df['high'].map('{:.1f}'.format)
+             + '\t' + df['low'].map('{:.1f}'.format) + '\t' + df['close'].map('{:.1f}'.format) + '\t0\t' + df['Volume'].astype(str))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"{code} 合成データ\n")
+        f.write('\n'.join(lines) + '\n')
+    return dates
+
+def write_history_csv(path:Path, rows:int, codes:int, seed:int=2) -> None:
+    """
+    トレード履歴（銘柄可変モードのように複数銘柄が続けて並ぶもの）の合成データを出力する
+    Args:
+        path (Path): 出力先
+        rows (int): 行数
+        codes (int): 銘柄数
+        seed (int, optional): 乱数のシード. Defaults to 2.
+    Returns:
+        None
+    """
+    rng = np.random.default_rng(seed)
+    rows_per_code = max(1, rows // codes)
+    code_numbers = np.arange(rows) // rows_per_code % codes
+    day_offsets = np.arange(rows) % rows_per_code
+    dates = pd.bdate_range(START_DATE, periods=rows_per_code)[day_offsets]
+    short_lots = rng.integers(0, 5, rows)
+    long_lots = rng.integers(0, 5, rows)
+    profits = rng.normal(0, 10000, rows).round(1)
+
+    df = pd.DataFrame({
+        '銘柄コード': pd.Series(code_numbers + 1300).astype(str) + '.T',
+        '取引日付': dates.strftime('%Y-%m-%d'),
+        '株価': rng.uniform(500, 5000, rows).round(1),
+        'ロットサイズ': 100,
+        '売りロット数': short_lots,
+        '売り平均単価': np.where(short_lots > 0, 1000.0, 0.0),
+        '売り損益': profits / 2,
+        '買いロット数': long_lots,
+        '買い平均単価': np.where(long_lots > 0, 1000.0, 0.0),
+        '買い損益': profits / 2,
+        '総資産': 10000000 + np.cumsum(profits),
+        'メモ': np.nan,
+    }, columns=ths.HEADER)
+    df.to_csv(path, index=False, encoding='shift-jis')
+
+def write_rkt_csvs(input_dir:Path, fills:int, seed:int=3) -> None:
+    """
+    楽天証券の注文照合結果（1年ごとのファイル）の合成データを出力する
+    Args:
+        input_dir (Path): 出力先の input フォルダ
+        fills (int): 約定の数
+        seed (int, optional): 乱数のシード. Defaults to 3.
+    Returns:
+        None
+    """
+    rng = np.random.default_rng(seed)
+    years = max(1, fills // 20000)
+    for year in range(START_DATE.year, START_DATE.year + years):
+        count = fills // years
+        order_datetimes = pd.Timestamp(year, 1, 1) + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, count), unit='min')
+        df = pd.DataFrame({
+            '発注/受注日時': order_datetimes.strftime('%Y/%m/%d %H:%M:%S'),
+            'コード': rng.choice(RKT_CODES, count),
+            '売買': rng.choice(['売建', '買建', '買埋', '売埋', '現物買'], count),
+            '約定数量(株/口)': rng.integers(1, 10, count) * 100,
+        })
+        df.to_csv(input_dir.joinpath(f"trading_history_rkt_{year}01_{year}12.csv"), index=False, encoding='utf-8')
+
+def start_cli(cli_args:list, prompt:str=None) -> subprocess.Popen:
+    """
+    CLIを別プロセスで起動し、プロンプトが表示される（入力待ちになる）まで待つ。プロンプトを指定しない場合は終了まで待つ
+    Args:
+        cli_args (list): CLIの引数
+        prompt (str, optional): 入力待ちになったことを判定するプロンプト. Defaults to None.
+    Returns:
+        subprocess.Popen: 起動したプロセス（stop_cli で終了させる）
+    """
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    process = subprocess.Popen([sys.executable, str(CLI_PATH)] + cli_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, env=env)
+    if prompt is None:
+        process.communicate()
+        return process
+
+    # 画面出力を読み続け、プロンプトが現れた時点を入力待ちになった時点とする
+    marker = prompt.encode('utf-8')
+    output = b''
+    while marker not in output[-len(marker) * 2:]:
+        chunk = os.read(process.stdout.fileno(), 65536)
+        if len(chunk) == 0:
+            raise RuntimeError(f"CLIがプロンプトを表示せずに終了しました: {' '.join(cli_args)}")
+        output = output + chunk
+    return process
+
+def stop_cli(process:subprocess.Popen) -> None:
+    """
+    start_cli で起動したCLIに exit を入力して終了させる
+    Args:
+        process (subprocess.Popen): 起動したプロセス
+    Returns:
+        None
+    """
+    if process.returncode is None:
+        process.communicate(b'exit\n')
+
+def build_cases(work_dir:Path, params:dict) -> list:
+    """
+    合成データを作成し、ベンチマークの一覧を作成する（カレントディレクトリは work_dir であること）
+    Args:
+        work_dir (Path): 合成データ・トレード履歴の出力先
+        params (dict): 合成データの規模（DEFAULT_PARAMS と同じキー）
+    Returns:
+        list: BenchmarkCase のリスト
+    """
+    for sub_dir in ['input/data/trv', 'input/data/chg', 'output']:
+        work_dir.joinpath(sub_dir).mkdir(parents=True, exist_ok=True)
+
+    dates = write_trv_csv(work_dir.joinpath('input', 'data', 'trv', f"TSE_{TRV_CODE}, 1D.csv"), params['bars'])
+    write_chg_txt(work_dir.joinpath('input', 'data', 'chg', f"TSE_{CHG_CODE}.txt"), CHG_CODE, params['bars'])
+    end_date = dates[-1].date()
+
+    history_csv = work_dir.joinpath('output', 'benchmark_history.csv')
+    write_history_csv(history_csv, params['history_rows'], params['history_codes'])
+    # バイナリファイルは history_csv と別の名前にする（同じ名前だと、csvファイルの計測でもバイナリファイルを読み込むため）
+    history_binary = work_dir.joinpath('output', 'benchmark_history_binary' + thb.FILE_SUFFIX)
+    convert_history_binary = lambda: thb.convert_csv(history_csv, history_binary)
+    write_rkt_csvs(work_dir.joinpath('input'), params['fills'])
+
+    cache_dir = work_dir.joinpath('input', 'cache')
+    load_stock_info = lambda code: si.StockInfo(code, START_DATE, end_date, 'loc')
+    clear_cache = lambda: shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # 全銘柄のストアは、計測後に削除して他の読み込みのベンチマークに影響しないようにする
+    universe_store = us.UniverseStore()
+    remove_universe_store = lambda _: Path(universe_store.store_path).unlink(missing_ok=True)
+
+    # 注文は株価データの先頭から、ロット数を少しずつ変えながら行う
+    orders = min(params['orders'], params['bars'] - 10)
+    rng = np.random.default_rng(4)
+    order_dates = [d.date() for d in dates[1:orders + 1]]
+    order_lots = list(zip(rng.integers(0, 5, orders), rng.integers(0, 5, orders)))
+    stock_info = load_stock_info(TRV_CODE)
+    session_numbers = iter(range(10 ** 6))
+
+    trading_dir = work_dir.joinpath('trading')
+    trading_dir.mkdir(exist_ok=True)
+
+    def new_trading(identifier:str) -> tr.Trading:
+        # 同じファイルに追記しないように、トレードごとに練習開始日時を変える。
+        # 再開の一覧（CSVLoader・CLIの起動時間）に含まれないように、output とは別のフォルダに出力する
+        return tr.Trading(stock_info, f"{20000101000000 + next(session_numbers)}", 1e12, identifier, START_DATE.strftime('%Y%m%d'),
+                          output_dir=trading_dir)
+
+    def run_orders(trading:tr.Trading, order_time:int) -> tr.Trading:
+        for order_date, (short_lot, long_lot) in zip(order_dates, order_lots):
+            trading.one_order(order_date, int(short_lot), int(long_lot), 100, order_time)
+        trading.sync_history_file()
+        return trading
+
+    def run_three_mode_orders(tradings:list) -> None:
+        # CLIと同じく、大引け・翌日寄付・組合せの3方式でまとめて注文する
+        for order_date, (short_lot, long_lot) in zip(order_dates, order_lots):
+            oe.execute_order(*tradings, stock_info, order_date, int(short_lot), int(long_lot), 100, {'Close': -1, 'Open': -1})
+        for trading in tradings:
+            trading.sync_history_file()
+
+    def filled_trading() -> tr.Trading:
+        return run_orders(new_trading('close'), tr.Trading.ORDER_TIME_CLOSE)
+
+    def run_resets(trading:tr.Trading):
+        for _ in range(operations):
+            trading.reset_trading_info(-1)
+        trading.sync_history_file()
+
+    operations = min(params['operations'], orders - 1)
+    memo_dates = [order_dates[i] for i in rng.integers(0, orders, operations)]
+
+    def run_memos(trading:tr.Trading):
+        # メモの書き込みはまとめて保存先に反映されるので、反映するまでを計測する
+        for memo_date in memo_dates:
+            trading.take_memo_by_date(memo_date, 'benchmark')
+        trading.sync_history_file()
+    shared_trading = {}
+
+    def get_shared_trading() -> tr.Trading:
+        # メモ・履歴表示はトレードの状態を変えないので、注文済みのトレードを使い回す
+        if 'trading' not in shared_trading:
+            shared_trading['trading'] = filled_trading()
+        return shared_trading['trading']
+
+    # CSVLoader 用に、トレード履歴をトレードの数だけ複製する
+    loader_csv = get_shared_trading().trading_history_csv
+    loader_manifest = work_dir.joinpath('output', 'trading_history_manifest.json')
+    for i in range(params['sessions']):
+        for mode in ['close', 'open', 'opcl']:
+            shutil.copyfile(loader_csv, work_dir.joinpath(
+                'output', f"trading_history_{stock_info.code}_{START_DATE.strftime('%Y%m%d')}_{20100101000000 + i}_{mode}.csv"))
+    loader_code = stock_info.code
+
+    history_rows = params['history_rows']
+    first_history_code = '1300.T'
+    rkt_start = START_DATE.strftime('%Y%m%d')
+    rkt_end = dt.date(START_DATE.year + max(1, params['fills'] // 20000) - 1, 12, 31).strftime('%Y%m%d')
+
+    return [
+        BenchmarkCase('stock_info_trv_cold', params['bars'], clear_cache, lambda _: load_stock_info(TRV_CODE)),
+        BenchmarkCase('stock_info_trv_warm', params['bars'], lambda: load_stock_info(TRV_CODE), lambda _: load_stock_info(TRV_CODE)),
+        BenchmarkCase('stock_info_chg_cold', params['bars'], clear_cache, lambda _: load_stock_info(CHG_CODE)),
+        BenchmarkCase('stock_info_chg_warm', params['bars'], lambda: load_stock_info(CHG_CODE), lambda _: load_stock_info(CHG_CODE)),
+        BenchmarkCase('universe_store_build', params['bars'] * 2, lambda: None, lambda _: universe_store.build(), remove_universe_store),
+        BenchmarkCase('stock_info_universe_store', params['bars'], universe_store.build, lambda _: load_stock_info(TRV_CODE),
+                      remove_universe_store),
+        BenchmarkCase('one_order_close', orders, lambda: new_trading('close'),
+                      lambda trading: run_orders(trading, tr.Trading.ORDER_TIME_CLOSE)),
+        BenchmarkCase('one_order_next_open', orders, lambda: new_trading('open'),
+                      lambda trading: run_orders(trading, tr.Trading.ORDER_TIME_NEXT_OPEN)),
+        BenchmarkCase('execute_order', orders, lambda: [new_trading(mode) for mode in ['close', 'open', 'opcl']],
+                      run_three_mode_orders),
+        BenchmarkCase('reset_trading_info', operations, filled_trading, run_resets),
+        BenchmarkCase('take_memo_by_date', operations, get_shared_trading, run_memos),
+        BenchmarkCase('show_trading_history', operations, get_shared_trading,
+                      lambda trading: [trading.show_trading_history() for _ in range(operations)]),
+        BenchmarkCase('csv_loader_cold', params['sessions'] * 3, lambda: loader_manifest.unlink(missing_ok=True),
+                      lambda _: cl.CSVLoader(loader_code)),
+        BenchmarkCase('csv_loader_warm', params['sessions'] * 3, lambda: cl.CSVLoader(loader_code),
+                      lambda _: cl.CSVLoader(loader_code)),
+        BenchmarkCase('aggregate_csv', history_rows, lambda: None, lambda _: oa.aggregate_csv(history_csv, False)),
+        BenchmarkCase('extract_trading_history', history_rows, lambda: None,
+                      lambda _: ottv.extract_trading_history(history_csv, first_history_code, '20010101', '20991231')),
+        BenchmarkCase('export_trading_histories', history_rows, lambda: None,
+                      lambda _: ottv.export_trading_histories(history_csv, work_dir.joinpath('output', 'trv_orders'))),
+        BenchmarkCase('history_binary_convert', history_rows, lambda: None, lambda _: convert_history_binary()),
+        BenchmarkCase('aggregate_binary', history_rows, convert_history_binary, lambda _: oa.aggregate_csv(history_binary, False)),
+        BenchmarkCase('export_trading_histories_binary', history_rows, convert_history_binary,
+                      lambda _: ottv.export_trading_histories(history_binary, work_dir.joinpath('output', 'trv_orders'))),
+        BenchmarkCase('rkt_process_trade_history', params['fills'], lambda: None,
+                      lambda _: rkttv.process_trade_history(RKT_CODES[0], rkt_start, rkt_end, base_folder=str(work_dir))),
+        BenchmarkCase('rkt_process_all_trade_histories', params['fills'], lambda: None,
+                      lambda _: rkttv.process_all_trade_histories(rkt_start, rkt_end, base_folder=str(work_dir))),
+        # 起動時間（別プロセスでCLIを起動し、入力待ちになるまで）。トレード履歴のファイルが増えるので最後に計測する
+        BenchmarkCase('cli_startup_help', 1, lambda: None, lambda _: start_cli(['-h'])),
+        BenchmarkCase('cli_startup_first_prompt', 1, lambda: None,
+                      lambda _: start_cli([TRV_CODE, '-s', START_DATE.strftime('%Y%m%d'), '-e', end_date.strftime('%Y%m%d')],
+                                          CLI_COMMAND_PROMPT), stop_cli),
+        BenchmarkCase('cli_startup_reopen_prompt', 1, lambda: None,
+                      lambda _: start_cli([TRV_CODE, '-ro'], CLI_REOPEN_PROMPT), stop_cli),
+    ]
+
+def run_cases(cases:list, repeat:int) -> dict:
+    """
+    ベンチマークを指定回数ずつ計測する。計測中の画面出力は捨てる
+    Args:
+        cases (list): BenchmarkCase のリスト
+        repeat (int): 計測の回数
+    Returns:
+        dict: ベンチマークの名前 → 計測結果（min_sec, median_sec, max_sec, unit_count, per_unit_usec, times_sec）
+    """
+    results = {}
+    with open(os.devnull, 'w') as devnull:
+        for case in cases:
+            times = []
+            for _ in range(repeat):
+                with contextlib.redirect_stdout(devnull):
+                    state = case.setup()
+                    started = time.perf_counter()
+                    result = case.run(state)
+                    times.append(time.perf_counter() - started)
+                    if case.teardown is not None:
+                        case.teardown(result)
+
+            median = statistics.median(times)
+            results[case.name] = {
+                'min_sec': min(times),
+                'median_sec': median,
+                'max_sec': max(times),
+                'unit_count': case.unit_count,
+                'per_unit_usec': median / max(case.unit_count, 1) * 1e6,
+                'times_sec': times,
+            }
+            print(f"{case.name:<34} 中央値 {median * 1000:10.1f}ms  ({results[case.name]['per_unit_usec']:.1f}μs/件)")
+    return results
+
+def compare_with_baseline(benchmark:dict, baseline:dict, regression_ratio:float=DEFAULT_REGRESSION_RATIO) -> list:
+    """
+    計測結果を基準値と比較し、中央値の倍率を表示する
+    Args:
+        benchmark (dict): run_benchmark の結果
+        baseline (dict): 基準値のJSON（run_benchmark の結果と同じ形式）
+        regression_ratio (float, optional): 性能の劣化とする倍率. Defaults to 1.2.
+    Returns:
+        list: 性能が劣化したベンチマークの名前（基準値と合成データの規模が異なる場合は空）
+    """
+    # 合成データの規模が異なる場合は時間を比べられないので、劣化の判定は行わない
+    is_comparable = baseline.get('params') == benchmark['params']
+    if not is_comparable:
+        print('※：基準値と合成データの規模・計測の回数が異なります。倍率は参考値です。')
+
+    regressions = []
+    for name, result in benchmark['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            print(f"{name:<34} 基準値なし")
+            continue
+
+        ratio = result['median_sec'] / base['median_sec'] if base['median_sec'] > 0 else float('inf')
+        mark = ''
+        if is_comparable and ratio >= regression_ratio:
+            mark = ' ← 劣化'
+            regressions.append(name)
+        print(f"{name:<34} {base['median_sec'] * 1000:10.1f}ms → {result['median_sec'] * 1000:10.1f}ms  (x{ratio:.2f}){mark}")
+    return regressions
+
+def run_benchmark(params:dict, names:list=None, work_dir:str=None) -> dict:
+    """
+    合成データを作業フォルダに作成してベンチマークを実行する
+    Args:
+        params (dict): 合成データの規模・計測の回数（DEFAULT_PARAMS と同じキー）
+        names (list, optional): 実行するベンチマークの名前. Defaults to None(全て).
+        work_dir (str, optional): 作業フォルダ. Defaults to None(一時フォルダを作成し、終了後に削除する).
+    Returns:
+        dict: 結果（format_version, created_at, environment, params, results）
+    """
+    with _work_directory(work_dir) as work_path:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            cases = build_cases(work_path, params)
+        if names is not None:
+            cases = [case for case in cases if case.name in names]
+
+        results = run_cases(cases, params['repeat'])
+
+    return {
+        'format_version': RESULT_FORMAT_VERSION,
+        'created_at': dt.datetime.now().isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'params': params,
+        'results': results,
+    }
+
+def verify_simulation(params:dict, work_dir:str=None) -> list:
+    """
+    合成データで、一括計算のシミュレーション（VectorizedSimulation.simulate）の結果が、Trading で1件ずつ実行した結果と一致するかを検証する
+    Args:
+        params (dict): 合成データの規模（DEFAULT_PARAMS と同じキー。bars・orders を使う）
+        work_dir (str, optional): 作業フォルダ. Defaults to None(一時フォルダを作成し、終了後に削除する).
+    Returns:
+        list: 一致しなかった条件の (名前, 内容) のリスト
+    """
+    failures = []
+    with _work_directory(work_dir) as work_path:
+        work_path.joinpath('input', 'data', 'trv').mkdir(parents=True, exist_ok=True)
+        dates = write_trv_csv(work_path.joinpath('input', 'data', 'trv', f"TSE_{TRV_CODE}, 1D.csv"), params['bars'])
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            stock_info = si.StockInfo(TRV_CODE, START_DATE, dates[-1].date(), 'loc')
+
+        orders = min(params['orders'], params['bars'] - 10)
+        rng = np.random.default_rng(5)
+        for name, assets, allow_over_assets, is_mixed in VERIFY_SCENARIOS:
+            # 最後の足は翌日寄付の株価がないので、それより前の日付で注文する
+            trading_dates = dates[np.sort(rng.choice(len(dates) - 1, orders, replace=False))]
+            short_lots = rng.integers(0, 5, orders)
+            long_lots = rng.integers(0, 5, orders)
+            targets = pd.DataFrame({'short_lot': short_lots, 'long_lot': long_lots})
+            if is_mixed:
+                # 注文ごとのロットサイズに加えて、ロット数が負数の注文と、株価データがない日付（金曜日の翌日）の注文も含める
+                targets['lot_size'] = rng.choice([100, 200, 500], orders)
+                targets.loc[rng.random(orders) < 0.05, 'short_lot'] = -1
+                is_no_data = (trading_dates.dayofweek == 4) & (rng.random(orders) < 0.2)
+                trading_dates = trading_dates + pd.to_timedelta(is_no_data.astype(int), unit='D')
+            targets.index = trading_dates
+
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                is_matched, message = vs.verify_with_trading(stock_info, targets, 100, assets, allow_over_assets)
+            print(f"{name:<34} {'一致' if is_matched else '不一致: ' + message}")
+            if not is_matched:
+                failures.append((name, message))
+
+    return failures
+
+@contextlib.contextmanager
+def _work_directory(work_dir:str=None):
+    """
+    作業フォルダに移動する（株価データ・トレード履歴はカレントディレクトリからの相対パスで読み書きされるため）。
+    作業フォルダを指定しない場合は一時フォルダを作成し、終了後に削除する
+    """
+    original_dir = os.getcwd()
+    temp_dir = tempfile.mkdtemp(prefix='stocks_benchmark_') if work_dir is None else None
+    work_path = Path(temp_dir if work_dir is None else work_dir).resolve()
+    work_path.mkdir(parents=True, exist_ok=True)
+
+    try:
+        os.chdir(work_path)
+        yield work_path
+    finally:
+        os.chdir(original_dir)
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _build_prices(dates:pd.DatetimeIndex, seed:int) -> pd.DataFrame:
+    """
+    ランダムウォークの合成の株価（open, high, low, close, Volume）を作成する
+    """
+    rng = np.random.default_rng(seed)
+    close = np.maximum(1000 + np.cumsum(rng.normal(0, 10, len(dates))), 100).round(1)
+    open_ = np.maximum(close + rng.normal(0, 5, len(dates)), 100).round(1)
+    return pd.DataFrame({
+        'open': open_,
+        'high': np.maximum(open_, close) + 5,
+        'low': np.minimum(open_, close) - 5,
+        'close': close,
+        'Volume': rng.integers(1000, 10000, len(dates)),
+    })
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成データでトレード練習の主な処理の実行時間を計測し、JSONで出力します")
+    parser.add_argument('-n', '--bars', type=int, help=f"1銘柄の株価データの足の数。デフォルトは{DEFAULT_PARAMS['bars']}")
+    parser.add_argument('-o', '--orders', type=int, help=f"Trading で行う注文の数。デフォルトは{DEFAULT_PARAMS['orders']}")
+    parser.add_argument('-op', '--operations', type=int, help=f"取り消し・メモ・履歴表示を繰り返す回数。デフォルトは{DEFAULT_PARAMS['operations']}")
+    parser.add_argument('-ss', '--sessions', type=int, help=f"CSVLoader で読み込むトレードの数。デフォルトは{DEFAULT_PARAMS['sessions']}")
+    parser.add_argument('-hr', '--history_rows', type=int, help=f"集計に使うトレード履歴の行数。デフォルトは{DEFAULT_PARAMS['history_rows']}")
+    parser.add_argument('-hc', '--history_codes', type=int, help=f"集計に使うトレード履歴の銘柄数。デフォルトは{DEFAULT_PARAMS['history_codes']}")
+    parser.add_argument('-f', '--fills', type=int, help=f"楽天証券の注文照合結果の約定の数。デフォルトは{DEFAULT_PARAMS['fills']}")
+    parser.add_argument('-r', '--repeat', type=int, help=f"計測の回数。デフォルトは{DEFAULT_PARAMS['repeat']}")
+    parser.add_argument('-k', '--names', help='実行するベンチマークの名前（カンマ区切り）。デフォルトは全て')
+    parser.add_argument('-j', '--json', help='結果のJSONの出力先。デフォルトは output/benchmark_<日時>.json')
+    parser.add_argument('-bl', '--baseline', help='比較する基準値のJSON。デフォルトは output/benchmark_baseline.json（存在する場合）')
+    parser.add_argument('-sb', '--save_baseline', action='store_true', help='結果を基準値として保存する')
+    parser.add_argument('-rr', '--regression_ratio', type=float, help=f"性能の劣化とする中央値の倍率。デフォルトは{DEFAULT_REGRESSION_RATIO}")
+    parser.add_argument('-vf', '--verify', action='store_true', help='計測の前に、一括計算のシミュレーションの結果が Trading で1件ずつ実行した結果と一致するかを合成データで検証する。一致しない場合は計測せずに終了コード1で終了する')
+    args = parser.parse_args()
+
+    params = {key: default if getattr(args, key) is None else getattr(args, key) for key, default in DEFAULT_PARAMS.items()}
+    names = None if args.names is None else [name.strip() for name in args.names.split(',')]
+
+    if args.verify:
+        print('一括計算のシミュレーションを検証します。')
+        if len(verify_simulation(params)) > 0:
+            sys.exit(1)
+
+    benchmark = run_benchmark(params, names)
+
+    output_dir = Path('output')
+    output_dir.mkdir(exist_ok=True)
+    json_path = output_dir.joinpath('benchmark_' + dt.datetime.now().strftime('%Y%m%d%H%M%S') + '.json') \
+        if args.json is None else Path(args.json)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(benchmark, f, ensure_ascii=False, indent=2)
+    print(f"結果を出力しました: {json_path}")
+
+    baseline_path = output_dir.joinpath('benchmark_baseline.json') if args.baseline is None else Path(args.baseline)
+    regressions = []
+    if baseline_path.is_file() and not args.save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"基準値との比較: {baseline_path}（{baseline.get('created_at')}）")
+        regressions = compare_with_baseline(benchmark, baseline,
+            DEFAULT_REGRESSION_RATIO if args.regression_ratio is None else args.regression_ratio)
+
+    if args.save_baseline:
+        shutil.copyfile(json_path, baseline_path)
+        print(f"基準値として保存しました: {baseline_path}")
+
+    # 性能の劣化があった場合は終了コードで知らせる
+    sys.exit(1 if len(regressions) > 0 else 0)
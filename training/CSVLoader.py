@@ -1,7 +1,8 @@
 from pathlib import Path
-import pandas as pd
 
 import ReopenTradingInfo as rti
+import TradingHistoryBinary as thb
+import TradingHistoryManifest as thm
 
 class CSVLoader:
 
@@ -9,7 +10,8 @@ class CSVLoader:
 
     def __init__(self, code:str) -> None:
         """
-        指定した銘柄コードに該当したCSVファイルをロードし、トレード再開の対象を選択させるための情報に変換する
+        指定した銘柄コードに該当したCSVファイルをロードし、トレード再開の対象を選択させるための情報に変換する。
+        CSVファイルがなく、バイナリファイル（.bin）だけがあるトレード履歴も対象にする
         Args:
             code (str): 銘柄コード
         Returns:
@@ -19,24 +21,37 @@ class CSVLoader:
 
         dir_path = Path('output')
         csv_file_list = list(dir_path.glob('trading_history_' + code + '_*.csv'))
+        csv_file_stems = {file.stem for file in csv_file_list}
+        csv_file_list.extend(file for file in dir_path.glob('trading_history_' + code + '_*' + thb.FILE_SUFFIX)
+                             if file.stem not in csv_file_stems)
 
         if len(csv_file_list) == 0:
             return
 
+        # 各ファイルの最後の行の情報はマニフェストから取得する。マニフェストが古いファイルだけ、ファイルの末尾を読み込む
+        manifest = thm.TradingHistoryManifest()
+        manifest_entries = manifest.load()
+        is_manifest_updated = False
+
         for file in csv_file_list:
 
             # print(file.name)
 
             # ファイル名は　trading_history_[銘柄コード]_[株データの開始日]_[トレード練習実施開始日時分秒]_[close/open/opcl].csv　の前提で解析を始める
             file_name_objects = file.stem.split('_')
-            df_csv = pd.read_csv(file, encoding="shift-jis")
-            if len(df_csv) == 0:
+            entry = manifest.get_valid_entry(manifest_entries, file)
+            if entry is None:
+                entry = manifest.build_entry(file)
+                manifest_entries[file.name] = entry
+                is_manifest_updated = True
+
+            last_row = entry['last_row']
+            if last_row is None:
                 continue
 
-            last_row = df_csv.tail(1)   # TODO タイトル行しかないときのチェック
-            last_code = last_row['銘柄コード'].item()
-            last_trading_date = last_row['取引日付'].item().replace('-', '')
-            assets = float(last_row['総資産'].iloc[0])
+            last_code = last_row['code']
+            last_trading_date = last_row['trading_date'].replace('-', '')
+            assets = float(last_row['assets'])
 
             if file_name_objects[2] + file_name_objects[3] + file_name_objects[4] not in self.reopen_trading_items:
                 reopen_trading_info = rti.ReopenTradingInfo(last_code, file_name_objects[3], file_name_objects[4], last_trading_date)
@@ -46,3 +61,6 @@ class CSVLoader:
             else:
                 self.reopen_trading_items[file_name_objects[2] + file_name_objects[3] + file_name_objects[4]].add_file(file_name_objects[5], file)
                 self.reopen_trading_items[file_name_objects[2] + file_name_objects[3] + file_name_objects[4]].add_assets(file_name_objects[5], assets)
+
+        if is_manifest_updated:
+            manifest.save(manifest_entries)
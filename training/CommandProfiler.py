@@ -0,0 +1,223 @@
+import contextlib
+import datetime as dt
+import json
+import re
+import time
+import tracemalloc
+
+# 計測する処理の区分
+PHASE_LOAD = 'load'                         # 株価データの読み込み
+PHASE_ORDER_CLOSE = 'order_close'           # 大引け注文（one_order）
+PHASE_ORDER_NEXT_OPEN = 'order_next_open'   # 翌日寄付注文（one_order）
+PHASE_ORDER_OPCL = 'order_opcl'             # 組合せ注文（one_order）
+PHASE_HISTORY_IO = 'history_io'             # トレード履歴（csvファイル・データベース）の読み書き
+PHASE_RENDER = 'render'                     # 画面表示
+PHASE_OTHER = 'other'                       # 上記以外（コマンドの解析など）
+
+PHASE_NAMES = {
+    PHASE_LOAD: '株価データ読込',
+    PHASE_ORDER_CLOSE: '大引け注文',
+    PHASE_ORDER_NEXT_OPEN: '翌日寄付注文',
+    PHASE_ORDER_OPCL: '組合せ注文',
+    PHASE_HISTORY_IO: '履歴の読み書き',
+    PHASE_RENDER: '画面表示',
+    PHASE_OTHER: 'その他',
+}
+
+class CommandProfiler:
+
+    # 計測を行うか（無効の場合は何も記録しない）
+    enabled:bool
+
+    # コマンドごとの計測結果を1行ずつ追記するJSON Linesファイル。None の場合は出力しない
+    trace_path:str
+
+    # 起動からの集計（処理の区分 → [回数, 合計秒, 最大秒]、コマンドの種類 → [回数, 合計秒, 最大秒]）
+    phase_totals:dict
+    command_totals:dict
+
+    # 直近のコマンドの計測結果
+    last_record:dict
+
+    # 起動からのtracemallocのピーク（バイト）
+    max_peak_bytes:int
+
+    def __init__(self, enabled:bool=False, trace_path:str=None) -> None:
+        """
+        CLIのコマンドごとに、処理の区分ごとの時間とメモリ使用量を計測する。
+        処理の区分は入れ子にでき、内側の区分の時間は外側の区分から除く（区分の時間の合計がコマンドの時間になる）
+        Args:
+            enabled (bool, optional): 計測を行う場合はTrue. Defaults to False.
+            trace_path (str, optional): 計測結果を出力するJSON Linesファイル. Defaults to None(出力しない).
+        Returns:
+            None
+        """
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self.phase_totals = {}
+        self.command_totals = {}
+        self.last_record = None
+        self.max_peak_bytes = 0
+
+        self.__command:str = None
+        self.__command_started:float = 0.0
+        self.__phases:dict = {}
+        self.__phase_stack:list = []
+        self.__trace_file = None
+
+        if self.enabled:
+            # メモリの割り当ての追跡は処理が遅くなるため、計測を行う場合だけ開始する
+            tracemalloc.start()
+            if self.trace_path is not None:
+                self.__trace_file = open(self.trace_path, 'a', encoding='utf-8')
+
+    def begin_command(self, command:str) -> None:
+        """
+        コマンドの計測を開始する
+        Args:
+            command (str): 入力されたコマンド
+        Returns:
+            None
+        """
+        if not self.enabled:
+            return
+
+        self.__command = command
+        self.__phases = {}
+        self.__phase_stack = []
+        tracemalloc.reset_peak()
+        self.__command_started = time.perf_counter()
+
+    def phase(self, name:str):
+        """
+        処理の区分の時間を計測する（with 文で使う）。計測中のコマンドがない場合は何もしない
+        Args:
+            name (str): 処理の区分（PHASE_*）
+        Returns:
+            コンテキストマネージャー
+        """
+        if not self.enabled or self.__command is None:
+            return contextlib.nullcontext()
+        return self.__measure(name)
+
+    def end_command(self, price_data_bytes:int=0) -> dict:
+        """
+        コマンドの計測を終了し、集計とJSON Linesファイルへの出力を行う。計測中のコマンドがない場合は何もしない
+        Args:
+            price_data_bytes (int, optional): 読み込んでいる株価データのメモリ使用量（バイト）. Defaults to 0.
+        Returns:
+            dict: 計測結果。計測中のコマンドがない場合は None
+        """
+        if not self.enabled or self.__command is None:
+            return None
+
+        total = time.perf_counter() - self.__command_started
+        current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+        self.max_peak_bytes = max(self.max_peak_bytes, peak_bytes)
+
+        phases = dict(self.__phases)
+        phases[PHASE_OTHER] = max(total - sum(phases.values()), 0.0)
+        kind = _get_command_kind(self.__command)
+
+        record = {
+            'time': dt.datetime.now().isoformat(timespec='milliseconds'),
+            'command': self.__command,
+            'kind': kind,
+            'total_ms': total * 1000,
+            'phases_ms': {name: seconds * 1000 for name, seconds in phases.items()},
+            'tracemalloc_peak_bytes': peak_bytes,
+            'tracemalloc_current_bytes': current_bytes,
+            'price_data_bytes': price_data_bytes,
+        }
+
+        for name, seconds in phases.items():
+            _add_total(self.phase_totals, name, seconds)
+        _add_total(self.command_totals, kind, total)
+
+        self.last_record = record
+        self.__command = None
+
+        if self.__trace_file is not None:
+            self.__trace_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self.__trace_file.flush()
+
+        return record
+
+    def get_stats_message(self) -> str:
+        """
+        起動からの計測結果の集計を表示用の文字列で取得する（stats コマンド用）
+        Returns:
+            str: 表示用の文字列
+        """
+        if not self.enabled:
+            return 'プロファイルは無効です。起動時に -p を付けると計測します。'
+
+        lines = ['■ コマンドの種類ごと（回数 / 合計 / 平均 / 最大）']
+        for kind, (count, total, maximum) in sorted(self.command_totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {kind:<18}{count:>6}回 {total * 1000:>10.1f}ms {total / count * 1000:>9.2f}ms {maximum * 1000:>9.2f}ms")
+
+        lines.append('■ 処理の区分ごと（回数 / 合計 / 平均 / 最大）')
+        for name, (count, total, maximum) in sorted(self.phase_totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"  {PHASE_NAMES.get(name, name):<12}{count:>6}回 {total * 1000:>10.1f}ms {total / count * 1000:>9.2f}ms {maximum * 1000:>9.2f}ms")
+
+        if self.last_record is not None:
+            breakdown = ', '.join([f"{PHASE_NAMES.get(name, name)} {ms:.2f}ms" for name, ms in self.last_record['phases_ms'].items()])
+            lines.append(f"■ 直前のコマンド：{self.last_record['command']}（{self.last_record['total_ms']:.2f}ms：{breakdown}）")
+            lines.append(f"■ メモリ：直前のコマンドのピーク {_format_bytes(self.last_record['tracemalloc_peak_bytes'])}"
+                         + f"、起動からのピーク {_format_bytes(self.max_peak_bytes)}"
+                         + f"、株価データ {_format_bytes(self.last_record['price_data_bytes'])}")
+
+        if self.trace_path is not None:
+            lines.append(f"■ 計測結果の出力先：{self.trace_path}")
+
+        return '\n'.join(lines)
+
+    def close(self) -> None:
+        """
+        計測を終了し、JSON Linesファイルを閉じる
+        Returns:
+            None
+        """
+        if self.__trace_file is not None:
+            self.__trace_file.close()
+            self.__trace_file = None
+        if self.enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def __measure(self, name:str):
+        # 内側の区分の時間を積み上げる枠を用意し、終了時に外側の区分から除く
+        started = time.perf_counter()
+        self.__phase_stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            inner = self.__phase_stack.pop()
+            self.__phases[name] = self.__phases.get(name, 0.0) + elapsed - inner
+            if len(self.__phase_stack) > 0:
+                self.__phase_stack[-1] = self.__phase_stack[-1] + elapsed
+
+def _get_command_kind(command:str) -> str:
+    """
+    コマンドの種類を取得する（取引は 'order'、それ以外は最初の単語。「=」で設定するコマンドは「=」まで）
+    """
+    if re.match(r'[0-9]', command):
+        return 'order'
+
+    words = command.split()
+    if len(words) == 0:
+        return ''
+    return words[0].split('=')[0] + '=' if '=' in words[0] else words[0]
+
+def _add_total(totals:dict, key:str, seconds:float) -> None:
+    total = totals.get(key)
+    if total is None:
+        totals[key] = [1, seconds, seconds]
+    else:
+        total[0] = total[0] + 1
+        total[1] = total[1] + seconds
+        total[2] = max(total[2], seconds)
+
+def _format_bytes(size:int) -> str:
+    return f"{size / 1024 / 1024:,.1f}MB"
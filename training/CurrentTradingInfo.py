@@ -1,3 +1,4 @@
+import copy
 from datetime import date
 
 import ShortTrading as st
@@ -33,4 +34,15 @@ class CurrentTradingInfoModel:
         self.long_trading = lt.LongTrading()
         self.long_profit = 0
         self.lot_size = lot_size
-        self.assets = 0
\ No newline at end of file
+        self.assets = 0
+
+    def copy(self) -> 'CurrentTradingInfoModel':
+        """
+        取引の情報を複製する（売り・買いのポジション情報も複製し、複製した側の取引が元の情報に影響しないようにする）
+        Returns:
+            CurrentTradingInfoModel: 複製した取引の情報
+        """
+        trading_info = copy.copy(self)
+        trading_info.short_trading = copy.copy(self.short_trading)
+        trading_info.long_trading = copy.copy(self.long_trading)
+        return trading_info
\ No newline at end of file
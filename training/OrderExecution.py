@@ -0,0 +1,166 @@
+import datetime as dt
+import re
+from typing import Tuple
+
+import CommandProfiler as cprf
+import Trading as tr
+import StockInfo as si
+
+def parse_order_command(input_str:str, trading_date_year:str=None) -> Tuple[dict, str]:
+    """
+    取引のコマンド（yyyymmdd <空売りロット数>-<買いロット数> [<大引注文の株価>:<翌日寄付注文の株価>]）を解析する
+    Args:
+        input_str (str): 入力されたコマンド
+        trading_date_year (str, optional): 設定されている取引日付の年。設定されている場合は日付の年の部分を省略できる. Defaults to None.
+    Returns:
+        Tuple[dict, str]: 取引の内容（trading_date, short_lot, long_lot, stock_price）, 入力不正の場合のメッセージ。入力不正の場合、取引の内容は None
+    """
+    # 入力チェック
+    trading_operation = input_str.split()
+    if len(trading_operation) < 2 or len(trading_operation) > 3:
+        return None, '取引情報の入力は不正です。'
+
+    trading_date_str = trading_operation[0] if trading_date_year == None else trading_date_year + trading_operation[0]
+    stock_lots_str = trading_operation[1]
+
+    # 日付の入力チェック（桁数だけ）
+    if not re.compile('[0-9]{8}').search(trading_date_str):
+        return None, '日付のフォーマットは不正です。'
+
+    # ロットの入力チェック
+    stock_lots = stock_lots_str.split('-')
+    if len(stock_lots) != 2:
+        return None, 'ロット数の入力は不正です。'
+
+    trading_date = dt.datetime.strptime(trading_date_str, '%Y%m%d')
+    short_lot = int(stock_lots[0])
+    long_lot = int(stock_lots[1])
+
+    # 日付とロット以外の情報を入力された場合、株価の上書き処理を実施する
+    stock_price:dict = {'Close':-1, 'Open':-1}
+    if len(trading_operation) > 2:
+        stock_price_str = trading_operation[2]
+        stock_price_arr = stock_price_str.split(':')
+
+        if len(stock_price_arr) == 2:
+            try:
+                stock_price['Close'] = float(stock_price_arr[0])
+            except ValueError:
+                pass  # 値を付与しない
+            try:
+                stock_price['Open'] = float(stock_price_arr[1])
+            except ValueError:
+                pass  # 値を付与しない
+        else:
+            return None, '注文株価指定の入力は不正です。'
+
+    return {'trading_date': trading_date, 'short_lot': short_lot, 'long_lot': long_lot, 'stock_price': stock_price}, ''
+
+def execute_order(trading_close:tr.Trading, trading_next_open:tr.Trading, trading_opcl:tr.Trading, stock_info:si.StockInfo,
+                  trading_date:dt.datetime, short_lot:int, long_lot:int, lot_size:int, stock_price:dict, display=None) -> Tuple[bool, str]:
+    """
+    大引け・翌日寄付・組合せの3方式で1回の取引を行う。
+    株価データの検索は1回だけ行い、3方式の注文をすべて検証してから反映する。いずれかの注文が成立しない場合は、どの方式にも反映しない
+    Args:
+        trading_close (Trading): 大引け注文のトレード
+        trading_next_open (Trading): 翌日寄付注文のトレード
+        trading_opcl (Trading): 組合せ注文のトレード
+        stock_info (StockInfo): トレード対象銘柄の情報
+        trading_date (datetime): 取引の日付
+        short_lot (int): 取引後に持っている空売りのロット数
+        long_lot (int): 取引後に持っている買いのロット数
+        lot_size (int): ロットサイズ
+        stock_price (dict): 指定された注文株価（'Close'/'Open'。指定しない場合は負数）
+        display (callable, optional): 注文ごとの結果を表示する関数（引数はTradingと付属のメッセージ）。None の場合は何も表示しない. Defaults to None.
+    Returns:
+        Tuple[bool, str]: 成功した場合はTrue, 失敗した場合のメッセージ
+    """
+    def output(text:str):
+        if display is not None:
+            print(text)
+
+    # プロファイルが有効な場合は、注文ごと・表示の時間を計測する
+    profiler = trading_close.profiler
+
+    # 大引け（取引の日付）と翌日寄付（翌営業日）の株価データの行番号は、3方式で共通なので1回だけ検索する
+    close_position = stock_info.find_bar_position(trading_date)
+    next_open_position = stock_info.find_next_bar_position(trading_date)
+
+    opcl_order_time = get_opcl_order_time(trading_opcl, short_lot, long_lot, lot_size)
+    orders = [
+        # 注文の見出し, トレード, 注文タイミング, 行番号, 注文株価, 計測の区分
+        ('大引け注文', trading_close, trading_close.ORDER_TIME_CLOSE, close_position, stock_price['Close'],
+            cprf.PHASE_ORDER_CLOSE),
+        ('翌日寄付注文', trading_next_open, trading_next_open.ORDER_TIME_NEXT_OPEN, next_open_position, stock_price['Open'],
+            cprf.PHASE_ORDER_NEXT_OPEN),
+        ('組合せ注文', trading_opcl, opcl_order_time,
+            close_position if opcl_order_time == trading_opcl.ORDER_TIME_CLOSE else next_open_position,
+            stock_price['Close'] if opcl_order_time == trading_opcl.ORDER_TIME_CLOSE else stock_price['Open'],
+            cprf.PHASE_ORDER_OPCL),
+    ]
+
+    # 3方式の注文をすべて検証する（トレードの状態とトレード履歴はまだ変更しない）
+    prepared_orders = []
+    for title, trading, order_time, bar_position, order_price, phase in orders:
+        with profiler.phase(phase):
+            result, message, prepared_order = trading.prepare_order(trading_date, short_lot, long_lot, lot_size,
+                order_time, order_price, bar_position)
+
+        if result == 'failure':
+            output(f'■ {title}：')
+            output(message)
+            output(f'Info:{title}に失敗のため、いずれの注文も実行しませんでした。')
+            return False, message
+
+        prepared_orders.append(prepared_order)
+
+    # すべて成立する場合だけ、3方式の状態とトレード履歴に反映する
+    for (title, trading, order_time, bar_position, order_price, phase), prepared_order in zip(orders, prepared_orders):
+        with profiler.phase(phase):
+            trading.commit_order(prepared_order)
+
+    for (title, trading, order_time, bar_position, order_price, phase), prepared_order in zip(orders, prepared_orders):
+        output(f'■ {title}：')
+        if display is not None:
+            with profiler.phase(cprf.PHASE_RENDER):
+                display(trading, prepared_order.message)
+
+    # すべての注文が終わった後に指定された株価でメモリに保存されている株データを上書きする
+    # 株価指定が必要な場合はほとんどデータに誤りがあったため
+    # 今後データ誤り以外、株価指定が必要な場面があったら、この部分の処理を修正する
+    if stock_price['Close'] >= 0:
+        stock_info.set_price(trading_date, 'Close', stock_price['Close'])
+
+    if stock_price['Open'] >= 0:
+        stock_info.set_price(trading_next_open.current_trading_info.trading_date, 'Open', stock_price['Open'])
+
+    return True, ''
+
+def get_opcl_order_time(trading_opcl:tr.Trading, short_lot:int, long_lot:int, lot_size:int) -> int:
+    """
+    組合せ注文（翌日寄付で注文・大引で手仕舞い）の注文タイミングを決める
+    Args:
+        trading_opcl (Trading): 組合せ注文のトレード
+        short_lot (int): 取引後に持っている空売りのロット数
+        long_lot (int): 取引後に持っている買いのロット数
+        lot_size (int): ロットサイズ
+    Returns:
+        int: 注文タイミング（大引け:0、翌日寄付:1）
+    """
+    order_time = trading_opcl.ORDER_TIME_NEXT_OPEN
+    current_short_number = trading_opcl.current_trading_info.short_trading.number_now
+    current_long_number = trading_opcl.current_trading_info.long_trading.number_now
+
+    if short_lot == 0 and long_lot == 0:    # 玉持ちで全部手仕舞った場合
+        order_time = trading_opcl.ORDER_TIME_CLOSE
+    elif ( short_lot == long_lot ):  # スクエアにした場合
+        order_time = trading_opcl.ORDER_TIME_NEXT_OPEN
+    elif ( current_short_number != 0 and current_long_number != 0) \
+        and (short_lot == 0 or long_lot == 0 ):     # 売買の片方を全部手仕舞い、もう片方は維持する場合
+        short_number = short_lot * lot_size
+        long_number = long_lot * lot_size
+        if short_number == current_short_number or long_number == current_long_number:
+            order_time = trading_opcl.ORDER_TIME_NEXT_OPEN
+
+    # 上記以外の場合は初期値にする
+    return order_time
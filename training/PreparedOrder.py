@@ -0,0 +1,23 @@
+import CurrentTradingInfo as cti
+
+# 検証済みで、まだトレードに反映していない1回の取引（Trading.prepare_order で作成し、Trading.commit_order で反映する）
+class PreparedOrder:
+
+    # 取引前のトレードの状態（作成後にトレードの状態が変わっていないかの確認用）
+    base_trading_info:cti.CurrentTradingInfoModel
+
+    # 取引後のトレードの状態
+    trading_info:cti.CurrentTradingInfoModel
+
+    # 売買が発生するか（発生する場合だけトレード履歴に1行追加する）
+    is_traded:bool
+
+    # 総資産超過の警告メッセージ。超過していない場合は空文字列
+    message:str
+
+    def __init__(self, base_trading_info:cti.CurrentTradingInfoModel, trading_info:cti.CurrentTradingInfoModel, is_traded:bool,
+                 message:str) -> None:
+        self.base_trading_info = base_trading_info
+        self.trading_info = trading_info
+        self.is_traded = is_traded
+        self.message = message
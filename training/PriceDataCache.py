@@ -0,0 +1,312 @@
+import hashlib
+import json
+import os
+import re
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+class PriceDataCache:
+
+    # キャッシュの格納先
+    cache_dir:str
+
+    # キャッシュの形式のバージョン。形式を変えた場合は上げて、古いキャッシュを作り直させる
+    CACHE_FORMAT_VERSION = 3
+
+    # キャッシュ対象の列と型
+    COLUMN_DTYPES = {
+        'Open': np.float64,
+        'High': np.float64,
+        'Low': np.float64,
+        'Close': np.float64,
+        'Volume': np.int64,
+    }
+
+    TIME_COLUMN = 'time'
+
+    __META_FILE_NAME = 'meta.json'
+    __COLUMN_FILE_SUFFIX = '.bin'
+
+    def __init__(self, cache_dir:str=None) -> None:
+        """
+        ローカルの株価データ(TradingView/チャートギャラリーのエクスポートファイル)を解析した結果を、
+        列ごとのバイナリファイルとしてキャッシュする。
+        キャッシュはエクスポートファイルのパスと更新時刻・サイズに紐付けて、エクスポートファイルが更新された場合は作り直す。
+        Args:
+            cache_dir (str, optional): キャッシュの格納先. Defaults to 'input/cache'.
+        Returns:
+            None
+        """
+        self.cache_dir = os.path.join('input', 'cache') if cache_dir is None else cache_dir
+
+    def load(self, source_path:str, start_date:date=None, end_date:date=None) -> pd.DataFrame:
+        """
+        エクスポートファイルに対応したキャッシュを読み込む
+        Args:
+            source_path (str): エクスポートファイルのパス
+            start_date (date, optional): 読み込む期間の開始日. Defaults to None(制限なし).
+            end_date (date, optional): 読み込む期間の終了日. Defaults to None(制限なし).
+        Returns:
+            pd.DataFrame: キャッシュから復元した株価データ（time をインデックス）。キャッシュがない、または古い場合は None
+        """
+        entry_dir = self.__get_entry_dir(source_path)
+        meta = self.__read_meta(entry_dir)
+        if not self.__is_valid_meta(source_path, meta):
+            return None
+
+        try:
+            # 解析済みの列をメモリマップで開く（read_csv や to_datetime を通さない）
+            time_values = self.__open_column(entry_dir, self.TIME_COLUMN, np.int64, meta['rows'])
+            columns = {}
+            for column in meta['columns']:
+                columns[column] = self.__open_column(entry_dir, column, self.COLUMN_DTYPES[column], meta['rows'])
+        except (OSError, ValueError):
+            return None
+
+        # 期間が指定された場合は、該当する範囲だけを取り出す
+        rows = slice(0, meta['rows'])
+        if start_date is not None or end_date is not None:
+            min_time = np.iinfo(np.int64).min if start_date is None else self.__to_time_value(start_date)
+            max_time = np.iinfo(np.int64).max if end_date is None else self.__to_time_value(end_date, end_of_day=True)
+            if meta['sorted']:
+                # 時刻順に並んでいる場合は二分探索で範囲を求める
+                row_start = int(np.searchsorted(time_values, min_time, side='left'))
+                row_end = int(np.searchsorted(time_values, max_time, side='right'))
+                rows = slice(row_start, max(row_start, row_end))
+            else:
+                rows = (time_values >= min_time) & (time_values <= max_time)
+
+        index = pd.DatetimeIndex(np.asarray(time_values[rows]).astype('datetime64[ns]'), name=self.TIME_COLUMN)
+
+        # 株価の上書き（データ誤りの修正）ができるように、DataFrameにはコピーして渡す
+        return pd.DataFrame({column: np.array(values[rows]) for column, values in columns.items()}, index=index)
+
+    def create_writer(self, source_path:str):
+        """
+        エクスポートファイルを解析しながら、チャンク単位でキャッシュに書き込むためのライターを作成する
+        Args:
+            source_path (str): エクスポートファイルのパス
+        Returns:
+            PriceDataCacheWriter: キャッシュのライター
+        """
+        return PriceDataCacheWriter(self, source_path, self.__get_entry_dir(source_path))
+
+    def save(self, source_path:str, df:pd.DataFrame) -> None:
+        """
+        解析済みの株価データをキャッシュとして保存する
+        Args:
+            source_path (str): エクスポートファイルのパス
+            df (pd.DataFrame): 解析済みの株価データ（time をインデックス）
+        Returns:
+            None
+        """
+        writer = self.create_writer(source_path)
+        writer.append(df)
+        writer.commit()
+
+    def write_meta(self, source_path:str, entry_dir:str, columns:list, rows:int, is_sorted:bool) -> None:
+        """
+        キャッシュのメタ情報を書き込み、キャッシュを有効にする（ライターから呼び出される）
+        """
+        meta = self.__build_source_meta(source_path)
+        meta['columns'] = list(columns)
+        meta['rows'] = int(rows)
+        meta['sorted'] = bool(is_sorted)
+        with open(os.path.join(entry_dir, self.__META_FILE_NAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def remove_meta(self, entry_dir:str) -> None:
+        """
+        キャッシュのメタ情報を削除し、キャッシュを無効にする（ライターから呼び出される）
+        """
+        meta_path = os.path.join(entry_dir, self.__META_FILE_NAME)
+        if os.path.isfile(meta_path):
+            os.remove(meta_path)
+
+    def get_column_path(self, entry_dir:str, column:str) -> str:
+        """
+        列のバイナリファイルのパスを取得する
+        """
+        return os.path.join(entry_dir, column + self.__COLUMN_FILE_SUFFIX)
+
+    def __open_column(self, entry_dir:str, column:str, dtype, rows:int) -> np.ndarray:
+        """
+        列のバイナリファイルを読み取り専用のメモリマップで開く
+        """
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self.get_column_path(entry_dir, column), dtype=dtype, mode='r', shape=(rows,))
+
+    def __to_time_value(self, target_date:date, end_of_day:bool=False) -> int:
+        """
+        日付をキャッシュの時刻の値（1970-01-01からのナノ秒）に変換する
+        """
+        timestamp = pd.Timestamp(target_date).normalize()
+        if end_of_day:
+            timestamp = timestamp + pd.Timedelta(days=1) - pd.Timedelta(nanoseconds=1)
+        return timestamp.value
+
+    def __get_entry_dir(self, source_path:str) -> str:
+        """
+        エクスポートファイルに対応したキャッシュの格納ディレクトリーを取得する
+        """
+        abs_path = os.path.abspath(source_path)
+        digest = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:16]
+        stem = re.sub(r'[^0-9A-Za-z_.-]', '_', os.path.splitext(os.path.basename(source_path))[0])
+        return os.path.join(self.cache_dir, f'{stem}_{digest}')
+
+    def __build_source_meta(self, source_path:str) -> dict:
+        """
+        キャッシュの有効性を判定するための、エクスポートファイルに関するメタ情報を作成する
+        """
+        stat = os.stat(source_path)
+        return {
+            'version': self.CACHE_FORMAT_VERSION,
+            'source': os.path.abspath(source_path),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+        }
+
+    def __is_valid_meta(self, source_path:str, meta:dict) -> bool:
+        """
+        キャッシュのメタ情報が現在のエクスポートファイルに対応しているか（エクスポートファイルが更新されていないか）を判定する
+        """
+        if meta is None:
+            return False
+
+        for key, value in self.__build_source_meta(source_path).items():
+            if meta.get(key) != value:
+                return False
+
+        return True
+
+    def __read_meta(self, entry_dir:str) -> dict:
+        """
+        キャッシュのメタ情報を読み込む。存在しない場合は None
+        """
+        meta_path = os.path.join(entry_dir, self.__META_FILE_NAME)
+        if not os.path.isfile(meta_path):
+            return None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+class PriceDataCacheWriter:
+
+    # 書き込み中の列
+    columns:list
+
+    # 書き込んだ行数
+    rows:int
+
+    def __init__(self, cache:PriceDataCache, source_path:str, entry_dir:str) -> None:
+        """
+        エクスポートファイルを解析しながら、チャンク単位で列ごとのバイナリファイルに追記するライター。
+        ファイル全体を DataFrame として持たずにキャッシュを作成できる。
+        Args:
+            cache (PriceDataCache): 書き込み先のキャッシュ
+            source_path (str): エクスポートファイルのパス
+            entry_dir (str): キャッシュの格納ディレクトリー
+        Returns:
+            None
+        """
+        self.__cache = cache
+        self.__source_path = source_path
+        self.__entry_dir = entry_dir
+        self.__files = {}
+        self.__failed = False
+        self.columns = None
+        self.rows = 0
+        self.__is_sorted = True
+        self.__last_time = None
+
+        try:
+            os.makedirs(entry_dir, exist_ok=True)
+            # 先にメタ情報を消しておき、書き込み途中のキャッシュが有効と判定されないようにする
+            self.__cache.remove_meta(entry_dir)
+        except OSError as e:
+            self.__fail(e)
+
+    def append(self, df:pd.DataFrame) -> None:
+        """
+        解析済みのチャンクを追記する
+        Args:
+            df (pd.DataFrame): 解析済みの株価データ（time をインデックス）
+        Returns:
+            None
+        """
+        if self.__failed:
+            return
+
+        try:
+            if self.columns is None:
+                self.columns = [column for column in PriceDataCache.COLUMN_DTYPES if column in df.columns]
+                for column in [PriceDataCache.TIME_COLUMN] + self.columns:
+                    self.__files[column] = open(self.__cache.get_column_path(self.__entry_dir, column), 'wb')
+
+            index = pd.DatetimeIndex(df.index)
+            if index.tz is not None:
+                index = index.tz_localize(None)
+            time_values = index.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            self.__files[PriceDataCache.TIME_COLUMN].write(time_values.tobytes())
+
+            # 時刻順に並んでいるかを記録し、読み込み時に二分探索が使えるかを判断できるようにする
+            if len(time_values) > 0:
+                if np.any(np.diff(time_values) < 0) or (self.__last_time is not None and time_values[0] < self.__last_time):
+                    self.__is_sorted = False
+                self.__last_time = time_values[-1]
+            for column in self.columns:
+                self.__files[column].write(df[column].to_numpy(dtype=PriceDataCache.COLUMN_DTYPES[column]).tobytes())
+            self.rows = self.rows + len(df)
+        except OSError as e:
+            self.__fail(e)
+
+    def commit(self) -> None:
+        """
+        書き込みを完了し、キャッシュを有効にする
+        Returns:
+            None
+        """
+        self.__close_files()
+        if self.__failed:
+            return
+
+        try:
+            self.__cache.write_meta(self.__source_path, self.__entry_dir, self.columns or [], self.rows, self.__is_sorted)
+        except OSError as e:
+            self.__fail(e)
+
+    def abort(self) -> None:
+        """
+        書き込みを中止し、書き込み途中のキャッシュを削除する（エクスポートファイルの解析に失敗した場合に呼び出す）
+        Returns:
+            None
+        """
+        self.__close_files()
+        try:
+            self.__cache.remove_meta(self.__entry_dir)
+            for column in [PriceDataCache.TIME_COLUMN] + (self.columns or []):
+                column_path = self.__cache.get_column_path(self.__entry_dir, column)
+                if os.path.isfile(column_path):
+                    os.remove(column_path)
+            if os.path.isdir(self.__entry_dir) and len(os.listdir(self.__entry_dir)) == 0:
+                os.rmdir(self.__entry_dir)
+        except OSError as e:
+            print(f"書き込み途中の株価データのキャッシュの削除に失敗しました: {e}")
+
+    def __close_files(self):
+        for f in self.__files.values():
+            f.close()
+        self.__files = {}
+
+    def __fail(self, e:Exception):
+        # キャッシュを保存できなくても株価データの読み込み自体は続けられるので、メッセージを表示するだけにする
+        print(f"株価データのキャッシュの保存に失敗しました: {e}")
+        self.__failed = True
+        self.__close_files()
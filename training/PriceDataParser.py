@@ -0,0 +1,199 @@
+from datetime import date
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+# 株価の列（float64）と出来高の列（int64）
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+VOLUME_COLUMN = 'Volume'
+
+# TradingViewのCSVから読み込む列名（読み込み時の小文字）
+TRV_REQUIRED_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+# チャートギャラリーの日付の形式
+CHG_DATE_FORMAT = '%y/%m/%d'
+
+# チャートギャラリーの1行に必要な最小の列数（日付、始値、高値、安値、終値、出来高）
+CHG_MIN_FIELD_COUNT = 6
+
+# ファイルを分割して読み込む際の1チャンクあたりの行数
+CHUNK_ROWS = 100000
+
+# 取引所ごとのタイムゾーン。TradingViewのunix時間(UTC)を現地の日付に変換するために使う
+EXCHANGE_TIMEZONES = {
+    'TSE': 'Asia/Tokyo',
+}
+
+def read_trv_csv(file_path:str, code:str, start_date:date=None, end_date:date=None, on_chunk=None) -> pd.DataFrame:
+    """
+    TradingViewのCSVファイルをチャンク単位で読み込み、型付きの株価データに変換する。
+    期間が指定された場合は、その期間のデータだけを残すので、メモリの使用量はファイルサイズではなく期間に比例する。
+    Args:
+        file_path (str): CSVファイルのパス
+        code (str): 証券コード（TradingView形式。例：東証の場合は"TSE_XXXX"）
+        start_date (date, optional): 残す期間の開始日. Defaults to None(制限なし).
+        end_date (date, optional): 残す期間の終了日. Defaults to None(制限なし).
+        on_chunk (callable, optional): 期間で絞り込む前の解析済みのチャンクを受け取る関数（キャッシュの作成用）. Defaults to None.
+    Returns:
+        pd.DataFrame: 整形済みの DataFrame（time をインデックス）
+    """
+    chunks = []
+    with pd.read_csv(file_path, usecols=lambda col: col.lower() in TRV_REQUIRED_COLUMNS, engine='c', chunksize=CHUNK_ROWS) as reader:
+        for raw_df in reader:
+            df = parse_trv_frame(raw_df, code)
+            if on_chunk is not None:
+                on_chunk(df)
+            chunks.append(filter_by_date_range(df, start_date, end_date))
+
+    return _concat_chunks(chunks)
+
+def parse_trv_frame(raw_df:pd.DataFrame, code:str) -> pd.DataFrame:
+    """
+    TradingViewのCSVから読み込んだ DataFrame を型付きの株価データに変換する。
+    time列は日時の文字列（ISO 8601）とunix時間（秒）の両方に対応する。
+    Args:
+        raw_df (pd.DataFrame): CSVから読み込んだままの DataFrame
+        code (str): 証券コード（TradingView形式。例：東証の場合は"TSE_XXXX"）
+    Returns:
+        pd.DataFrame: 整形済みの DataFrame（time をインデックス）
+    """
+    raw_df.columns = [col.lower() for col in raw_df.columns]
+
+    df = pd.DataFrame(index=_parse_trv_time(raw_df['time'], code))
+    for column in raw_df.columns:
+        if column == 'time':
+            continue
+        # 列名の先頭文字を大文字に変換
+        df[column.capitalize()] = raw_df[column].to_numpy()
+
+    return to_typed_df(df)
+
+def read_chg_txt(file_path:str, start_date:date=None, end_date:date=None, on_chunk=None) -> pd.DataFrame:
+    """
+    チャートギャラリーのテキストファイルをチャンク単位で読み込み、型付きの株価データに変換する。
+    期間が指定された場合は、その期間のデータだけを残すので、メモリの使用量はファイルサイズではなく期間に比例する。
+    Args:
+        file_path (str): テキストファイルのパス
+        start_date (date, optional): 残す期間の開始日. Defaults to None(制限なし).
+        end_date (date, optional): 残す期間の終了日. Defaults to None(制限なし).
+        on_chunk (callable, optional): 期間で絞り込む前の解析済みのチャンクを受け取る関数（キャッシュの作成用）. Defaults to None.
+    Returns:
+        pd.DataFrame: 整形済みの DataFrame（time をインデックス）
+    """
+    chunks = []
+    with open(file_path, 'r', encoding='utf-8') as f:
+        while True:
+            lines = list(islice(f, CHUNK_ROWS))
+            if len(lines) == 0:
+                break
+
+            df = parse_chg_lines(pd.Series(lines, dtype=object))
+            if on_chunk is not None:
+                on_chunk(df)
+            chunks.append(filter_by_date_range(df, start_date, end_date))
+
+    return _concat_chunks(chunks)
+
+def parse_chg_lines(lines:pd.Series) -> pd.DataFrame:
+    """
+    チャートギャラリーのテキストの行を、タブ区切りとして一括で分割して型付きの株価データに変換する。
+    日付・始値・高値・安値・終値は先頭の5列、出来高は最後の列とする。出来高を含まない行（6列未満）はスキップする。
+    Args:
+        lines (pd.Series): テキストファイルの行
+    Returns:
+        pd.DataFrame: 整形済みの DataFrame（time をインデックス）
+    """
+    fields = lines.str.strip().str.split('\t', expand=True)
+    if fields.shape[1] < CHG_MIN_FIELD_COUNT:
+        return _empty_price_df()
+
+    # Volumeを含まない行はスキップ
+    field_counts = fields.notna().sum(axis=1).to_numpy()
+    is_valid_row = field_counts >= CHG_MIN_FIELD_COUNT
+    fields = fields[is_valid_row]
+    field_counts = field_counts[is_valid_row]
+
+    # 行ごとに最後の列を出来高として取り出す
+    volume_values = fields.to_numpy()[np.arange(len(fields)), field_counts - 1]
+
+    df = pd.DataFrame(index=pd.DatetimeIndex(pd.to_datetime(fields[0], format=CHG_DATE_FORMAT), name='time'))
+    for i, column in enumerate(PRICE_COLUMNS):
+        df[column] = fields[i + 1].to_numpy()
+    df[VOLUME_COLUMN] = volume_values
+
+    return to_typed_df(df)
+
+def to_typed_df(df:pd.DataFrame) -> pd.DataFrame:
+    """
+    株価データの列を数値型（株価:float64, 出来高:int64）に変換する。
+    Args:
+        df (pd.DataFrame): 株価データ
+    Returns:
+        pd.DataFrame: 列を数値型に変換した株価データ
+    """
+    for column in PRICE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype(np.float64)
+
+    if VOLUME_COLUMN in df.columns:
+        df[VOLUME_COLUMN] = pd.to_numeric(df[VOLUME_COLUMN], errors='coerce').fillna(0).round().astype(np.int64)
+
+    return df
+
+def filter_by_date_range(df:pd.DataFrame, start_date:date=None, end_date:date=None) -> pd.DataFrame:
+    """
+    株価データから指定した期間（開始日・終了日を含む）のデータだけを取り出す
+    Args:
+        df (pd.DataFrame): 株価データ（time をインデックス）
+        start_date (date, optional): 期間の開始日. Defaults to None(制限なし).
+        end_date (date, optional): 期間の終了日. Defaults to None(制限なし).
+    Returns:
+        pd.DataFrame: 期間内の株価データ
+    """
+    if start_date is None and end_date is None:
+        return df
+
+    in_range = np.ones(len(df), dtype=bool)
+    if start_date is not None:
+        in_range &= df.index >= pd.Timestamp(start_date)
+    if end_date is not None:
+        in_range &= df.index < pd.Timestamp(end_date) + pd.Timedelta(days=1)
+
+    return df[in_range]
+
+def _parse_trv_time(time_values:pd.Series, code:str) -> pd.DatetimeIndex:
+    """
+    TradingViewのtime列を日時に変換する。タイムゾーン付きの場合は現地時刻のまま、タイムゾーンなしの日時にする。
+    """
+    if pd.api.types.is_numeric_dtype(time_values):
+        # unix時間（秒, UTC）の場合は取引所の現地時刻に変換する（東証の日足はUTCでは前日の15:00になるため）
+        times = pd.to_datetime(time_values.to_numpy(), unit='s', utc=True)
+        exchange = code.split('_')[0] if '_' in code else ''
+        times = times.tz_convert(EXCHANGE_TIMEZONES.get(exchange, 'UTC')).tz_localize(None)
+    else:
+        times = pd.DatetimeIndex(pd.to_datetime(time_values, format='ISO8601'))
+        if times.tz is not None:
+            times = times.tz_localize(None)
+
+    return pd.DatetimeIndex(times, name='time')
+
+def _concat_chunks(chunks:list) -> pd.DataFrame:
+    """
+    チャンクごとの株価データを結合する
+    """
+    if len(chunks) == 0:
+        return _empty_price_df()
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks)
+
+def _empty_price_df() -> pd.DataFrame:
+    """
+    データがない場合の空の株価データを作成する
+    """
+    df = pd.DataFrame(index=pd.DatetimeIndex([], name='time'))
+    for column in PRICE_COLUMNS:
+        df[column] = np.empty(0, dtype=np.float64)
+    df[VOLUME_COLUMN] = np.empty(0, dtype=np.int64)
+    return df
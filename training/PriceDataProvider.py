@@ -0,0 +1,180 @@
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+
+import json
+import os
+import re
+import pandas as pd
+
+
+class PriceDataProvider:
+
+    def download(self, code:str, start_date:date, end_date:date) -> pd.DataFrame:
+        """
+        株価データの取得元のインターフェース。指定した期間の日足データを取得する。
+        取得元に接続できない場合は例外を送出する。
+        Args:
+            code (str): 銘柄コード
+            start_date (date): 取得する期間の開始日
+            end_date (date): 取得する期間の終了日（この日を含む）
+        Returns:
+            pd.DataFrame: 日付をインデックスとした株価データ
+        """
+        raise NotImplementedError()
+
+
+class YFinanceProvider(PriceDataProvider):
+
+    def download(self, code:str, start_date:date, end_date:date) -> pd.DataFrame:
+        """
+        yfinanceから指定した期間の日足データを取得する
+        Args:
+            code (str): 銘柄コード
+            start_date (date): 取得する期間の開始日
+            end_date (date): 取得する期間の終了日（この日を含む）
+        Returns:
+            pd.DataFrame: 日付をインデックスとした株価データ
+        """
+        # yfinanceは読み込みに時間がかかる（依存ライブラリが多い）ため、ローカルファイルだけを使う場合に読み込まないよう、取得時に読み込む
+        import yfinance as yf
+
+        # yfinanceの仕様的に指定した終了日付の前日までデータを取得してくるので、1日を追加する
+        end_date = end_date + timedelta(days=1)
+
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = end_date.strftime('%Y-%m-%d')
+        return yf.download(code, start=start_str, end=end_str, interval = "1d", auto_adjust=False, multi_level_index=False)
+
+
+class IncrementalPriceStore:
+
+    # 取得した株価データの格納先
+    store_dir:str
+
+    # 株価データの取得元
+    provider:PriceDataProvider
+
+    __META_FILE_SUFFIX = '.json'
+    __DATA_FILE_SUFFIX = '.pkl'
+
+    def __init__(self, provider:PriceDataProvider, store_dir:str=None) -> None:
+        """
+        取得元からダウンロードした株価データを銘柄ごとにローカルに保存し、次回以降は足りない期間だけを取得する。
+        取得元に接続できない場合は、保存済みのデータの範囲で株価データを返す。
+        Args:
+            provider (PriceDataProvider): 株価データの取得元
+            store_dir (str, optional): 保存先. Defaults to 'input/cache/yf'.
+        Returns:
+            None
+        """
+        self.provider = provider
+        self.store_dir = os.path.join('input', 'cache', 'yf') if store_dir is None else store_dir
+
+    def load(self, code:str, start_date:date, end_date:date) -> pd.DataFrame:
+        """
+        指定した期間の株価データを取得する。保存済みの期間は保存先から読み込み、足りない前後の期間だけ取得元から取得する。
+        Args:
+            code (str): 銘柄コード
+            start_date (date): 取得する期間の開始日
+            end_date (date): 取得する期間の終了日（この日を含む）
+        Returns:
+            pd.DataFrame: 日付をインデックスとした株価データ。データが一切取得できない場合は None
+        """
+        stored_df, covered_start, covered_end = self.__read(code)
+
+        # 当日の株価は確定していない可能性があるので、保存済みの期間としては前日までを扱う
+        last_fixed_date = date.today() - timedelta(days=1)
+
+        # 取得が必要な期間（前側、後ろ側）を求める
+        missing_ranges = []
+        if stored_df is None:
+            missing_ranges.append((start_date, end_date))
+        else:
+            if start_date < covered_start:
+                missing_ranges.append((start_date, covered_start - timedelta(days=1)))
+            if end_date > covered_end:
+                missing_ranges.append((covered_end + timedelta(days=1), end_date))
+
+        updated = False
+        for range_start, range_end in missing_ranges:
+            try:
+                fetched_df = self.provider.download(code, range_start, range_end)
+            except Exception as e:
+                print(f"株価データの取得に失敗しました。保存済みのデータを使います: {code} {range_start}～{range_end} ({e})")
+                continue
+
+            if fetched_df is not None and len(fetched_df) > 0:
+                stored_df = self.__merge(stored_df, fetched_df)
+            elif stored_df is None:
+                # 保存するデータがないので、取得済みの期間も記録しない
+                continue
+
+            # 取得に成功した期間は、データがない場合（上場前など）も取得済みとして扱い、次回以降は取得しない
+            fetched_end = min(range_end, last_fixed_date)
+            if covered_start is None:
+                covered_start, covered_end = range_start, fetched_end
+            else:
+                covered_start = min(covered_start, range_start)
+                covered_end = max(covered_end, fetched_end)
+            updated = True
+
+        if stored_df is None:
+            return None
+
+        if updated:
+            self.__write(code, stored_df, covered_start, covered_end)
+
+        index_dates = pd.DatetimeIndex(stored_df.index).normalize()
+        return stored_df[(index_dates >= pd.Timestamp(start_date)) & (index_dates <= pd.Timestamp(end_date))]
+
+    def __merge(self, stored_df:pd.DataFrame, fetched_df:pd.DataFrame) -> pd.DataFrame:
+        """
+        保存済みのデータに取得したデータをマージする。同じ日付のデータは取得したほうを優先する
+        """
+        if stored_df is None:
+            return fetched_df.sort_index()
+
+        merged_df = pd.concat([stored_df, fetched_df])
+        merged_df = merged_df[~merged_df.index.duplicated(keep='last')]
+        return merged_df.sort_index()
+
+    def __get_path(self, code:str, suffix:str) -> str:
+        """
+        銘柄コードに対応した保存ファイルのパスを取得する
+        """
+        file_stem = re.sub(r'[^0-9A-Za-z_.^=-]', '_', code)
+        return os.path.join(self.store_dir, file_stem + suffix)
+
+    def __read(self, code:str):
+        """
+        保存済みのデータと、その取得済み期間を読み込む。保存されていない場合は (None, None, None)
+        """
+        meta_path = self.__get_path(code, self.__META_FILE_SUFFIX)
+        data_path = self.__get_path(code, self.__DATA_FILE_SUFFIX)
+        if not os.path.isfile(meta_path) or not os.path.isfile(data_path):
+            return None, None, None
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            stored_df = pd.read_pickle(data_path)
+            covered_start = datetime.strptime(meta['start_date'], '%Y-%m-%d').date()
+            covered_end = datetime.strptime(meta['end_date'], '%Y-%m-%d').date()
+        except Exception as e:
+            print(f"保存済みの株価データの読み込みに失敗しました。取得し直します: {code} ({e})")
+            return None, None, None
+
+        return stored_df, covered_start, covered_end
+
+    def __write(self, code:str, stored_df:pd.DataFrame, covered_start:date, covered_end:date):
+        """
+        データと取得済み期間を保存する
+        """
+        try:
+            os.makedirs(self.store_dir, exist_ok=True)
+            stored_df.to_pickle(self.__get_path(code, self.__DATA_FILE_SUFFIX))
+            with open(self.__get_path(code, self.__META_FILE_SUFFIX), 'w', encoding='utf-8') as f:
+                json.dump({'start_date': covered_start.strftime('%Y-%m-%d'), 'end_date': covered_end.strftime('%Y-%m-%d')}, f)
+        except OSError as e:
+            print(f"株価データの保存に失敗しました: {code} ({e})")
@@ -0,0 +1,225 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+# date.toordinal() と numpy の datetime64[D]（1970-01-01 からの日数）との差分
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class PriceSeries:
+
+    # 各足の日付（1970-01-01 からの日数、昇順。int64）
+    day_numbers:np.ndarray
+
+    # 列名 → 値の配列（株価は float64 または float32、出来高は int64）
+    __columns:dict
+
+    PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+    VOLUME_COLUMN = 'Volume'
+
+    def __init__(self, day_numbers:np.ndarray, open_prices:np.ndarray, high_prices:np.ndarray, low_prices:np.ndarray,
+                 close_prices:np.ndarray, volumes:np.ndarray) -> None:
+        """
+        1銘柄の日足の株価データを、列ごとの連続したNumPy配列で保持する。
+        DataFrame と比べてメモリ使用量が小さく、日付による検索は二分探索で行う。配列はコピーせずにそのまま保持する。
+        Args:
+            day_numbers (np.ndarray): 各足の日付（1970-01-01 からの日数、昇順）
+            open_prices (np.ndarray): 始値
+            high_prices (np.ndarray): 高値
+            low_prices (np.ndarray): 安値
+            close_prices (np.ndarray): 終値
+            volumes (np.ndarray): 出来高
+        Returns:
+            None
+        """
+        self.day_numbers = day_numbers
+        self.__columns = {
+            'Open': open_prices,
+            'High': high_prices,
+            'Low': low_prices,
+            'Close': close_prices,
+            self.VOLUME_COLUMN: volumes,
+        }
+
+    @classmethod
+    def from_dataframe(cls, df:pd.DataFrame, price_dtype=np.float64) -> 'PriceSeries':
+        """
+        日付をインデックスとした株価データの DataFrame から作成する（読み込み時に1回だけ変換する）
+        Args:
+            df (pd.DataFrame): 株価データ（Open, High, Low, Close, Volume の列。ない列は株価はNaN、出来高は0とする）
+            price_dtype (optional): 株価の型（np.float64 または np.float32）. Defaults to np.float64.
+        Returns:
+            PriceSeries: 株価データ
+        """
+        day_numbers = cls.to_day_numbers(df.index)
+
+        # 日付順に並んでいない場合は並べ替える（同じ日付の行は元の順番のまま）
+        order = None
+        if len(day_numbers) > 1 and np.any(day_numbers[1:] < day_numbers[:-1]):
+            order = np.argsort(day_numbers, kind='stable')
+            day_numbers = day_numbers[order]
+
+        def to_array(column:str, dtype, default):
+            if column not in df.columns:
+                return np.full(len(df), default, dtype=dtype)
+            values = pd.to_numeric(df[column], errors='coerce')
+            if dtype == np.int64:
+                values = values.fillna(0).round()
+            values = values.to_numpy(dtype=dtype)
+            return np.ascontiguousarray(values if order is None else values[order])
+
+        prices = [to_array(column, price_dtype, np.nan) for column in cls.PRICE_COLUMNS]
+        return cls(day_numbers, *prices, to_array(cls.VOLUME_COLUMN, np.int64, 0))
+
+    @staticmethod
+    def to_day_number(target_date:date) -> int:
+        """
+        日付を1970-01-01からの日数に変換する
+        Args:
+            target_date (date): 日付（datetimeも可）
+        Returns:
+            int: 1970-01-01からの日数
+        """
+        return target_date.toordinal() - _EPOCH_ORDINAL
+
+    @staticmethod
+    def to_day_numbers(dates) -> np.ndarray:
+        """
+        複数の日付をまとめて1970-01-01からの日数に変換する
+        Args:
+            dates: 日付の配列（DatetimeIndex、datetime64の配列、date/datetimeのリストなど）
+        Returns:
+            np.ndarray: 1970-01-01からの日数（int64）
+        """
+        datetime_index = pd.DatetimeIndex(dates)
+        if datetime_index.tz is not None:
+            # タイムゾーン付きの場合は現地時刻の日付で扱う
+            datetime_index = datetime_index.tz_localize(None)
+        return datetime_index.normalize().to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.day_numbers)
+
+    def find_position(self, target_date:date) -> int:
+        """
+        指定した日付の行番号を取得する（同じ日付の行が複数ある場合は最初の行）
+        Args:
+            target_date (date): 対象日付（datetimeも可）
+        Returns:
+            int: 行番号。該当する日付のデータがない場合は -1
+        """
+        # 1件ずつの検索は取引のたびに呼ばれるため、np.searchsorted より呼び出しの軽い配列のメソッドを使う
+        day = target_date.toordinal() - _EPOCH_ORDINAL
+        position = int(self.day_numbers.searchsorted(day))
+        if position < len(self.day_numbers) and self.day_numbers.item(position) == day:
+            return position
+        return -1
+
+    def find_next_position(self, target_date:date, max_days:int) -> int:
+        """
+        指定した日付の翌日以降で、最初にデータが存在する行番号を取得する
+        Args:
+            target_date (date): 基準日付（datetimeも可）
+            max_days (int): 翌日から数えて探す最大日数
+        Returns:
+            int: 行番号。max_days 以内にデータがない場合は -1
+        """
+        first_candidate = target_date.toordinal() - _EPOCH_ORDINAL + 1
+        position = int(self.day_numbers.searchsorted(first_candidate))
+        if position >= len(self.day_numbers) or self.day_numbers.item(position) - first_candidate > max_days:
+            return -1
+        return position
+
+    def find_positions(self, day_numbers:np.ndarray) -> np.ndarray:
+        """
+        複数の日付の行番号をまとめて取得する（find_position の配列版）
+        Args:
+            day_numbers (np.ndarray): 対象日付（1970-01-01からの日数）
+        Returns:
+            np.ndarray: 行番号（int64）。該当する日付のデータがない場合は -1
+        """
+        day_numbers = np.asarray(day_numbers, dtype=np.int64)
+        positions = np.searchsorted(self.day_numbers, day_numbers, side='left').astype(np.int64)
+        is_found = positions < len(self.day_numbers)
+        is_found[is_found] = self.day_numbers[positions[is_found]] == day_numbers[is_found]
+        return np.where(is_found, positions, -1)
+
+    def find_next_positions(self, day_numbers:np.ndarray, max_days:int) -> np.ndarray:
+        """
+        複数の日付について、翌日以降で最初にデータが存在する行番号をまとめて取得する（find_next_position の配列版）
+        Args:
+            day_numbers (np.ndarray): 基準日付（1970-01-01からの日数）
+            max_days (int): 翌日から数えて探す最大日数
+        Returns:
+            np.ndarray: 行番号（int64）。max_days 以内にデータがない場合は -1
+        """
+        first_candidates = np.asarray(day_numbers, dtype=np.int64) + 1
+        positions = np.searchsorted(self.day_numbers, first_candidates, side='left').astype(np.int64)
+        is_found = positions < len(self.day_numbers)
+        is_found[is_found] = self.day_numbers[positions[is_found]] - first_candidates[is_found] <= max_days
+        return np.where(is_found, positions, -1)
+
+    def get_date(self, position:int) -> date:
+        """
+        行番号に該当する日付を取得する
+        Args:
+            position (int): 行番号
+        Returns:
+            date: 日付
+        """
+        return date.fromordinal(int(self.day_numbers[position]) + _EPOCH_ORDINAL)
+
+    def get_column(self, column:str) -> np.ndarray:
+        """
+        列の値の配列を取得する（コピーしない）
+        Args:
+            column (str): 列名（'Open', 'High', 'Low', 'Close', 'Volume'）
+        Returns:
+            np.ndarray: 値の配列
+        """
+        return self.__columns[column]
+
+    def get_price(self, position:int, column:str) -> float:
+        """
+        行番号に該当する株価を取得する
+        Args:
+            position (int): 行番号
+            column (str): 列名（'Open', 'Close'など）
+        Returns:
+            float: 株価
+        """
+        return float(self.__columns[column][position])
+
+    def set_price(self, position:int, column:str, price:float) -> None:
+        """
+        行番号に該当する株価を上書きする（データ誤りの修正用）
+        Args:
+            position (int): 行番号
+            column (str): 列名（'Open', 'Close'など）
+            price (float): 上書きする株価
+        Returns:
+            None
+        """
+        values = self.__columns[column]
+        if not values.flags.writeable:
+            # 読み取り専用の配列（ストアのメモリマップなど）の場合は、この列だけコピーしてから上書きする
+            values = values.copy()
+            self.__columns[column] = values
+        values[position] = price
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        DataFrame として参照する（画面表示・売買ルールの計算用）。列の配列はコピーせずに共有する
+        Returns:
+            pd.DataFrame: time をインデックスとした株価データ（Open, High, Low, Close, Volume）
+        """
+        index = pd.DatetimeIndex(self.day_numbers.astype('datetime64[D]').astype('datetime64[ns]'), name='time')
+        return pd.DataFrame(self.__columns, index=index, copy=False)
+
+    def get_memory_usage(self) -> int:
+        """
+        株価データが使っているメモリのバイト数を取得する
+        Returns:
+            int: バイト数
+        """
+        return int(self.day_numbers.nbytes + sum(values.nbytes for values in self.__columns.values()))
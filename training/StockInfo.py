@@ -4,14 +4,29 @@ from datetime import timedelta
 import glob
 import os
 import re
+import numpy as np
 import pandas as pd
-import yfinance as yf
+
+import PriceDataCache as pdc
+import PriceDataParser as pdpsr
+import PriceDataProvider as pdp
+import PriceSeries as ps
+import UniverseStore as us
 
 
 class StockInfo:
 
-    # 株価格のデータ
-    stock_data_df:pd.DataFrame = None
+    # 株価格のデータ（日付・株価・出来高の列ごとの配列）。銘柄ごとに DataFrame を持つとメモリを多く使うため、読み込み時に変換しておく
+    price_series:ps.PriceSeries = None
+
+    # ローカルファイルを解析した結果のキャッシュ
+    __price_data_cache:pdc.PriceDataCache = pdc.PriceDataCache()
+
+    # 全銘柄の株価データのストア（UniverseStore.py で作成した場合だけ使う）。プロセス内で1回だけメモリマップで開き、銘柄間で共有する
+    __universe_store:us.UniverseStore = us.UniverseStore()
+
+    # 翌日寄付の注文において、翌営業日のデータを探す最大日数(15連休の可能性はない)
+    NEXT_OPEN_SEARCH_DAYS = 15
 
     # 株銘柄の情報
     # stock_info = None   # 現時点は使わない
@@ -19,25 +34,31 @@ class StockInfo:
     start_date:date
     end_date:date
 
-    def __init__(self, code:str, start_date:date, end_date:date, data_type:str):
+    def __init__(self, code:str, start_date:date, end_date:date, data_type:str, provider:pdp.PriceDataProvider=None, lookback_days:int=0,
+                 price_dtype=np.float64):
         """
         株価を含めた銘柄情報を読み込む
-        読み込んだデータは、stock_data_df フィールドに格納される。ただし、銘柄コードに対応するデータが存在しない場合は None となる。
+        読み込んだデータは、price_series フィールドに格納される。ただし、銘柄コードに対応するデータが存在しない場合は None となる。
         Args:
             code (str): 銘柄コード
             start_date (date): 読み込む対象となる株価データの開始日
             end_date (date): 読み込む対象となる株価データの終了日
             data_type (str): データの取得元（loc:ローカルファイル, yf:yfinance）
+            provider (PriceDataProvider, optional): data_typeが 'yf' の場合の株価データの取得元. Defaults to None(yfinance).
+            lookback_days (int, optional): data_typeが 'loc' の場合、開始日より前に余分に読み込む日数. Defaults to 0.
+            price_dtype (optional): 株価を保持する型（np.float64 または np.float32）. Defaults to np.float64.
         Returns:
             None
         """
         # 正規化した（Yahoo Finance形式にした）コードを株の銘柄コード情報として使う
         self.code = self.__normalize_tse_code(code)
 
-        # data_typeが 'loc' の場合、start_date と end_date は使われない
         self.start_date = start_date
         self.end_date = end_date
 
+        stock_data_df = None
+        price_series = None
+
         # データの取得元に応じて処理を分岐
         if data_type == 'loc':
             # 東証の場合は証券コードを整形する（TradingView形式の"TSE_" + 4桁に変換）
@@ -50,29 +71,171 @@ class StockInfo:
             if code_num is not None:
                 code = f"TSE_{code_num}"
 
-            # ローカルファイルから読み込む
-            try:
-                self.stock_data_df = self.__load_trv_csv(code)
-            except FileNotFoundError:
-                # TradingViewのCSVファイルが存在しない場合、チャートギャラリーのテキストファイルを読み込む
-                print(f"TradingViewのCSVファイルが見つかりません。チャートギャラリーのテキストファイルを読み込みます: {code}")
+            # ローカルファイルから読み込む範囲を決める。開始日より前は指定された日数分だけ余分に読み込み、
+            # 終了日より後は翌日寄付の注文で翌営業日を探す日数分だけ読み込む
+            range_start = None if start_date is None else start_date - timedelta(days=lookback_days)
+            range_end = None if end_date is None else end_date + timedelta(days=self.NEXT_OPEN_SEARCH_DAYS + 1)
+
+            # 全銘柄のストアがあれば、エクスポートファイルを読み込まずにストアからコピーせずに切り出す
+            price_series = self.__universe_store.open_series(self.code, range_start, range_end, price_dtype)
+            if price_series is None:
+                # ストアにない場合はローカルファイルから読み込む
                 try:
-                    self.stock_data_df = self.__load_chg_txt(code)
+                    stock_data_df = self.__load_trv_csv(code, range_start, range_end)
                 except FileNotFoundError:
-                    print(f"チャートギャラリーのテキストファイルも見つかりません。データは取得できません: {code}")
-                    self.stock_data_df = None
+                    # TradingViewのCSVファイルが存在しない場合、チャートギャラリーのテキストファイルを読み込む
+                    print(f"TradingViewのCSVファイルが見つかりません。チャートギャラリーのテキストファイルを読み込みます: {code}")
+                    try:
+                        stock_data_df = self.__load_chg_txt(code, range_start, range_end)
+                    except FileNotFoundError:
+                        print(f"チャートギャラリーのテキストファイルも見つかりません。データは取得できません: {code}")
+                        stock_data_df = None
         elif data_type == 'yf':
-            # yfinanceから取得する
-            
-            # yfinanceの仕様的に指定した終了日付の前日までデータを取得してくるので、1日を追加する
-            end_date = end_date + timedelta(days=1)
-
-            start_str = start_date.strftime('%Y-%m-%d')
-            end_str = end_date.strftime('%Y-%m-%d')
-            self.stock_data_df = yf.download(code, start=start_str, end=end_str, interval = "1d", auto_adjust=False, multi_level_index=False)
+            # yfinanceから取得する。保存済みのデータがある場合は、足りない期間だけを取得する
+            if provider is None:
+                provider = pdp.YFinanceProvider()
+            stock_data_df = pdp.IncrementalPriceStore(provider).load(code, start_date, end_date)
         else:
             print(f"不正なデータ種別: {data_type}")
-            self.stock_data_df = None
+
+        # 読み込んだ DataFrame は配列に変換した後は保持しない
+        if price_series is None and stock_data_df is not None:
+            price_series = ps.PriceSeries.from_dataframe(stock_data_df, price_dtype)
+        self.price_series = price_series
+
+    @property
+    def stock_data_df(self) -> pd.DataFrame:
+        """
+        株価データを DataFrame として参照する（画面表示・売買ルールの計算用）。参照のたびに price_series の配列を共有する DataFrame を作成する
+        Returns:
+            pd.DataFrame: time をインデックスとした株価データ（Open, High, Low, Close, Volume）。株価データがない場合は None
+        """
+        if self.price_series is None:
+            return None
+
+        return self.price_series.to_dataframe()
+
+    def find_bar_position(self, target_date:date) -> int:
+        """
+        指定した日付の株価データの行番号を取得する
+        Args:
+            target_date (date): 対象日付（datetimeも可）
+        Returns:
+            int: 行番号。該当する日付のデータがない場合は -1
+        """
+        if self.price_series is None:
+            return -1
+
+        return self.price_series.find_position(target_date)
+
+    def find_next_bar_position(self, target_date:date) -> int:
+        """
+        指定した日付の翌営業日（翌日以降で最初にデータが存在する日）の株価データの行番号を取得する
+        Args:
+            target_date (date): 基準日付（datetimeも可）
+        Returns:
+            int: 行番号。翌営業日のデータがない場合は -1
+        """
+        if self.price_series is None:
+            return -1
+
+        return self.price_series.find_next_position(target_date, self.NEXT_OPEN_SEARCH_DAYS)
+
+    def find_bar_positions(self, target_dates) -> np.ndarray:
+        """
+        複数の日付の株価データの行番号をまとめて取得する（find_bar_position の配列版）
+        Args:
+            target_dates: 対象日付の配列（DatetimeIndex、date/datetimeのリストなど）
+        Returns:
+            np.ndarray: 行番号。該当する日付のデータがない場合は -1
+        """
+        if self.price_series is None:
+            return np.full(len(target_dates), -1, dtype=np.int64)
+
+        return self.price_series.find_positions(ps.PriceSeries.to_day_numbers(target_dates))
+
+    def find_next_bar_positions(self, target_dates) -> np.ndarray:
+        """
+        複数の日付について、翌営業日の株価データの行番号をまとめて取得する（find_next_bar_position の配列版）
+        Args:
+            target_dates: 基準日付の配列（DatetimeIndex、date/datetimeのリストなど）
+        Returns:
+            np.ndarray: 行番号。翌営業日のデータがない場合は -1
+        """
+        if self.price_series is None:
+            return np.full(len(target_dates), -1, dtype=np.int64)
+
+        return self.price_series.find_next_positions(ps.PriceSeries.to_day_numbers(target_dates), self.NEXT_OPEN_SEARCH_DAYS)
+
+    def get_bar_date(self, position:int) -> date:
+        """
+        行番号に該当する株価データの日付を取得する
+        Args:
+            position (int): 行番号
+        Returns:
+            date: 日付
+        """
+        return self.price_series.get_date(position)
+
+    def get_price(self, position:int, column:str) -> float:
+        """
+        行番号に該当する株価を取得する
+        Args:
+            position (int): 行番号
+            column (str): 列名（'Open', 'Close'など）
+        Returns:
+            float: 株価
+        """
+        return self.price_series.get_price(position, column)
+
+    def get_prices(self, positions:np.ndarray, column:str) -> np.ndarray:
+        """
+        複数の行番号に該当する株価をまとめて取得する（get_price の配列版）
+        Args:
+            positions (np.ndarray): 行番号
+            column (str): 列名（'Open', 'Close'など）
+        Returns:
+            np.ndarray: 株価（price_dtype の型）
+        """
+        return self.price_series.get_column(column)[positions]
+
+    def get_bar_day_numbers(self, positions:np.ndarray) -> np.ndarray:
+        """
+        複数の行番号に該当する株価データの日付をまとめて取得する
+        Args:
+            positions (np.ndarray): 行番号
+        Returns:
+            np.ndarray: 日付（1970-01-01からの日数）
+        """
+        return self.price_series.day_numbers[positions]
+
+    def set_price(self, target_date:date, column:str, price:float) -> bool:
+        """
+        指定した日付の株価を上書きする（データ誤りの修正用）
+        Args:
+            target_date (date): 対象日付（datetimeも可）
+            column (str): 列名（'Open', 'Close'など）
+            price (float): 上書きする株価
+        Returns:
+            bool: 上書きできた場合はTrue
+        """
+        position = self.find_bar_position(target_date)
+        if position < 0:
+            return False
+
+        self.price_series.set_price(position, column, price)
+        return True
+
+    def get_memory_usage(self) -> int:
+        """
+        読み込んだ株価データ（日付・株価・出来高の配列）が使っているメモリのバイト数を取得する
+        Returns:
+            int: バイト数。株価データがない場合は0
+        """
+        if self.price_series is None:
+            return 0
+
+        return self.price_series.get_memory_usage()
 
     def __normalize_tse_code(self, code: str) -> str:
         """
@@ -94,12 +257,14 @@ class StockInfo:
             return f"{match.group(2)}.T"
         return code
 
-    def __load_trv_csv(self, code: str) -> pd.DataFrame:
+    def __load_trv_csv(self, code: str, start_date: date = None, end_date: date = None) -> pd.DataFrame:
         """
-        指定された銘柄コードに対応するTradingViewのCSVファイルを読み込み、DataFrame を返す。
+        指定された銘柄コードに対応するTradingViewのCSVファイルを読み込み、指定した期間の DataFrame を返す。
 
         Args:
             code (str): 証券コード（TradingView形式。例：東証の場合は"TSE_XXXX"）
+            start_date (date, optional): 読み込む期間の開始日. Defaults to None(制限なし).
+            end_date (date, optional): 読み込む期間の終了日. Defaults to None(制限なし).
 
         Returns:
             pd.DataFrame: 整形済みの DataFrame（time をインデックス）
@@ -117,29 +282,32 @@ class StockInfo:
         # ファイルの更新時刻で最新ファイルを選択
         latest_file = max(file_list, key=os.path.getmtime)
 
-        df = None
-
-        # 必要な列名（読み込み時の小文字）
-        required_columns = ['time', 'open', 'high', 'low', 'close', 'volume']
-
-        # CSVファイルを読み込み
-        df = pd.read_csv(latest_file, usecols=lambda col: col.lower() in required_columns)
-
-        # 'time'列をdatetime型に変換し、インデックスに設定
-        df['time'] = pd.to_datetime(df['time'])
-        df.set_index('time', inplace=True)
-
-        # 列名の先頭文字を大文字に変換
-        df.columns = [col.capitalize() for col in df.columns]
+        # 解析済みのキャッシュがあれば、テキストの解析を行わずにそちらを使う
+        df = self.__price_data_cache.load(latest_file, start_date, end_date)
+        if df is not None:
+            return df
+
+        # CSVファイルをチャンク単位で読み込み、型付きのデータ（日時のインデックス、float64の株価、int64の出来高）に変換する。
+        # 解析したチャンクはキャッシュに追記し、期間内のデータだけを残す
+        cache_writer = self.__price_data_cache.create_writer(latest_file)
+        try:
+            df = pdpsr.read_trv_csv(latest_file, code, start_date, end_date, cache_writer.append)
+        except Exception:
+            # 解析に失敗した場合は、書き込み途中のキャッシュを残さない（開いたままのファイルも閉じる）
+            cache_writer.abort()
+            raise
+        cache_writer.commit()
 
         return df
 
-    def __load_chg_txt(self, code: str) -> pd.DataFrame:
+    def __load_chg_txt(self, code: str, start_date: date = None, end_date: date = None) -> pd.DataFrame:
         """
-        指定された銘柄コードに対応するチャートギャラリーのテキストファイルを読み込み、DataFrame を返す。
+        指定された銘柄コードに対応するチャートギャラリーのテキストファイルを読み込み、指定した期間の DataFrame を返す。
 
         Args:
             code (str): 証券コード（TradingView形式。例：東証の場合は"TSE_XXXX"）
+            start_date (date, optional): 読み込む期間の開始日. Defaults to None(制限なし).
+            end_date (date, optional): 読み込む期間の終了日. Defaults to None(制限なし).
 
         Returns:
             pd.DataFrame: 整形済みの DataFrame（time をインデックス）
@@ -150,23 +318,20 @@ class StockInfo:
         if not os.path.isfile(filepath):
             raise FileNotFoundError(f"指定銘柄コードに該当したチャートギャラリーデータは存在しません: {code}。")
 
-        # ファイル読み込みと整形
-        data = []
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                cols = line.strip().split('\t')
-                if len(cols) < 6:
-                    continue  # Volumeを含まない行はスキップ
-                row = cols[:5] + [cols[-1]]
-                data.append(row)
-
-        df = pd.DataFrame(data, columns=['time', 'open', 'high', 'low', 'close', 'Volume'])
-
-        # 日付変換とインデックス設定
-        df['time'] = pd.to_datetime(df['time'], format='%y/%m/%d')
-        df.set_index('time', inplace=True)
-
-        # 列名を大文字始まりに
-        df.columns = [col.capitalize() for col in df.columns]
+        # 解析済みのキャッシュがあれば、テキストの解析を行わずにそちらを使う
+        df = self.__price_data_cache.load(filepath, start_date, end_date)
+        if df is not None:
+            return df
+
+        # ファイル読み込みと整形（チャンク単位でタブ区切りを一括で分割し、Volumeを含まない行はスキップする）
+        # 解析したチャンクはキャッシュに追記し、期間内のデータだけを残す
+        cache_writer = self.__price_data_cache.create_writer(filepath)
+        try:
+            df = pdpsr.read_chg_txt(filepath, start_date, end_date, cache_writer.append)
+        except Exception:
+            # 解析に失敗した場合は、書き込み途中のキャッシュを残さない（開いたままのファイルも閉じる）
+            cache_writer.abort()
+            raise
+        cache_writer.commit()
 
         return df
@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import re
+import threading
+
+import StockInfo as si
+
+class StockInfoCache:
+
+    # 保持する株価データのメモリ使用量の上限（バイト）
+    max_bytes:int
+
+    # 現在保持している株価データのメモリ使用量（バイト）
+    current_bytes:int
+
+    # キャッシュの統計情報
+    hits:int
+    misses:int
+    evictions:int
+
+    # メモリ使用量の上限のデフォルト値(512MB)
+    DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+    def __init__(self, max_bytes:int=DEFAULT_MAX_BYTES) -> None:
+        """
+        読み込んだ銘柄情報(StockInfo)を保持するキャッシュ。
+        メモリ使用量が上限を超える場合は、最も長く使われていない銘柄から追い出す。
+        Args:
+            max_bytes (int, optional): 保持する株価データのメモリ使用量の上限（バイト）. Defaults to 512MB.
+        Returns:
+            None
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # キー → (StockInfo, メモリ使用量)。末尾ほど最近使われたもの
+        self.__entries = OrderedDict()
+
+        # 先読み中の銘柄。キー → 読み込み処理のFuture
+        self.__pending = {}
+        self.__executor:ThreadPoolExecutor = None
+
+        # 先読みのスレッドと、CLIのスレッドから同時に操作されるため、キャッシュの操作はロックを取ってから行う
+        # (先読みが即座に終わった場合、完了時のコールバックがロックを取ったまま呼ばれるので再入可能なロックにする)
+        self.__lock = threading.RLock()
+
+    def get(self, code:str, start_date:date, end_date:date, data_type:str, lookback_days:int=0) -> si.StockInfo:
+        """
+        銘柄情報を取得する。キャッシュにない場合は読み込んでキャッシュに追加する。
+        Args:
+            code (str): 銘柄コード
+            start_date (date): 読み込む対象となる株価データの開始日
+            end_date (date): 読み込む対象となる株価データの終了日
+            data_type (str): データの取得元（loc:ローカルファイル, yf:yfinance）
+            lookback_days (int, optional): data_typeが 'loc' の場合、開始日より前に余分に読み込む日数. Defaults to 0.
+        Returns:
+            StockInfo: 銘柄情報
+        """
+        key = self.__build_key(code, start_date, end_date, data_type, lookback_days)
+
+        with self.__lock:
+            if key in self.__entries:
+                self.hits = self.hits + 1
+                self.__entries.move_to_end(key)
+                return self.__entries[key][0]
+
+            future:Future = self.__pending.get(key)
+            if future is not None:
+                # 先読み中の銘柄の場合は、その銘柄の読み込みだけを待つ
+                self.hits = self.hits + 1
+            else:
+                self.misses = self.misses + 1
+
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                print(f"先読みに失敗したため、改めて読み込みます: {code} ({e})")
+
+        stock_info = si.StockInfo(code, start_date, end_date, data_type, lookback_days=lookback_days)
+        with self.__lock:
+            self.__add(key, stock_info)
+        return stock_info
+
+    def prefetch(self, codes:list, start_date:date, end_date:date, data_type:str, lookback_days:int=0, max_workers:int=None) -> int:
+        """
+        複数の銘柄をバックグラウンドのスレッドプールで並列に読み込み、キャッシュに追加しておく。
+        読み込みが終わっていない銘柄を get() で取得する場合は、その銘柄の読み込みだけを待つ。
+        Args:
+            codes (list): 銘柄コードのリスト
+            start_date (date): 読み込む対象となる株価データの開始日
+            end_date (date): 読み込む対象となる株価データの終了日
+            data_type (str): データの取得元（loc:ローカルファイル, yf:yfinance）
+            lookback_days (int, optional): data_typeが 'loc' の場合、開始日より前に余分に読み込む日数. Defaults to 0.
+            max_workers (int, optional): 読み込みに使うスレッド数. Defaults to None(ThreadPoolExecutorの既定値).
+        Returns:
+            int: 先読みを開始した銘柄数（キャッシュ済み・先読み中の銘柄は除く）
+        """
+        submitted_count = 0
+        with self.__lock:
+            if self.__executor is None:
+                self.__executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stock_info_prefetch')
+
+            for code in codes:
+                key = self.__build_key(code, start_date, end_date, data_type, lookback_days)
+                if key in self.__entries or key in self.__pending:
+                    continue
+
+                future = self.__executor.submit(si.StockInfo, code, start_date, end_date, data_type, lookback_days=lookback_days)
+                self.__pending[key] = future
+                future.add_done_callback(lambda f, key=key: self.__on_prefetched(key, f))
+                submitted_count = submitted_count + 1
+
+        return submitted_count
+
+    def shutdown(self) -> None:
+        """
+        先読み用のスレッドプールを終了する。開始していない先読みは取り消す
+        Returns:
+            None
+        """
+        with self.__lock:
+            executor = self.__executor
+            self.__executor = None
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def clear(self) -> None:
+        """
+        保持している銘柄情報をすべて破棄する（統計情報はそのまま）
+        Returns:
+            None
+        """
+        with self.__lock:
+            self.__entries.clear()
+            self.current_bytes = 0
+
+    def get_stats_message(self) -> str:
+        """
+        キャッシュの統計情報を表示用の文字列で取得する
+        Returns:
+            str: 統計情報の文字列
+        """
+        return '保持銘柄数：' + str(len(self.__entries)) \
+            + ', 先読み中：' + str(len(self.__pending)) \
+            + ', メモリ使用量：' + f'{self.current_bytes / 1024 / 1024:,.1f}MB' \
+            + ' / 上限：' + f'{self.max_bytes / 1024 / 1024:,.1f}MB' \
+            + ', ヒット：' + str(self.hits) \
+            + ', ミス：' + str(self.misses) \
+            + ', 追い出し：' + str(self.evictions)
+
+    def __on_prefetched(self, key:tuple, future:Future):
+        """
+        先読みが終わった銘柄をキャッシュに追加する
+        """
+        with self.__lock:
+            self.__pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                # 失敗した場合は、get() で改めて読み込む
+                return
+            self.__add(key, future.result())
+
+    def __build_key(self, code:str, start_date:date, end_date:date, data_type:str, lookback_days:int) -> tuple:
+        """
+        キャッシュのキーを作成する
+        """
+        return (self.__normalize_code(code), start_date, end_date, data_type, lookback_days)
+
+    def __add(self, key:tuple, stock_info:si.StockInfo):
+        """
+        銘柄情報をキャッシュに追加し、上限を超える分は最も長く使われていないものから追い出す（ロックを取った状態で呼び出す）
+        """
+        # データが取得できなかった場合は、後からファイルが用意される可能性があるのでキャッシュしない
+        if stock_info.price_series is None:
+            return
+
+        size = stock_info.get_memory_usage()
+
+        # 1銘柄だけで上限を超える場合はキャッシュしない
+        if size > self.max_bytes:
+            return
+
+        while len(self.__entries) > 0 and self.current_bytes + size > self.max_bytes:
+            _, (_, evicted_size) = self.__entries.popitem(last=False)
+            self.current_bytes = self.current_bytes - evicted_size
+            self.evictions = self.evictions + 1
+
+        self.__entries[key] = (stock_info, size)
+        self.current_bytes = self.current_bytes + size
+
+    def __normalize_code(self, code:str) -> str:
+        """
+        東証銘柄の場合は証券コードをyfinance形式(XXXX.T)に正規化する
+        """
+        match = re.fullmatch(r'(TSE_)?(\d{4})(\.T)?', code)
+        if match:
+            return f"{match.group(2)}.T"
+        return code
@@ -1,4 +1,4 @@
-import csv
+from collections import deque
 from datetime import timedelta
 from datetime import date
 from datetime import datetime
@@ -6,13 +6,22 @@ from typing import Tuple
 from pathlib import Path
 import os
 import traceback
+
 import pandas as pd
 
 import CurrentTradingInfo as cti
+import PreparedOrder as pord
 import AmountChecker as amchkr
 import StockInfo as si
 import ShortTrading as st
 import LongTrading as lt
+import TradingHistoryBinary as thb
+import TradingHistoryManifest as thm
+import TradingHistoryStorage as ths
+import TradingHistoryTable as thtbl
+import TradingSnapshot as tss
+import TradingSummary as tsm
+import CommandProfiler as cprf
 
 class Trading:
     
@@ -22,16 +31,36 @@ class Trading:
     # transactions_csv = None
     trading_history_csv:Path = None
 
+    # トレード履歴（メモリ上の表。読み込みはすべて表から行い、保存先への書き込みは後からまとめて行う）
+    history_storage:thtbl.TradingHistoryTable
+
+    # トレード履歴の保存形式
+    storage_type:str
+
+    STORAGE_TYPE_CSV:str = 'csv'
+    STORAGE_TYPE_SQLITE:str = 'sqlite'
+
+    # トレード再開の一覧用に、csvファイルの最後の行の情報を記録するマニフェスト
+    history_manifest:thm.TradingHistoryManifest
+
+    # csvファイルと同じ内容のバイナリファイル（集計・TradingView出力の読み込み用）も出力するか
+    history_binary:bool
+
     # 最新取引の情報
     current_trading_info:cti.CurrentTradingInfoModel
 
-    # TO DELETE
-    # 直近のトレード履歴(最新30件)を保存するリスト。誤入力の際にトレードの状態を戻すために使う
-    # __trading_info_history:collections.deque
+    # トレード履歴のサマリー。行の追加・削除に合わせて更新する（再開したトレードの場合は最初に必要になった時点で作成する）
+    __trading_summary:tsm.TradingSummary
+
+    # 直近の取引後の状態のスナップショット（リングバッファ）。誤入力の際にトレード履歴を読み込まずにトレードの状態を戻すために使う
+    __snapshots:deque
 
     # トレード履歴表示の最大件数
     __MAX_LENGTH_OF_HISTORY = 20
 
+    # 保持するスナップショットの最大件数
+    __MAX_LENGTH_OF_SNAPSHOTS = 100
+
     # 総資産超過チェックを通らないときの処理モード
     action_mode:int
 
@@ -40,6 +69,9 @@ class Trading:
 
     amount_checker:amchkr.AmountChecker
 
+    # コマンドごとの処理時間の計測（CLIを -p を付けて起動した場合は、計測を行うものに差し替えられる）
+    profiler:cprf.CommandProfiler
+
     ORDER_TIME_CLOSE = 0
     ORDER_TIME_NEXT_OPEN = 1
 
@@ -60,7 +92,9 @@ class Trading:
     # 最小取引単位
     min_trading_unit:int = 100
 
-    def __init__(self, stock_info:si.StockInfo, training_start_datetime:str, assets:float=0.0, identifier:str='', trading_start_date:str='20130101', trading_mode:str='single') -> None:
+    def __init__(self, stock_info:si.StockInfo, training_start_datetime:str, assets:float=0.0, identifier:str='', trading_start_date:str='20130101', trading_mode:str='single',
+                 storage_type:str='csv', output_dir:Path=None, history_flush_count:int=None, history_flush_interval:float=None,
+                 history_binary:bool=False) -> None:
         """
         トレードを開始する
         Args:
@@ -70,6 +104,11 @@ class Trading:
             identifier (str, optional): 同銘柄、同期間のトレードを行った際に、csvファイルに対して区別を付けたい時の識別子. Defaults to ''.
             trading_start_date (str, optional): 今回の練習期間の開始日. Defaults to '20130101'.
             trading_mode (str, optional): トレードモード. Defaults to 'single'.
+            storage_type (str, optional): トレード履歴の保存形式（csv:CSVファイル, sqlite:SQLiteのデータベース）. Defaults to 'csv'.
+            output_dir (Path, optional): トレード履歴などを出力するフォルダ. Defaults to 'output'.
+            history_flush_count (int, optional): トレード履歴の変更を保存先にまとめて書き込む件数. Defaults to None(TradingHistoryTable.DEFAULT_FLUSH_COUNT).
+            history_flush_interval (float, optional): トレード履歴の変更を保存先にまとめて書き込む間隔（秒）. Defaults to None(TradingHistoryTable.DEFAULT_FLUSH_INTERVAL).
+            history_binary (bool, optional): 終了時（close）に、csvファイルと同じ内容のバイナリファイル（.bin）も出力するか. Defaults to False.
         Returns:
             None
         """
@@ -86,18 +125,39 @@ class Trading:
             code_in_file = self.stock_info.code
 
         # トレード履歴を保存するcsvファイルを初期化する
-        dir_path = Path('output')
+        dir_path = Path('output') if output_dir is None else Path(output_dir)
         self.trading_history_csv =  dir_path.joinpath('trading_history_' + code_in_file + '_' + self.trading_start_date \
             + '_' + training_start_datetime + '_' + identifier + '.csv')
-        if not self.trading_history_csv.is_file():
-            with self.trading_history_csv.open(mode='w', encoding='shift-jis', newline='') as f:
-                header = ['銘柄コード', '取引日付', '株価', 'ロットサイズ', '売りロット数', '売り平均単価', '売り損益', '買いロット数', '買い平均単価', '買い損益', '総資産', 'メモ']
-                writer = csv.writer(f)
-                writer.writerow(header)
+
+        # csvファイルがなく、バイナリファイルだけがあるトレードを再開する場合は、バイナリファイルからcsvファイルを復元する
+        history_binary_path = thb.get_binary_path(self.trading_history_csv)
+        if not self.trading_history_csv.is_file() and history_binary_path.is_file():
+            thb.export_csv(history_binary_path, self.trading_history_csv)
+
+        # 新しいトレードの場合は履歴が空なので、サマリーも空の状態から更新していく
+        is_new_history = not self.trading_history_csv.is_file()
+
+        # トレード履歴の保存先を初期化する。SQLiteの場合もcsvファイルはサマリーなどの既存の処理のために同期して出力する
+        self.storage_type = storage_type
+        if self.storage_type == self.STORAGE_TYPE_SQLITE:
+            # peeweeはSQLiteに保存する場合だけ使うので、その場合だけ読み込む
+            import TradingHistoryDB as thdb
+            session = code_in_file + '_' + self.trading_start_date + '_' + training_start_datetime
+            db_path = None if output_dir is None else dir_path.joinpath(thdb.SQLiteTradingHistoryStorage.DEFAULT_DB_PATH.name)
+            storage = thdb.SQLiteTradingHistoryStorage(session, identifier, db_path, import_csv_path=self.trading_history_csv)
+        else:
+            storage = ths.CSVTradingHistoryStorage(self.trading_history_csv)
+
+        self.history_manifest = thm.TradingHistoryManifest(
+            None if output_dir is None else dir_path.joinpath(thm.TradingHistoryManifest.DEFAULT_MANIFEST_PATH.name))
+        self.history_binary = history_binary
+
+        # 既存の履歴は最初に1回だけ読み込み、以降の表示・メモ・サマリーはメモリ上の表から行う
+        self.history_storage = thtbl.TradingHistoryTable(storage, history_flush_count, history_flush_interval, self.__on_history_flushed)
 
         self.current_trading_info = cti.CurrentTradingInfoModel()
-        # TO DELETE
-        # self.__trading_info_history = collections.deque()
+        self.__snapshots = deque(maxlen=self.__MAX_LENGTH_OF_SNAPSHOTS)
+        self.__trading_summary = tsm.TradingSummary() if is_new_history else None
 
         self.current_trading_info.assets = assets
 
@@ -105,6 +165,8 @@ class Trading:
         self.amount_checker = amchkr.AmountChecker()
         self.action_mode = self.ACTION_MODE_FORBIDDEN
 
+        self.profiler = cprf.CommandProfiler()
+
     def one_order(self, trading_date:date, short_lot:int, long_lot:int, lot_size:int=100, order_time:int=0, 
                   stock_price:float=-1) -> Tuple[str, str]:
         """
@@ -119,119 +181,137 @@ class Trading:
         Returns:
             Tuple[str, str]: 'success'/'failure', 付属のメッセージ
         """
+        try:
+            result, message, prepared_order = self.prepare_order(trading_date, short_lot, long_lot, lot_size, order_time, stock_price)
+            if prepared_order is not None:
+                self.commit_order(prepared_order)
+            return result, message
+        except Exception as e:
+            print(traceback.format_exc())
+
+    def prepare_order(self, trading_date:date, short_lot:int, long_lot:int, lot_size:int=100, order_time:int=0,
+                      stock_price:float=-1, bar_position:int=None) -> Tuple[str, str, pord.PreparedOrder]:
+        """
+        1回の取引の内容を検証し、取引後の状態を作成する。トレードの状態とトレード履歴は変更しない（commit_order で反映する）
+        Args:
+            trading_date (date): 取引の日付
+            short_lot (int): 取引後に持っている空売りのロット数
+            long_lot (int): 取引後に持っている買いのロット数
+            lot_size (int): ロットサイズ
+            order_time (int): 注文タイミング（大引け:0、翌日寄付:1）
+            stock_price (float): 注文株価
+            bar_position (int, optional): 検索済みの株価データの行番号（大引けは取引の日付、翌日寄付は翌営業日。データがない場合は -1）. Defaults to None(ここで検索する).
+        Returns:
+            Tuple[str, str, PreparedOrder]: 'success'/'failure', 付属のメッセージ, 検証済みの取引（失敗した場合は None）
+        """
 
         RETURN_FAIL = 'failure'
         RETURN_SUCCESS = 'success'
 
-        try:
-            stock_data = None
+        if order_time == self.ORDER_TIME_CLOSE:
+            # 大引けでの注文
+            if bar_position is None:
+                bar_position = self.stock_info.find_bar_position(trading_date)
+            if bar_position < 0:
+                return RETURN_FAIL, "入力された日付のデータはない。その日は祝日か、取得期間外の日付かもしれない。", None
             
-            if order_time == self.ORDER_TIME_CLOSE:
-                # 大引けでの注文
-                stock_data = self.stock_info.stock_data_df[self.stock_info.stock_data_df.index == trading_date.strftime('%Y-%m-%d')]
-                if len(stock_data) == 0:
-                    return RETURN_FAIL, "入力された日付のデータはない。その日は祝日か、取得期間外の日付かもしれない。"
-                
-                if stock_price < 0:
-                    stock_price = float(stock_data['Close'].iloc[0])
-            else:
-                # 翌日寄付での注文
-                trading_date = trading_date + timedelta(days=1)
-                stock_data = self.stock_info.stock_data_df[self.stock_info.stock_data_df.index == trading_date.strftime('%Y-%m-%d')]
-
-                # 翌日のデータがない場合、休日の可能性があるので、更にデータを取れるまで次の日のデータを取ってみる。
-                # ただ、データの最後に来た可能性があるので、最大15日間で試す(15連休の可能性はない)
-                i = 1
-                while(len(stock_data) == 0 and i <= 15):
-                    trading_date = trading_date + timedelta(days=1)
-                    stock_data = self.stock_info.stock_data_df[self.stock_info.stock_data_df.index == trading_date.strftime('%Y-%m-%d')]
-                    i = i + 1
-
-                if len(stock_data) == 0:
-                    return RETURN_FAIL, "入力された日付の翌営業日のデータはない。取得期間外の日付かもしれない。"
-                
-                if stock_price < 0:
-                    stock_price = float(stock_data['Open'].iloc[0])
-            # print(stock_price)
-
-            # ショート注文の準備
-            short_lot_volumn = short_lot * lot_size
-            short_order_number = short_lot_volumn - self.current_trading_info.short_trading.number_now
-            short_profit = 0
-
-            # ロング注文の準備
-            long_lot_volumn = long_lot * lot_size
-            long_order_number = long_lot_volumn - self.current_trading_info.long_trading.number_now
-            long_profit = 0
-
-            # 総資産超過のチェック
-            short_order_amount = short_order_number * stock_price
-            long_order_amount = long_order_number * stock_price
-            check_result = self.amount_checker.check_amount(self.current_trading_info, short_order_amount, long_order_amount)
-
-            amount_check_message = ''
-
-            # チェックが通らない場合の処理
-            if check_result != amchkr.AmountChecker.CHECK_RESULT_OK:
-                amount_check_message = self.__asset_over_action(check_result, short_order_amount, long_order_amount)
-                if check_result == amchkr.AmountChecker.CHECK_RESULT_MARGIN_TRADING_LIMIT_OVER or self.action_mode == self.ACTION_MODE_FORBIDDEN:
-                    # 信用取引の限度を超えそうになった場合は何もしない
-                    # print(amount_check_message)
-                    return RETURN_FAIL, amount_check_message
-
-            # ショート注文の実行
-            if short_order_number > 0: 
-                self.current_trading_info.short_trading.short_sell(short_order_number, stock_price)
-            else:
-                short_profit = self.current_trading_info.short_trading.short_cover(0 - short_order_number, stock_price)
+            if stock_price < 0:
+                stock_price = self.stock_info.get_price(bar_position, 'Close')
+        else:
+            # 翌日寄付での注文
+            # 翌日のデータがない場合は休日の可能性があるので、データが存在する次の日を索引から取得する。
+            # ただ、データの最後に来た可能性があるので、最大15日間で探す(15連休の可能性はない)
+            if bar_position is None:
+                bar_position = self.stock_info.find_next_bar_position(trading_date)
+            if bar_position < 0:
+                return RETURN_FAIL, "入力された日付の翌営業日のデータはない。取得期間外の日付かもしれない。", None
+
+            trading_date = trading_date + timedelta(days=self.stock_info.get_bar_date(bar_position).toordinal() - trading_date.toordinal())
+            
+            if stock_price < 0:
+                stock_price = self.stock_info.get_price(bar_position, 'Open')
+        # print(stock_price)
+
+        # 取引後の状態は、現在の状態を複製して作成する（反映するまで現在の状態は変えない）
+        trading_info = self.current_trading_info.copy()
+
+        # ショート注文の準備
+        short_lot_volumn = short_lot * lot_size
+        short_order_number = short_lot_volumn - trading_info.short_trading.number_now
+        short_profit = 0
+
+        # ロング注文の準備
+        long_lot_volumn = long_lot * lot_size
+        long_order_number = long_lot_volumn - trading_info.long_trading.number_now
+        long_profit = 0
+
+        # 総資産超過のチェック
+        short_order_amount = short_order_number * stock_price
+        long_order_amount = long_order_number * stock_price
+        check_result = self.amount_checker.check_amount(trading_info, short_order_amount, long_order_amount)
+
+        amount_check_message = ''
+
+        # チェックが通らない場合の処理
+        if check_result != amchkr.AmountChecker.CHECK_RESULT_OK:
+            amount_check_message = self.__asset_over_action(check_result, short_order_amount, long_order_amount)
+            if check_result == amchkr.AmountChecker.CHECK_RESULT_MARGIN_TRADING_LIMIT_OVER or self.action_mode == self.ACTION_MODE_FORBIDDEN:
+                # 信用取引の限度を超えそうになった場合は何もしない
+                # print(amount_check_message)
+                return RETURN_FAIL, amount_check_message, None
+
+        # ショート注文の実行
+        if short_order_number > 0: 
+            trading_info.short_trading.short_sell(short_order_number, stock_price)
+        else:
+            short_profit = trading_info.short_trading.short_cover(0 - short_order_number, stock_price)
 
-            # ロング注文の実行
-            if long_order_number > 0:
-                self.current_trading_info.long_trading.buy(long_order_number, stock_price)
-            else:
-                long_profit = self.current_trading_info.long_trading.sell(0 - long_order_number, stock_price)
-
-            # 本取引の情報を最新取引情報として保存する
-            self.current_trading_info.trading_date = trading_date
-            self.current_trading_info.stock_price = stock_price
-            self.current_trading_info.short_lot = short_lot
-            # self.current_trading_info.short_order_number = short_order_number # TO DELETE
-            self.current_trading_info.long_lot = long_lot
-            # self.current_trading_info.long_order_number = long_order_number # TO DELETE
-            self.current_trading_info.short_profit = short_profit
-            self.current_trading_info.long_profit = long_profit
-            self.current_trading_info.lot_size = lot_size
-            self.current_trading_info.stock_code = self.stock_info.code
-
-            # 利益を総資産に加算
-            self.current_trading_info.assets = self.current_trading_info.assets + short_profit + long_profit
-
-            if short_order_number != 0 or long_order_number != 0:
-                # この配下の処理は取引が発生している場合のみ行う
-
-                # TO DELETE
-                # トレードの状態を履歴として保存する(現在最新の取引を含め、最大31件)
-                # if len(self.__trading_info_history) == self.__MAX_LENGTH_OF_HISTORY:
-                #     self.__trading_info_history.popleft()
-
-                # current_trading_info_tmp = copy.deepcopy(self.current_trading_info)
-                # self.__trading_info_history.append(current_trading_info_tmp)
-
-                # # トレードの状態を履歴として保存する処理の動作確認
-                # for current_trading_info_tmp in self.__trading_info_history:
-                #     print(str(current_trading_info_tmp.trading_date) + ' : ' + str(current_trading_info_tmp.assets))
-
-                # 取引記録のファイルを出力
-                # self.__output_transaction_input_to_csv()
-                self.__output_trading_info_to_csv()
-
-            # 総資産超過の警告メッセージを渡して本取引後のトレード状態を表示する。超過していない場合は警告メッセージが空文字列になる
-            # TO DELETE
-            # self.__display_transaction_detail(amount_check_message)
-
-            return RETURN_SUCCESS, amount_check_message
-        except Exception as e:
-            print(traceback.format_exc())
+        # ロング注文の実行
+        if long_order_number > 0:
+            trading_info.long_trading.buy(long_order_number, stock_price)
+        else:
+            long_profit = trading_info.long_trading.sell(0 - long_order_number, stock_price)
+
+        # 本取引の情報を最新取引情報として保存する
+        trading_info.trading_date = trading_date
+        trading_info.stock_price = stock_price
+        trading_info.short_lot = short_lot
+        # trading_info.short_order_number = short_order_number # TO DELETE
+        trading_info.long_lot = long_lot
+        # trading_info.long_order_number = long_order_number # TO DELETE
+        trading_info.short_profit = short_profit
+        trading_info.long_profit = long_profit
+        trading_info.lot_size = lot_size
+        trading_info.stock_code = self.stock_info.code
+
+        # 利益を総資産に加算
+        trading_info.assets = trading_info.assets + short_profit + long_profit
+
+        # 総資産超過の警告メッセージを渡して本取引後のトレード状態を表示する。超過していない場合は警告メッセージが空文字列になる
+        # 売買が発生している場合だけ、反映時にトレード履歴を出力する
+        prepared_order = pord.PreparedOrder(self.current_trading_info, trading_info, short_order_number != 0 or long_order_number != 0,
+                                            amount_check_message)
+        return RETURN_SUCCESS, amount_check_message, prepared_order
+
+    def commit_order(self, prepared_order:pord.PreparedOrder) -> None:
+        """
+        prepare_order で検証した取引をトレードの状態に反映し、売買が発生している場合はトレード履歴を出力する
+        Args:
+            prepared_order (PreparedOrder): 検証済みの取引
+        Returns:
+            None
+        """
+        if prepared_order.base_trading_info is not self.current_trading_info:
+            raise ValueError('取引の検証後にトレードの状態が変わったため、反映できません。')
+
+        self.current_trading_info = prepared_order.trading_info
+
+        if prepared_order.is_traded:
+            # この配下の処理は取引が発生している場合のみ行う
+
+            # 取引記録のファイルを出力
+            # self.__output_transaction_input_to_csv()
+            self.__output_trading_info_to_csv()
 
     def reset_trading_info(self, number: int) -> None:
         """
@@ -242,37 +322,34 @@ class Trading:
             None
         """
         try:
-            df = pd.read_csv(self.trading_history_csv, encoding="shift-jis")
+            row_count = self.history_storage.count()
             if number < 0:
-                # 負数を指定された場合でもそれ以降同じ処理を行わせるために、DataFrameにある該当の項番に変換する
-                number = len(df) + number - 1
+                # 負数を指定された場合でもそれ以降同じ処理を行わせるために、トレード履歴にある該当の項番に変換する
+                number = row_count + number - 1
 
-            if df.empty or number >= len(df) or number < 0:
+            if row_count == 0 or number >= row_count or number < 0:
                 print("指定された番号の取引履歴が存在しません。")
                 return
     
-            # 該当の取引情報を取得する
-            row = df.iloc[number]
-            self.current_trading_info = cti.CurrentTradingInfoModel()
-            self.current_trading_info.trading_date = datetime.strptime(row['取引日付'], '%Y-%m-%d').date()
-            self.current_trading_info.stock_price = float(row['株価'])
-            self.current_trading_info.short_lot = int(row['売りロット数'])
-            self.current_trading_info.short_profit = float(row['売り損益'])
-            self.current_trading_info.short_trading = st.ShortTrading()
-            self.current_trading_info.short_trading.number_now = int(row['売りロット数']) * int(row['ロットサイズ'])
-            self.current_trading_info.short_trading.total_amount_now = float(row['売り平均単価']) * self.current_trading_info.short_trading.number_now
-            self.current_trading_info.long_lot = int(row['買いロット数'])
-            self.current_trading_info.long_profit = float(row['買い損益'])
-            self.current_trading_info.long_trading = lt.LongTrading()    
-            self.current_trading_info.long_trading.number_now = int(row['買いロット数']) * int(row['ロットサイズ'])
-            self.current_trading_info.long_trading.total_amount_now = float(row['買い平均単価']) * self.current_trading_info.long_trading.number_now
-            self.current_trading_info.lot_size = int(row['ロットサイズ'])
-            self.current_trading_info.stock_code = row['銘柄コード']
-            self.current_trading_info.assets = float(row['総資産'])
+            # 該当の取引情報を取得する。スナップショットがあればトレード履歴を読み込まずに復元する
+            snapshot = self.__find_snapshot(number)
+            if snapshot is not None:
+                self.current_trading_info = snapshot.to_trading_info()
+            else:
+                with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+                    row = self.history_storage.get_row(number)
+                self.current_trading_info = self.__trading_info_from_row(row)
+
+            # 不要になったスナップショットを破棄する
+            while len(self.__snapshots) > 0 and self.__snapshots[-1].row_number > number:
+                self.__snapshots.pop()
     
-            # csvファイルから不要な行を削除する
-            df = df[:number + 1]
-            df.to_csv(self.trading_history_csv, index=False, encoding="shift-jis")
+            # トレード履歴から不要な行を削除する。メモリ上の表から削除するだけで、保存先の書き換えは後からまとめて行う
+            if number < row_count - 1:
+                with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+                    self.history_storage.truncate(number)
+                if self.__trading_summary is not None:
+                    self.__trading_summary.truncate(number)
     
         except Exception as e:
             print(f"CSVファイルの読み込みに失敗しました: {e}")
@@ -288,13 +365,13 @@ class Trading:
         print("※：番号が一番大きい項目は現在最新の状態です。")
     
         try:
-            df = pd.read_csv(self.trading_history_csv, encoding="shift-jis")
-            if df.empty:
+            with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+                rows = self.history_storage.get_tail(self.__MAX_LENGTH_OF_HISTORY)
+            if len(rows) == 0:
                 print("取引履歴がありません。")
                 return
     
-            rows_to_display = min(len(df), self.__MAX_LENGTH_OF_HISTORY)
-            for i, row in df.tail(rows_to_display).iterrows():
+            for i, row in rows:
                 print(f"{i} : {row['銘柄コード']}  {row['取引日付']}  {row['売りロット数']}-{row['買いロット数']} (size: {row['ロットサイズ']})  ¥{row['総資産']:,.1f}")
         except Exception as e:
             print(f"CSVファイルの読み込みに失敗しました: {e}")
@@ -308,29 +385,20 @@ class Trading:
             cti.CurrentTradingInfoModel: 取引の情報
         """
         try:
-            df = pd.read_csv(self.trading_history_csv, encoding="shift-jis")
-            if df.empty or number >= len(df):
+            if number < 0:
+                # 負数の場合は新しい取引から数える（DataFrameのilocと同じ扱い）
+                number = self.history_storage.count() + number
+
+            snapshot = self.__find_snapshot(number)
+            if snapshot is not None:
+                return snapshot.to_trading_info()
+
+            row = self.history_storage.get_row(number)
+            if row is None:
                 print("指定された番号の取引履歴が存在しません。")
                 return None
     
-            row = df.iloc[number]
-            trading_info = cti.CurrentTradingInfoModel()
-            trading_info.trading_date = datetime.strptime(row['取引日付'], '%Y-%m-%d').date()
-            trading_info.stock_price = float(row['株価'])
-            trading_info.short_lot = int(row['売りロット数'])
-            trading_info.short_profit = float(row['売り損益'])
-            trading_info.short_trading = st.ShortTrading()
-            trading_info.short_trading.number_now = int(row['売りロット数']) * int(row['ロットサイズ'])
-            trading_info.short_trading.total_amount_now = float(row['売り平均単価']) * trading_info.short_trading.number_now
-            trading_info.long_lot = int(row['買いロット数'])
-            trading_info.long_profit = float(row['買い損益'])
-            trading_info.long_trading = lt.LongTrading()    
-            trading_info.long_trading.number_now = int(row['買いロット数']) * int(row['ロットサイズ'])
-            trading_info.long_trading.total_amount_now = float(row['買い平均単価']) * trading_info.long_trading.number_now
-            trading_info.lot_size = int(row['ロットサイズ'])
-            trading_info.stock_code = row['銘柄コード']
-            trading_info.assets = float(row['総資産'])
-            return trading_info
+            return self.__trading_info_from_row(row)
         except Exception as e:
             print(f"CSVファイルの読み込みに失敗しました: {e}")
             return None
@@ -344,23 +412,17 @@ class Trading:
         Returns:
             int: 書き込む対象となった行番号。-1->書き込みに失敗
         """
-        df_trading_history_csv = pd.read_csv(self.trading_history_csv, encoding="shift-jis")
-        
-        # 該当行の番号を取得する
-        row = df_trading_history_csv.query('取引日付 == "' + memo_date.strftime('%Y-%m-%d') + '"')
+        with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+            # 該当行の番号を取得する
+            row_number = self.history_storage.find_row_number_by_date(memo_date.strftime('%Y-%m-%d'))
 
-        if len(row) > 0:
-            row_number = row.head(1).index.item()
+            if row_number >= 0:
+                # メモを書き込む
+                self.history_storage.set_memo(row_number, memo)
 
-            # メモを書き込む
-            df_trading_history_csv.at[row_number, 'メモ'] = memo
-
-            # csvに書き込む
-            df_trading_history_csv.to_csv(self.trading_history_csv, index=False, encoding="shift-jis")
-
-            return row_number
-        else:
-            return -1
+                return row_number
+            else:
+                return -1
 
     def take_memo_by_row_number(self, row_number:int, memo:str) -> str:
         """
@@ -371,22 +433,70 @@ class Trading:
         Returns:
             str: 書き込む対象となった行の取引日付(csvデータではインデックスとなる)。None->書き込みに失敗
         """
-        df_trading_history_csv = pd.read_csv(self.trading_history_csv, encoding="shift-jis")
+        with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+            row = self.history_storage.get_row(row_number)
 
-        df_row_count = len(df_trading_history_csv)
+            if row is not None:
+                date_str = row['取引日付']
 
-        if df_row_count > 0 and df_row_count > row_number:
-            date_str = df_trading_history_csv.at[row_number, '取引日付']
+                # メモを書き込む
+                self.history_storage.set_memo(row_number, memo)
 
-            # メモを書き込む
-            df_trading_history_csv.at[row_number, 'メモ'] = memo
+                return date_str
+            else:
+                return None
 
-            # csvに書き込む
-            df_trading_history_csv.to_csv(self.trading_history_csv, index=False, encoding="shift-jis")
+    def get_summary_dataframe(self) -> pd.DataFrame:
+        """
+        トレード履歴のサマリー（OutputAnalysis.summarize_trading_history と同じ形式）を取得する。
+        サマリーは行の追加・削除のたびに更新しているので、トレード履歴を読み込み直さない
+        Returns:
+            pd.DataFrame: 区切りごとのサマリー
+        """
+        if self.__trading_summary is None:
+            # 再開したトレードの場合は、既存のトレード履歴から1回だけ作成する
+            with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+                history_df = self.history_storage.to_dataframe()
+            self.__trading_summary = tsm.TradingSummary.from_dataframe(history_df)
 
-            return date_str
-        else:
-            return None
+        return self.__trading_summary.to_dataframe()
+
+    def sync_history_file(self) -> None:
+        """
+        トレード履歴をcsvファイルに出力し、サマリーなどcsvファイルを読み込む処理で最新の履歴を参照できるようにする。
+        csvファイルに直接保存している場合は、まだ書き込んでいない変更を書き込むだけ。
+        Returns:
+            None
+        """
+        try:
+            with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+                self.history_storage.export_csv(self.trading_history_csv)
+                if self.storage_type != self.STORAGE_TYPE_CSV:
+                    self.history_manifest.update(self.trading_history_csv)
+        except Exception as e:
+            print(f"CSVファイルへの出力に失敗しました: {e}")
+
+    def set_history_buffering(self, enabled:bool) -> None:
+        """
+        トレード履歴の変更を件数・間隔によらずまとめて書き込むかを設定する（バッチ実行用）。無効にした時点で溜まっている変更を書き込む
+        Args:
+            enabled (bool): まとめて書き込む場合はTrue
+        Returns:
+            None
+        """
+        with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+            self.history_storage.set_buffering(enabled)
+
+    def close(self) -> None:
+        """
+        トレード履歴をcsvファイルに出力したうえで、保存先を閉じる（指定された場合はバイナリファイルも出力する）
+        Returns:
+            None
+        """
+        self.set_history_buffering(False)
+        self.sync_history_file()
+        self.__write_history_binary()
+        self.history_storage.close()
 
     # ロットのサイズを計算する関数
     # TODO：クラスメソッドとして用意するのは少し違和感があるが、一旦このまま
@@ -455,9 +565,64 @@ class Trading:
             str(self.current_trading_info.assets)
         ]
 
-        with self.trading_history_csv.open('a', encoding='shift-jis', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(trading_info)
+        with self.profiler.phase(cprf.PHASE_HISTORY_IO):
+            row_number = self.history_storage.count()
+            self.history_storage.append(trading_info)
+
+        if self.__trading_summary is not None:
+            self.__trading_summary.append(self.current_trading_info.stock_code, trading_info[1], self.current_trading_info.lot_size,
+                self.current_trading_info.short_lot, self.current_trading_info.long_lot, self.current_trading_info.assets)
+
+        # 取り消し用に取引後の状態を保存する
+        self.__snapshots.append(tss.TradingSnapshot(row_number, self.current_trading_info))
+
+    # csvファイルに直接保存している場合は、トレード履歴の変更をcsvファイルに書き込んだ時点でマニフェストを更新する
+    def __on_history_flushed(self, last_row:list):
+        if self.storage_type == self.STORAGE_TYPE_CSV:
+            self.history_manifest.update(self.trading_history_csv, last_row)
+
+    # 指定された場合は、csvファイルと同じ内容のバイナリファイルを出力する。
+    # 全行を書き直すので、書き込みのたびではなく終了時に1回だけ行う（途中でcsvファイルを更新した後は、読み込む側がcsvファイルを読み込む）
+    def __write_history_binary(self):
+        if not self.history_binary:
+            return
+
+        try:
+            thb.write(self.history_storage.to_dataframe(), thb.get_binary_path(self.trading_history_csv), self.trading_history_csv)
+        except OSError as e:
+            # バイナリファイルがない・古い場合はcsvファイルを読み込むだけなので、メッセージを表示するだけにする
+            print(f"トレード履歴のバイナリファイルの出力に失敗しました: {e}")
+
+    # 指定した番号の行のスナップショットを取得する。保持していない場合は None
+    def __find_snapshot(self, number:int) -> tss.TradingSnapshot:
+        if len(self.__snapshots) == 0:
+            return None
+
+        position = number - self.__snapshots[0].row_number
+        if position < 0 or position >= len(self.__snapshots):
+            return None
+
+        return self.__snapshots[position]
+
+    # トレード履歴の行から取引の情報を復元する
+    def __trading_info_from_row(self, row:dict) -> cti.CurrentTradingInfoModel:
+        trading_info = cti.CurrentTradingInfoModel()
+        trading_info.trading_date = datetime.strptime(row['取引日付'], '%Y-%m-%d').date()
+        trading_info.stock_price = float(row['株価'])
+        trading_info.short_lot = int(row['売りロット数'])
+        trading_info.short_profit = float(row['売り損益'])
+        trading_info.short_trading = st.ShortTrading()
+        trading_info.short_trading.number_now = int(row['売りロット数']) * int(row['ロットサイズ'])
+        trading_info.short_trading.total_amount_now = float(row['売り平均単価']) * trading_info.short_trading.number_now
+        trading_info.long_lot = int(row['買いロット数'])
+        trading_info.long_profit = float(row['買い損益'])
+        trading_info.long_trading = lt.LongTrading()
+        trading_info.long_trading.number_now = int(row['買いロット数']) * int(row['ロットサイズ'])
+        trading_info.long_trading.total_amount_now = float(row['買い平均単価']) * trading_info.long_trading.number_now
+        trading_info.lot_size = int(row['ロットサイズ'])
+        trading_info.stock_code = row['銘柄コード']
+        trading_info.assets = float(row['総資産'])
+        return trading_info
 
     # 総資産超過のチェックが通らない時のメッセージを生成する
     def __asset_over_action(self, check_result:int, short_order_amount, long_order_amount):
@@ -0,0 +1,365 @@
+import argparse
+import json
+import os
+import re
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import TradingHistoryStorage as ths
+
+# トレード履歴のバイナリファイルの拡張子（csvファイルと同じ名前で、拡張子だけを変える）
+FILE_SUFFIX = '.bin'
+
+# ファイルの形式（スキーマ）のバージョン。形式を変えた場合は上げて、古いファイルを読み込まないようにする
+FORMAT_VERSION = 1
+
+# ファイルの先頭の識別子と、ヘッダー（JSON）の長さを表すバイト数
+MAGIC = b'TRDHIST\x00'
+HEADER_LENGTH_BYTES = 8
+
+# 圧縮レベル（zlib）
+COMPRESS_LEVEL = 6
+
+# 列ごとの格納方法
+#   dictionary: 重複のない値の一覧をヘッダーに持ち、値はその番号（int32）で格納する
+#   date: yyyy-mm-dd の日付を 1970-01-01 からの日数（int32）で格納する
+#   int64, float64: 数値をそのまま格納する
+#   string: 各値の文字数（int32。値がない場合は -1）と、全値を連結したUTF-8の文字列で格納する
+# 格納方法の条件に合わない値がある列（数値でない値がある列など）は、値を失わないように float64 か string で格納する
+COLUMN_ENCODINGS = {
+    '銘柄コード': 'dictionary',
+    '取引日付': 'date',
+    '株価': 'float64',
+    'ロットサイズ': 'int64',
+    '売りロット数': 'int64',
+    '売り平均単価': 'float64',
+    '売り損益': 'float64',
+    '買いロット数': 'int64',
+    '買い平均単価': 'float64',
+    '買い損益': 'float64',
+    '総資産': 'float64',
+    'メモ': 'string',
+}
+
+_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+def get_binary_path(csv_path) -> Path:
+    """
+    トレード履歴のcsvファイルに対応するバイナリファイルのパスを取得する
+    Args:
+        csv_path (Path): トレード履歴のcsvファイル
+    Returns:
+        Path: バイナリファイル（csvファイルと同じフォルダ・名前で、拡張子が .bin）
+    """
+    return Path(csv_path).with_suffix(FILE_SUFFIX)
+
+def is_binary_path(path) -> bool:
+    """
+    トレード履歴のバイナリファイルのパスかを判定する
+    Args:
+        path (Path): ファイルのパス
+    Returns:
+        bool: 拡張子が .bin の場合はTrue
+    """
+    return Path(path).suffix == FILE_SUFFIX
+
+def write(df:pd.DataFrame, binary_path, source_path=None) -> int:
+    """
+    トレード履歴を列ごとに圧縮したバイナリファイルに書き込む。書き込み途中のファイルを読まれないように、一時ファイルに書いてから置き換える
+    Args:
+        df (pd.DataFrame): トレード履歴（トレード履歴のcsvファイルと同じ列）
+        binary_path (Path): 出力先のバイナリファイル
+        source_path (Path, optional): 同じ内容のcsvファイル。指定した場合は、csvファイルが更新されていない間だけ
+            csvファイルの代わりにバイナリファイルを読み込む. Defaults to None.
+    Returns:
+        int: 書き込んだバイト数
+    """
+    columns = []
+    segments = []
+    position = 0
+    for column in df.columns:
+        entry, column_segments = _encode_column(str(column), df[column])
+        entry['segments'] = {}
+        for name, (raw, itemsize) in column_segments.items():
+            compressed = zlib.compress(_shuffle(raw, itemsize), COMPRESS_LEVEL)
+            entry['segments'][name] = {'offset': position, 'length': len(compressed), 'raw_length': len(raw), 'itemsize': itemsize}
+            segments.append(compressed)
+            position = position + len(compressed)
+        columns.append(entry)
+
+    source = None
+    if source_path is not None:
+        stat = os.stat(source_path)
+        source = {'name': Path(source_path).name, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    header = json.dumps({'version': FORMAT_VERSION, 'rows': len(df), 'source': source, 'columns': columns},
+                        ensure_ascii=False).encode('utf-8')
+
+    binary_path = Path(binary_path)
+    tmp_path = binary_path.with_name(binary_path.name + '.tmp')
+    with tmp_path.open('wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(HEADER_LENGTH_BYTES, 'little'))
+        f.write(header)
+        for segment in segments:
+            f.write(segment)
+    os.replace(tmp_path, binary_path)
+
+    return len(MAGIC) + HEADER_LENGTH_BYTES + len(header) + position
+
+def read(binary_path, columns:list=None) -> pd.DataFrame:
+    """
+    バイナリファイルからトレード履歴を読み込む
+    Args:
+        binary_path (Path): トレード履歴のバイナリファイル
+        columns (list, optional): 読み込む列（指定した列だけを展開する）. Defaults to None(全列).
+    Returns:
+        pd.DataFrame: トレード履歴（csvファイルと同じ列名。整数・小数の列は数値、それ以外は文字列で、メモがない行は NaN）
+    """
+    header, data = _read_file(binary_path)
+
+    entries = header['columns']
+    if columns is not None:
+        entries_by_name = {entry['name']: entry for entry in entries}
+        missing = [column for column in columns if column not in entries_by_name]
+        if len(missing) > 0:
+            raise ValueError(f"トレード履歴のバイナリファイルに列がありません: {missing}")
+        # pd.read_csv の usecols と同じく、ファイル内の列の順番で返す
+        entries = [entry for entry in entries if entry['name'] in columns]
+
+    # 列の配列は展開したばかりで他から参照されないので、コピーせずに使う
+    return pd.DataFrame({entry['name']: _decode_column(entry, data, header['rows']) for entry in entries},
+                        columns=[entry['name'] for entry in entries], copy=False)
+
+def read_last_row(binary_path) -> list:
+    """
+    バイナリファイルの最後の行を取得する（トレード再開の一覧用。TradingHistoryManifest.read_last_row と同じ形式）
+    Args:
+        binary_path (Path): トレード履歴のバイナリファイル
+    Returns:
+        list: 最後の行（HEADERの順。ファイルにない列は None）。取引がない場合は None
+    """
+    df = read(binary_path, ['銘柄コード', '取引日付', '総資産'])
+    if len(df) == 0:
+        return None
+
+    row = df.iloc[-1]
+    return [row[column] if column in df.columns else None for column in ths.HEADER]
+
+def is_up_to_date(binary_path, csv_path) -> bool:
+    """
+    バイナリファイルが、csvファイルから（またはcsvファイルと同時に）作成した後にcsvファイルが更新されていないかを判定する
+    Args:
+        binary_path (Path): トレード履歴のバイナリファイル
+        csv_path (Path): 同じトレード履歴のcsvファイル
+    Returns:
+        bool: バイナリファイルをcsvファイルの代わりに読み込める場合はTrue
+    """
+    try:
+        header, _ = _read_file(binary_path, header_only=True)
+        stat = os.stat(csv_path)
+    except (OSError, ValueError):
+        return False
+
+    source = header.get('source')
+    return source is not None and source.get('name') == Path(csv_path).name \
+        and source.get('size') == stat.st_size and source.get('mtime_ns') == stat.st_mtime_ns
+
+def read_trading_history(path, columns:list=None) -> pd.DataFrame:
+    """
+    トレード履歴を読み込む。バイナリファイルを指定した場合はバイナリファイルから、csvファイルを指定した場合は、
+    同じ名前のバイナリファイルがありcsvファイルが更新されていなければバイナリファイルから、それ以外はcsvファイルから読み込む
+    Args:
+        path (Path): トレード履歴のcsvファイル、またはバイナリファイル
+        columns (list, optional): 読み込む列. Defaults to None(全列).
+    Returns:
+        pd.DataFrame: トレード履歴
+    """
+    if is_binary_path(path):
+        return read(path, columns)
+
+    binary_path = get_binary_path(path)
+    if binary_path.is_file() and is_up_to_date(binary_path, path):
+        try:
+            return read(binary_path, columns)
+        except (OSError, ValueError, zlib.error) as e:
+            # バイナリファイルが壊れている場合などは、csvファイルを読み込む
+            print(f"トレード履歴のバイナリファイルを読み込めませんでした: {e}")
+
+    return pd.read_csv(path, encoding=ths.CSV_ENCODING, usecols=columns)
+
+def convert_csv(csv_path, binary_path=None) -> Path:
+    """
+    トレード履歴のcsvファイルをバイナリファイルに変換する（値は変えずに、csvファイルに戻すことができる）
+    Args:
+        csv_path (Path): トレード履歴のcsvファイル
+        binary_path (Path, optional): 出力先のバイナリファイル. Defaults to None(csvファイルと同じ名前の .bin).
+    Returns:
+        Path: 出力したバイナリファイル
+    """
+    binary_path = get_binary_path(csv_path) if binary_path is None else Path(binary_path)
+    # 数値は書き出した時と同じ値に戻るように読み込み、文字列の列は「NA」などのメモも値がないものとして扱わない
+    df = pd.read_csv(csv_path, encoding=ths.CSV_ENCODING, float_precision='round_trip',
+                     dtype={column: str for column, encoding in COLUMN_ENCODINGS.items() if encoding in ['dictionary', 'date', 'string']},
+                     keep_default_na=False, na_values=[''])
+    write(df, binary_path, csv_path)
+    return binary_path
+
+def export_csv(binary_path, csv_path=None) -> Path:
+    """
+    バイナリファイルのトレード履歴を、トレード履歴のcsvファイルの形式で出力する
+    Args:
+        binary_path (Path): トレード履歴のバイナリファイル
+        csv_path (Path, optional): 出力先のcsvファイル. Defaults to None(バイナリファイルと同じ名前の .csv).
+    Returns:
+        Path: 出力したcsvファイル
+    """
+    csv_path = Path(binary_path).with_suffix('.csv') if csv_path is None else Path(csv_path)
+    read(binary_path).to_csv(csv_path, index=False, encoding=ths.CSV_ENCODING)
+    return csv_path
+
+def _read_file(binary_path, header_only:bool=False) -> tuple:
+    """
+    バイナリファイルのヘッダーと、列のデータの部分を読み込む
+    """
+    with open(binary_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"トレード履歴のバイナリファイルではありません: {binary_path}")
+        header_length = int.from_bytes(f.read(HEADER_LENGTH_BYTES), 'little')
+        header = json.loads(f.read(header_length).decode('utf-8'))
+        if header.get('version') != FORMAT_VERSION:
+            raise ValueError(f"トレード履歴のバイナリファイルの形式のバージョンが異なります: {header.get('version')}")
+        data = None if header_only else f.read()
+    return header, data
+
+def _encode_column(name:str, series:pd.Series) -> tuple:
+    """
+    列を格納方法に応じたバイト列に変換する
+    Returns:
+        tuple: (ヘッダーに記録する列の情報, セグメント名 → (バイト列, 要素のバイト数))
+    """
+    encoding = COLUMN_ENCODINGS.get(name, 'string')
+    values = series.to_numpy()
+    is_empty = len(values) == 0
+
+    if encoding == 'int64':
+        if is_empty or values.dtype.kind in 'iu':
+            return {'name': name, 'encoding': 'int64'}, {'values': (values.astype('<i8').tobytes(), 8)}
+        encoding = 'float64'
+
+    if encoding == 'float64':
+        if is_empty or values.dtype.kind in 'iuf':
+            return {'name': name, 'encoding': 'float64'}, {'values': (values.astype('<f8').tobytes(), 8)}
+        encoding = 'string'
+
+    if encoding == 'date' and all(isinstance(value, str) and _DATE_PATTERN.match(value) for value in values):
+        try:
+            day_numbers = np.array(values, dtype='datetime64[D]')
+        except ValueError:
+            day_numbers = None
+        # 日付として正しくない値（2015-02-30 など）は、元の文字列に戻らないので文字列のまま格納する
+        if day_numbers is not None and (is_empty or np.array_equal(day_numbers.astype(str), values.astype(str))):
+            return {'name': name, 'encoding': 'date'}, {'values': (day_numbers.astype(np.int64).astype('<i4').tobytes(), 4)}
+    if encoding == 'date':
+        encoding = 'string'
+
+    strings = [None if _is_null(value) else str(value) for value in values]
+    if encoding == 'dictionary':
+        indexes, categories = pd.factorize(pd.Series(strings, dtype=object), use_na_sentinel=True)
+        return {'name': name, 'encoding': 'dictionary', 'categories': [str(category) for category in categories]}, \
+            {'values': (indexes.astype('<i4').tobytes(), 4)}
+
+    lengths = np.array([-1 if value is None else len(value) for value in strings], dtype='<i4')
+    text = ''.join(value for value in strings if value is not None).encode('utf-8')
+    return {'name': name, 'encoding': 'string'}, {'lengths': (lengths.tobytes(), 4), 'text': (text, 1)}
+
+def _decode_column(entry:dict, data:bytes, rows:int):
+    """
+    格納方法に応じて列の値を復元する
+    """
+    segments = entry['segments']
+    encoding = entry['encoding']
+
+    if encoding == 'int64':
+        return _read_segment(data, segments['values'], np.dtype('<i8'))
+    if encoding == 'float64':
+        return _read_segment(data, segments['values'], np.dtype('<f8'))
+    if encoding == 'date':
+        # 同じ日付の行が多いので、日付ごとに1回だけ文字列にする
+        unique_days, inverse = np.unique(_read_segment(data, segments['values'], np.dtype('<i4')), return_inverse=True)
+        return unique_days.astype('datetime64[D]').astype(str).astype(object)[inverse]
+    if encoding == 'dictionary':
+        indexes = _read_segment(data, segments['values'], np.dtype('<i4'))
+        categories = np.array(entry['categories'] + [np.nan], dtype=object)
+        # 値がない行（-1）は、一覧の最後に追加した NaN を指す
+        return categories[indexes]
+    if encoding == 'string':
+        lengths = _read_segment(data, segments['lengths'], np.dtype('<i4'))
+        values = np.full(rows, np.nan, dtype=object)
+        # メモなどは値がない行がほとんどなので、値がある行だけを切り出す
+        positions = np.flatnonzero(lengths >= 0)
+        text = _read_segment(data, segments['text']).decode('utf-8')
+        ends = np.cumsum(lengths[positions], dtype=np.int64).tolist()
+        values[positions] = [text[end - length:end] for length, end in zip(lengths[positions].tolist(), ends)]
+        return values
+
+    raise ValueError(f"トレード履歴のバイナリファイルの列の格納方法が不明です: {encoding}")
+
+def _read_segment(data:bytes, segment:dict, dtype:np.dtype=None):
+    """
+    セグメントを展開する。dtype を指定した場合は、その型の配列（書き換え可能）として返す
+    """
+    raw = zlib.decompress(memoryview(data)[segment['offset']:segment['offset'] + segment['length']])
+    if len(raw) != segment['raw_length'] or (dtype is not None and len(raw) % dtype.itemsize != 0):
+        raise ValueError('トレード履歴のバイナリファイルが壊れています')
+    if dtype is None:
+        return raw
+    return _unshuffle(raw, segment['itemsize']).view(dtype).reshape(-1)
+
+def _shuffle(raw:bytes, itemsize:int) -> bytes:
+    """
+    数値の配列のバイトを、要素内の位置ごとに並べ替える（上位のバイトがそろうので圧縮しやすくなる）
+    """
+    if itemsize <= 1:
+        return raw
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, itemsize).T.tobytes()
+
+def _unshuffle(raw:bytes, itemsize:int) -> np.ndarray:
+    """
+    _shuffle で並べ替えたバイトを元に戻す（要素ごとのバイトを行とした、書き換え可能な配列で返す）
+    """
+    return np.ascontiguousarray(np.frombuffer(raw, dtype=np.uint8).reshape(max(itemsize, 1), -1).T)
+
+def _is_null(value) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='トレード履歴のcsvファイルを、列ごとに圧縮したバイナリファイル（.bin）に変換します（-r の場合はcsvファイルに戻します）')
+    parser.add_argument('files', nargs='*', help='変換するファイル。省略した場合は、フォルダ内の全トレード履歴（trading_history_*）')
+    parser.add_argument('-d', '--dir', help='トレード履歴のフォルダ。デフォルトはoutput')
+    parser.add_argument('-r', '--reverse', action='store_true', help='バイナリファイルをcsvファイルに戻す')
+    args = parser.parse_args()
+
+    suffix = FILE_SUFFIX if args.reverse else '.csv'
+    files = [Path(file) for file in args.files] if len(args.files) > 0 \
+        else sorted(Path('output' if args.dir == None else args.dir).glob('trading_history_*' + suffix))
+
+    converted_count = 0
+    for file in files:
+        try:
+            if args.reverse:
+                output_path = export_csv(file)
+            elif get_binary_path(file).is_file() and is_up_to_date(get_binary_path(file), file):
+                # 変換後にcsvファイルが更新されていない場合は変換し直さない
+                continue
+            else:
+                output_path = convert_csv(file)
+            converted_count = converted_count + 1
+            print(f"{file} → {output_path}")
+        except Exception as e:
+            print(f"{file} の変換に失敗しました: {e}")
+
+    print(f"{converted_count}件のファイルを変換しました。")
@@ -0,0 +1,209 @@
+from pathlib import Path
+
+import pandas as pd
+from peewee import CharField
+from peewee import FloatField
+from peewee import IntegerField
+from peewee import Model
+from peewee import SqliteDatabase
+from peewee import TextField
+from peewee import chunked
+from peewee import fn
+
+import TradingHistoryStorage as ths
+
+# トレード履歴のデータベース。ファイルのパスは SQLiteTradingHistoryStorage の初期化時に設定する
+database = SqliteDatabase(None)
+
+class TradingHistoryRecord(Model):
+    """
+    トレード履歴の1行（1取引）
+    """
+    session = CharField()           # トレード練習のセッション（[銘柄コード]_[株データの開始日]_[トレード練習実施開始日時分秒]）
+    mode = CharField()              # 注文方式（close/open/opcl）
+    row_number = IntegerField()     # セッション・注文方式ごとの行番号（最初の行は0）
+    code = CharField()              # 銘柄コード
+    trading_date = CharField()      # 取引日付（yyyy-mm-dd形式）
+    stock_price = FloatField()      # 株価
+    lot_size = IntegerField()       # ロットサイズ
+    short_lot = IntegerField()      # 売りロット数
+    short_avg_price = FloatField()  # 売り平均単価
+    short_profit = FloatField()     # 売り損益
+    long_lot = IntegerField()       # 買いロット数
+    long_avg_price = FloatField()   # 買い平均単価
+    long_profit = FloatField()      # 買い損益
+    assets = FloatField()           # 総資産
+    memo = TextField(null=True)     # メモ
+
+    class Meta:
+        database = database
+        table_name = 'trading_history'
+        indexes = (
+            (('session', 'mode', 'row_number'), True),
+            (('session', 'mode', 'trading_date'), False),
+            (('code',), False),
+        )
+
+# データベースの列とトレード履歴の列との対応（HEADERの順）
+_FIELD_NAMES = ['code', 'trading_date', 'stock_price', 'lot_size', 'short_lot', 'short_avg_price', 'short_profit',
+                'long_lot', 'long_avg_price', 'long_profit', 'assets', 'memo']
+
+class SQLiteTradingHistoryStorage(ths.TradingHistoryStorage):
+
+    # セッション・注文方式
+    session:str
+    mode:str
+
+    DEFAULT_DB_PATH = Path('output').joinpath('trading_history.db')
+
+    # 溜まっている行をまとめて書き込む際の、1回のINSERTあたりの行数
+    INSERT_BATCH_SIZE = 100
+
+    def __init__(self, session:str, mode:str, db_path:Path=None, import_csv_path:Path=None) -> None:
+        """
+        トレード履歴をSQLiteのデータベースに保存する。セッション・注文方式・銘柄コード・取引日付に索引を付け、
+        行の取得・更新・削除をファイル全体の読み書きなしで行う。
+        Args:
+            session (str): トレード練習のセッション
+            mode (str): 注文方式（close/open/opcl）
+            db_path (Path, optional): データベースのファイル. Defaults to 'output/trading_history.db'.
+            import_csv_path (Path, optional): データベースに該当セッションの履歴がない場合に取り込むCSVファイル（CSVで保存していたトレードの再開用）. Defaults to None.
+        Returns:
+            None
+        """
+        self.session = session
+        self.mode = mode
+
+        # 追記をまとめて書き込む場合に溜めておく行
+        self.__is_buffering = False
+        self.__buffered_values = []
+
+        if database.is_closed() and database.database is None:
+            database.init(str(self.DEFAULT_DB_PATH if db_path is None else db_path), pragmas={'journal_mode': 'wal'})
+        database.connect(reuse_if_open=True)
+        database.create_tables([TradingHistoryRecord], safe=True)
+
+        self.__row_count = self.__query().count()
+
+        if self.__row_count == 0 and import_csv_path is not None and Path(import_csv_path).is_file():
+            self.import_csv(import_csv_path)
+
+    def import_csv(self, csv_path:Path) -> None:
+        """
+        CSVファイルのトレード履歴を取り込む
+        Args:
+            csv_path (Path): 取り込むCSVファイル
+        Returns:
+            None
+        """
+        df = pd.read_csv(csv_path, encoding=ths.CSV_ENCODING)
+        is_buffering = self.__is_buffering
+        self.set_buffering(True)
+        for _, row in df.iterrows():
+            self.append([row[column] for column in ths.HEADER])
+        self.set_buffering(is_buffering)
+
+    def append(self, row:list) -> None:
+        values = self.__to_record_values(row)
+        values['session'] = self.session
+        values['mode'] = self.mode
+        values['row_number'] = self.__row_count
+        if self.__is_buffering:
+            self.__buffered_values.append(values)
+        else:
+            TradingHistoryRecord.insert(values).execute()
+        self.__row_count = self.__row_count + 1
+
+    def count(self) -> int:
+        return self.__row_count
+
+    def get_row(self, number:int) -> dict:
+        self.__flush_buffer()
+        record = self.__query().where(TradingHistoryRecord.row_number == number).first()
+        if record is None:
+            return None
+
+        return self.__to_row(record)
+
+    def get_tail(self, length:int) -> list:
+        self.__flush_buffer()
+        records = self.__query().where(TradingHistoryRecord.row_number >= self.__row_count - length) \
+            .order_by(TradingHistoryRecord.row_number)
+        return [(record.row_number, self.__to_row(record)) for record in records]
+
+    def find_row_number_by_date(self, date_str:str) -> int:
+        self.__flush_buffer()
+        row_number = self.__query(fn.MIN(TradingHistoryRecord.row_number)) \
+            .where(TradingHistoryRecord.trading_date == date_str).scalar()
+        return -1 if row_number is None else row_number
+
+    def set_memo(self, number:int, memo:str) -> bool:
+        self.__flush_buffer()
+        updated_count = TradingHistoryRecord.update(memo=memo) \
+            .where((TradingHistoryRecord.session == self.session) & (TradingHistoryRecord.mode == self.mode)
+                   & (TradingHistoryRecord.row_number == number)).execute()
+        return updated_count > 0
+
+    def truncate(self, number:int) -> None:
+        self.__flush_buffer()
+        TradingHistoryRecord.delete() \
+            .where((TradingHistoryRecord.session == self.session) & (TradingHistoryRecord.mode == self.mode)
+                   & (TradingHistoryRecord.row_number > number)).execute()
+        self.__row_count = self.__query().count()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        self.__flush_buffer()
+        records = self.__query().order_by(TradingHistoryRecord.row_number)
+        return pd.DataFrame([self.__to_row(record) for record in records], columns=ths.HEADER)
+
+    def set_buffering(self, enabled:bool) -> None:
+        if not enabled:
+            self.__flush_buffer()
+        self.__is_buffering = enabled
+
+    def close(self) -> None:
+        self.set_buffering(False)
+        if not database.is_closed():
+            database.close()
+
+    def __flush_buffer(self):
+        """
+        溜まっている行を1つのトランザクションでまとめて書き込む
+        """
+        if len(self.__buffered_values) == 0:
+            return
+
+        with database.atomic():
+            for values in chunked(self.__buffered_values, self.INSERT_BATCH_SIZE):
+                TradingHistoryRecord.insert_many(values).execute()
+        self.__buffered_values = []
+
+    def __query(self, *fields):
+        """
+        本セッション・注文方式の行を対象とするクエリを作成する
+        """
+        return TradingHistoryRecord.select(*fields) \
+            .where((TradingHistoryRecord.session == self.session) & (TradingHistoryRecord.mode == self.mode))
+
+    def __to_record_values(self, row:list) -> dict:
+        """
+        トレード履歴の行（HEADERの順）をデータベースの列の値に変換する
+        """
+        values = {}
+        for field_name, value in zip(_FIELD_NAMES, row):
+            field = TradingHistoryRecord._meta.fields[field_name]
+            if field_name == 'memo':
+                values[field_name] = None if pd.isna(value) else str(value)
+            elif isinstance(field, IntegerField):
+                values[field_name] = int(float(value))
+            elif isinstance(field, FloatField):
+                values[field_name] = float(value)
+            else:
+                values[field_name] = str(value)
+        return values
+
+    def __to_row(self, record:TradingHistoryRecord) -> dict:
+        """
+        データベースの行をトレード履歴の行（列名をキーとした辞書）に変換する
+        """
+        return {column: getattr(record, field_name) for column, field_name in zip(ths.HEADER, _FIELD_NAMES)}
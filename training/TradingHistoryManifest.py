@@ -0,0 +1,169 @@
+import csv
+import json
+import os
+from pathlib import Path
+
+import TradingHistoryBinary as thb
+import TradingHistoryStorage as ths
+
+class TradingHistoryManifest:
+
+    # マニフェストファイル
+    manifest_path:Path
+
+    # マニフェストの形式のバージョン。形式を変えた場合は上げて、古いマニフェストを使わないようにする
+    MANIFEST_FORMAT_VERSION = 1
+
+    DEFAULT_MANIFEST_PATH = Path('output').joinpath('trading_history_manifest.json')
+
+    # ファイルの末尾から読み込む際の1回あたりのバイト数
+    TAIL_BLOCK_SIZE = 4096
+
+    def __init__(self, manifest_path:Path=None) -> None:
+        """
+        トレード履歴のcsvファイルごとに、最後の行の情報（銘柄コード・取引日付・総資産）を記録するマニフェスト。
+        トレード再開の候補を一覧にする際に、csvファイル全体を読み込まずに済むようにする。
+        記録はcsvファイルの更新時刻・サイズに紐付けて、一致しない場合（マニフェストが古い場合）は使わない。
+        Args:
+            manifest_path (Path, optional): マニフェストファイル. Defaults to 'output/trading_history_manifest.json'.
+        Returns:
+            None
+        """
+        self.manifest_path = self.DEFAULT_MANIFEST_PATH if manifest_path is None else Path(manifest_path)
+
+    def load(self) -> dict:
+        """
+        マニフェストを読み込む
+        Returns:
+            dict: csvファイル名 → 最後の行の情報。マニフェストがない、または読み込めない場合は空
+        """
+        if not self.manifest_path.is_file():
+            return {}
+
+        try:
+            with self.manifest_path.open('r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get('version') != self.MANIFEST_FORMAT_VERSION:
+            return {}
+
+        return manifest.get('files', {})
+
+    def save(self, entries:dict) -> None:
+        """
+        マニフェストを書き込む。書き込み途中のファイルを読まれないように、一時ファイルに書いてから置き換える
+        Args:
+            entries (dict): csvファイル名 → 最後の行の情報
+        Returns:
+            None
+        """
+        tmp_path = self.manifest_path.with_name(self.manifest_path.name + '.tmp')
+        try:
+            with tmp_path.open('w', encoding='utf-8') as f:
+                json.dump({'version': self.MANIFEST_FORMAT_VERSION, 'files': entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            # マニフェストがなくてもトレード再開の一覧はcsvファイルから作れるので、メッセージを表示するだけにする
+            print(f"トレード履歴のマニフェストの保存に失敗しました: {e}")
+
+    def get_valid_entry(self, entries:dict, csv_path:Path) -> dict:
+        """
+        csvファイルに対応した最後の行の情報を、csvファイルが更新されていない場合だけ取得する
+        Args:
+            entries (dict): load() で読み込んだマニフェスト
+            csv_path (Path): トレード履歴のcsvファイル
+        Returns:
+            dict: 最後の行の情報。記録がない、または古い場合は None
+        """
+        entry = entries.get(Path(csv_path).name)
+        if entry is None:
+            return None
+
+        try:
+            stat = os.stat(csv_path)
+        except OSError:
+            return None
+
+        if entry.get('size') != stat.st_size or entry.get('mtime_ns') != stat.st_mtime_ns:
+            return None
+
+        return entry
+
+    def build_entry(self, csv_path:Path, last_row:list=None) -> dict:
+        """
+        csvファイルの最後の行の情報を作成する
+        Args:
+            csv_path (Path): トレード履歴のcsvファイル（またはバイナリファイル）
+            last_row (list, optional): 最後の行（HEADERの順）。省略した場合はファイルの末尾から読み込む. Defaults to None.
+        Returns:
+            dict: 最後の行の情報（取引がない場合は last_row が None）
+        """
+        stat = os.stat(csv_path)
+        if last_row is None:
+            last_row = thb.read_last_row(csv_path) if thb.is_binary_path(csv_path) else self.read_last_row(csv_path)
+
+        entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'last_row': None}
+        if last_row is not None:
+            entry['last_row'] = {
+                'code': str(last_row[ths.HEADER.index('銘柄コード')]),
+                'trading_date': str(last_row[ths.HEADER.index('取引日付')]),
+                'assets': float(last_row[ths.HEADER.index('総資産')]),
+            }
+        return entry
+
+    def update(self, csv_path:Path, last_row:list=None) -> None:
+        """
+        csvファイルの最後の行の情報を記録する（トレード履歴の追記・削除・書き直しの後に呼び出す）
+        Args:
+            csv_path (Path): トレード履歴のcsvファイル
+            last_row (list, optional): 最後の行（HEADERの順）。省略した場合はファイルの末尾から読み込む. Defaults to None.
+        Returns:
+            None
+        """
+        try:
+            entry = self.build_entry(csv_path, last_row)
+        except (OSError, ValueError, IndexError) as e:
+            print(f"トレード履歴のマニフェストの更新に失敗しました: {e}")
+            return
+
+        # 同じセッションの他の注文方式のファイルも同じマニフェストを更新するので、書き込む直前に読み込み直す
+        entries = self.load()
+        entries[Path(csv_path).name] = entry
+        self.save(entries)
+
+    @classmethod
+    def read_last_row(cls, csv_path:Path) -> list:
+        """
+        csvファイルの最後の行を、ファイルの末尾からさかのぼって読み込む（ファイル全体は読み込まない）
+        Args:
+            csv_path (Path): トレード履歴のcsvファイル
+        Returns:
+            list: 最後の行（HEADERの順）。ヘッダーしかない場合は None
+        """
+        with open(csv_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b''
+
+            # 末尾の改行を除いて、改行が見つかるまでさかのぼる（Shift-JISの2バイト目に改行のバイトは現れない）
+            while position > 0:
+                read_size = min(cls.TAIL_BLOCK_SIZE, position)
+                position = position - read_size
+                f.seek(position)
+                data = f.read(read_size) + data
+                if b'\n' in data.rstrip(b'\r\n'):
+                    break
+
+        lines = data.rstrip(b'\r\n').split(b'\n')
+        if position == 0 and len(lines) <= 1:
+            # ヘッダーしかない
+            return None
+
+        last_line = lines[-1].rstrip(b'\r').decode(ths.CSV_ENCODING)
+        row = next(csv.reader([last_line]))
+        if row[:len(ths.HEADER) - 1] == ths.HEADER[:-1]:
+            return None
+
+        return row
@@ -0,0 +1,282 @@
+import csv
+import io
+import os
+from pathlib import Path
+
+import pandas as pd
+
+# トレード履歴の列
+HEADER = ['銘柄コード', '取引日付', '株価', 'ロットサイズ', '売りロット数', '売り平均単価', '売り損益', '買いロット数', '買い平均単価', '買い損益', '総資産', 'メモ']
+
+# トレード履歴のCSVファイルのエンコーディング
+CSV_ENCODING = 'shift-jis'
+
+class TradingHistoryStorage:
+
+    def append(self, row:list) -> None:
+        """
+        トレード履歴に1行追加する
+        Args:
+            row (list): 追加する行（HEADERの順。メモの列は省略可）
+        Returns:
+            None
+        """
+        raise NotImplementedError()
+
+    def count(self) -> int:
+        """
+        トレード履歴の行数を取得する
+        Returns:
+            int: 行数
+        """
+        raise NotImplementedError()
+
+    def get_row(self, number:int) -> dict:
+        """
+        指定した番号の行を取得する
+        Args:
+            number (int): 行番号（最初の行は0）
+        Returns:
+            dict: 列名をキーとした行の値。該当する行がない場合は None
+        """
+        raise NotImplementedError()
+
+    def get_tail(self, length:int) -> list:
+        """
+        最新の行から指定した件数の行を取得する
+        Args:
+            length (int): 取得する件数
+        Returns:
+            list: (行番号, 列名をキーとした行の値) のリスト（行番号の昇順）
+        """
+        raise NotImplementedError()
+
+    def find_row_number_by_date(self, date_str:str) -> int:
+        """
+        指定した取引日付の最初の行の番号を取得する
+        Args:
+            date_str (str): 取引日付（yyyy-mm-dd形式）
+        Returns:
+            int: 行番号。該当する行がない場合は -1
+        """
+        raise NotImplementedError()
+
+    def set_memo(self, number:int, memo:str) -> bool:
+        """
+        指定した番号の行にメモを書き込む
+        Args:
+            number (int): 行番号
+            memo (str): メモ内容
+        Returns:
+            bool: 書き込めた場合はTrue
+        """
+        raise NotImplementedError()
+
+    def set_memos(self, memos:dict) -> None:
+        """
+        複数の行にまとめてメモを書き込む
+        Args:
+            memos (dict): 行番号 → メモ内容
+        Returns:
+            None
+        """
+        for number, memo in memos.items():
+            self.set_memo(number, memo)
+
+    def truncate(self, number:int) -> None:
+        """
+        指定した番号より後の行を削除する（指定した番号の行は残す）
+        Args:
+            number (int): 残す最後の行の番号
+        Returns:
+            None
+        """
+        raise NotImplementedError()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        トレード履歴全体を DataFrame として取得する
+        Returns:
+            pd.DataFrame: トレード履歴（列はHEADERの順）
+        """
+        raise NotImplementedError()
+
+    def export_csv(self, csv_path:Path) -> None:
+        """
+        トレード履歴を従来のCSVファイルの形式で出力する
+        Args:
+            csv_path (Path): 出力先のCSVファイル
+        Returns:
+            None
+        """
+        self.to_dataframe().to_csv(csv_path, index=False, encoding=CSV_ENCODING)
+
+    def set_buffering(self, enabled:bool) -> None:
+        """
+        追記した行を保存先にすぐには書き込まず、まとめて書き込むかを設定する（バッチ実行用）。
+        無効にした時点で、溜まっている行を書き込む。行の読み込み・削除などを行う場合も、先に溜まっている行を書き込む。
+        Args:
+            enabled (bool): まとめて書き込む場合はTrue
+        Returns:
+            None
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        保存先との接続などを閉じる
+        Returns:
+            None
+        """
+        pass
+
+
+class CSVTradingHistoryStorage(TradingHistoryStorage):
+
+    # トレード履歴を保存するCSVファイル
+    csv_path:Path
+
+    # 追記をまとめて書き込む場合のバッファサイズ（バイト）
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, csv_path:Path) -> None:
+        """
+        トレード履歴をCSVファイル（Shift-JIS）に保存する
+        Args:
+            csv_path (Path): トレード履歴を保存するCSVファイル
+        Returns:
+            None
+        """
+        self.csv_path = csv_path
+
+        # 行数（最初に必要になった時点でファイルから数える）
+        self.__row_count = None
+
+        # 本オブジェクトで追記した行の、ファイル上の開始位置（バイト）。行番号 → 位置
+        # 追記した行を削除する場合は、ファイル全体を書き直さずにこの位置で切り詰める
+        self.__row_offsets = {}
+
+        # 追記をまとめて書き込む場合に開いておくファイルと、バッファ分を含めたファイルサイズ
+        self.__buffer_file = None
+        self.__file_size = 0
+
+        if not self.csv_path.is_file():
+            with self.csv_path.open(mode='w', encoding=CSV_ENCODING, newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(HEADER)
+            self.__row_count = 0
+
+    def append(self, row:list) -> None:
+        row_count = self.count()
+        if self.__buffer_file is not None:
+            line = io.StringIO()
+            csv.writer(line).writerow(row)
+            data = line.getvalue().encode(CSV_ENCODING)
+            self.__row_offsets[row_count] = self.__file_size
+            self.__buffer_file.write(data)
+            self.__file_size = self.__file_size + len(data)
+        else:
+            self.__row_offsets[row_count] = os.path.getsize(self.csv_path)
+            with self.csv_path.open('a', encoding=CSV_ENCODING, newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(row)
+        self.__row_count = row_count + 1
+
+    def set_buffering(self, enabled:bool) -> None:
+        if enabled and self.__buffer_file is None:
+            self.__buffer_file = self.csv_path.open('ab', buffering=self.BUFFER_SIZE)
+            self.__file_size = os.path.getsize(self.csv_path)
+        elif not enabled and self.__buffer_file is not None:
+            self.__buffer_file.close()
+            self.__buffer_file = None
+
+    def count(self) -> int:
+        if self.__row_count is None:
+            self.__row_count = len(self.to_dataframe())
+        return self.__row_count
+
+    def get_row(self, number:int) -> dict:
+        df = self.to_dataframe()
+        if df.empty or number >= len(df) or number < 0:
+            return None
+
+        return df.iloc[number].to_dict()
+
+    def get_tail(self, length:int) -> list:
+        df = self.to_dataframe()
+        return [(i, row.to_dict()) for i, row in df.tail(length).iterrows()]
+
+    def find_row_number_by_date(self, date_str:str) -> int:
+        df = self.to_dataframe()
+        row = df.query('取引日付 == "' + date_str + '"')
+        if len(row) == 0:
+            return -1
+
+        return row.head(1).index.item()
+
+    def set_memo(self, number:int, memo:str) -> bool:
+        df = self.to_dataframe()
+        if len(df) == 0 or number >= len(df):
+            return False
+
+        df['メモ'] = df['メモ'].astype(object)
+        df.at[number, 'メモ'] = memo
+        self.__rewrite(df)
+        return True
+
+    def set_memos(self, memos:dict) -> None:
+        # ファイルの読み込みと書き直しは、メモの件数によらず1回だけ行う
+        df = self.to_dataframe()
+        df['メモ'] = df['メモ'].astype(object)
+        for number, memo in memos.items():
+            if number < len(df):
+                df.at[number, 'メモ'] = memo
+        self.__rewrite(df)
+
+    def truncate(self, number:int) -> None:
+        offset = self.__row_offsets.get(number + 1)
+        if offset is not None:
+            # 本オブジェクトで追記した行だけを削除する場合は、その行の開始位置でファイルを切り詰める
+            self.__flush_buffer()
+            os.truncate(self.csv_path, offset)
+            self.__row_offsets = {i: o for i, o in self.__row_offsets.items() if i <= number}
+            self.__row_count = number + 1
+            self.__file_size = offset
+            return
+
+        df = self.to_dataframe()
+        df = df[:number + 1]
+        self.__rewrite(df)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        self.__flush_buffer()
+        df = pd.read_csv(self.csv_path, encoding=CSV_ENCODING)
+        self.__row_count = len(df)
+        return df
+
+    def close(self) -> None:
+        self.set_buffering(False)
+
+    def __flush_buffer(self):
+        """
+        溜まっている追記をファイルに書き込む
+        """
+        if self.__buffer_file is not None:
+            self.__buffer_file.flush()
+
+    def __rewrite(self, df:pd.DataFrame):
+        """
+        トレード履歴全体をファイルに書き直す。行の位置が変わるので、追記した行の開始位置は破棄する
+        """
+        df.to_csv(self.csv_path, index=False, encoding=CSV_ENCODING)
+        self.__row_count = len(df)
+        self.__row_offsets = {}
+        if self.__buffer_file is not None:
+            self.__file_size = os.path.getsize(self.csv_path)
+
+    def export_csv(self, csv_path:Path) -> None:
+        if Path(csv_path) == self.csv_path:
+            # 保存先そのものなので出力する必要はない
+            return
+
+        super().export_csv(csv_path)
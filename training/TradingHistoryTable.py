@@ -0,0 +1,222 @@
+import atexit
+import math
+import time
+import traceback
+import weakref
+from pathlib import Path
+
+import pandas as pd
+
+import TradingHistoryStorage as ths
+
+# 列ごとの値の型（メモの列は文字列か、メモがない場合は NaN）
+COLUMN_TYPES = {
+    '銘柄コード': str,
+    '取引日付': str,
+    '株価': float,
+    'ロットサイズ': int,
+    '売りロット数': int,
+    '売り平均単価': float,
+    '売り損益': float,
+    '買いロット数': int,
+    '買い平均単価': float,
+    '買い損益': float,
+    '総資産': float,
+}
+
+MEMO_COLUMN = 'メモ'
+
+# 終了時に書き込む、開いているトレード履歴の表
+_open_tables = weakref.WeakSet()
+
+class TradingHistoryTable(ths.TradingHistoryStorage):
+
+    # 追記した行をまとめて書き込む行数と間隔（秒）のデフォルト値
+    DEFAULT_FLUSH_COUNT = 100
+    DEFAULT_FLUSH_INTERVAL = 5.0
+
+    # 変更がこの件数に達したら、保存先に書き込む
+    flush_count:int
+
+    # 前回の書き込みからこの秒数が経過した後に変更した時点で、保存先に書き込む
+    flush_interval:float
+
+    def __init__(self, storage:ths.TradingHistoryStorage, flush_count:int=None, flush_interval:float=None, on_flush=None) -> None:
+        """
+        トレード履歴を列ごとのリストとしてメモリに持ち、読み込みはすべてメモリから行う。
+        保存先（CSVファイル・SQLite）への書き込みは後からまとめて行う（追記は一定の件数・間隔ごとと、終了時。
+        メモの書き込みと、書き込み済みの行の削除がある場合だけ、保存先の既存の行を書き換える）
+        Args:
+            storage (TradingHistoryStorage): 保存先
+            flush_count (int, optional): 変更をまとめて書き込む件数. Defaults to None(DEFAULT_FLUSH_COUNT).
+            flush_interval (float, optional): 変更をまとめて書き込む間隔（秒）. Defaults to None(DEFAULT_FLUSH_INTERVAL).
+            on_flush (callable, optional): 保存先に書き込んだ後に呼び出す関数（引数は最後の行。行がない場合は None）. Defaults to None.
+        Returns:
+            None
+        """
+        self.flush_count = self.DEFAULT_FLUSH_COUNT if flush_count is None else flush_count
+        self.flush_interval = self.DEFAULT_FLUSH_INTERVAL if flush_interval is None else flush_interval
+
+        self.__storage = storage
+        self.__on_flush = on_flush
+        self.__is_buffering = False
+
+        # 既存のトレード履歴（再開した場合）は最初に1回だけ読み込む
+        df = storage.to_dataframe()
+        self.__columns = {}
+        for column, column_type in COLUMN_TYPES.items():
+            self.__columns[column] = [column_type(value) for value in df[column].tolist()] if len(df) > 0 else []
+        self.__columns[MEMO_COLUMN] = [_to_memo(value) for value in df[MEMO_COLUMN].tolist()] if len(df) > 0 else []
+
+        # 保存先に書き込み済みの行数、保存先で削除が必要な行（この番号より後を削除する）、保存先に書き込みが必要なメモ
+        self.__flushed_count = len(df)
+        self.__truncate_number = None
+        self.__dirty_memos = {}
+
+        # 前回の書き込みからの変更の件数と時刻
+        self.__change_count = 0
+        self.__last_flush_time = time.monotonic()
+
+        _open_tables.add(self)
+
+    def append(self, row:list) -> None:
+        for (column, column_type), value in zip(COLUMN_TYPES.items(), row):
+            self.__columns[column].append(column_type(value))
+        self.__columns[MEMO_COLUMN].append(_to_memo(row[len(COLUMN_TYPES)]) if len(row) > len(COLUMN_TYPES) else math.nan)
+        self.__changed()
+
+    def count(self) -> int:
+        return len(self.__columns[MEMO_COLUMN])
+
+    def get_row(self, number:int) -> dict:
+        if number < 0 or number >= self.count():
+            return None
+
+        return {column: values[number] for column, values in self.__columns.items()}
+
+    def get_tail(self, length:int) -> list:
+        return [(number, self.get_row(number)) for number in range(max(0, self.count() - length), self.count())]
+
+    def find_row_number_by_date(self, date_str:str) -> int:
+        try:
+            return self.__columns['取引日付'].index(date_str)
+        except ValueError:
+            return -1
+
+    def set_memo(self, number:int, memo:str) -> bool:
+        if number < 0 or number >= self.count():
+            return False
+
+        self.__columns[MEMO_COLUMN][number] = memo
+        if number < self.__flushed_count:
+            # 書き込み済みの行は、保存先の行を書き換える（まだ書き込んでいない行は、追記する時にメモも書き込む）
+            self.__dirty_memos[number] = memo
+        self.__changed()
+        return True
+
+    def truncate(self, number:int) -> None:
+        if number + 1 >= self.count():
+            return
+
+        for values in self.__columns.values():
+            del values[number + 1:]
+
+        if number + 1 < self.__flushed_count:
+            # 書き込み済みの行を削除する場合は、保存先からも削除する（まだ書き込んでいない行は、書き込まずに捨てる）
+            self.__truncate_number = number if self.__truncate_number is None else min(self.__truncate_number, number)
+            self.__flushed_count = number + 1
+        self.__dirty_memos = {row_number: memo for row_number, memo in self.__dirty_memos.items() if row_number <= number}
+        self.__changed()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame({column: list(values) for column, values in self.__columns.items()}, columns=ths.HEADER)
+
+    def export_csv(self, csv_path) -> None:
+        self.flush()
+        if isinstance(self.__storage, ths.CSVTradingHistoryStorage) and self.__storage.csv_path == Path(csv_path):
+            # 保存先そのものなので出力する必要はない
+            return
+
+        super().export_csv(csv_path)
+
+    def set_buffering(self, enabled:bool) -> None:
+        # まとめて書き込んでいる間（バッチ実行）は、件数・間隔によらず無効にした時点で書き込む
+        self.__is_buffering = enabled
+        if not enabled:
+            self.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self.__storage.close()
+        _open_tables.discard(self)
+
+    def flush(self) -> None:
+        """
+        メモリ上の変更（行の削除、メモ、追記した行）を保存先に書き込む
+        Returns:
+            None
+        """
+        if self.__change_count == 0:
+            return
+
+        if self.__truncate_number is not None:
+            self.__storage.truncate(self.__truncate_number)
+            self.__truncate_number = None
+
+        if len(self.__dirty_memos) > 0:
+            self.__storage.set_memos(self.__dirty_memos)
+            self.__dirty_memos = {}
+
+        if self.__flushed_count < self.count():
+            # 追記した行は、保存先にまとめて書き込む
+            self.__storage.set_buffering(True)
+            for number in range(self.__flushed_count, self.count()):
+                self.__storage.append(self.__to_row_values(number))
+            self.__storage.set_buffering(False)
+            self.__flushed_count = self.count()
+
+        self.__change_count = 0
+        self.__last_flush_time = time.monotonic()
+
+        if self.__on_flush is not None:
+            self.__on_flush(self.__to_row_values(self.count() - 1) if self.count() > 0 else None)
+
+    def __changed(self):
+        """
+        変更を記録し、件数か間隔に達した場合は保存先に書き込む
+        """
+        self.__change_count = self.__change_count + 1
+        if self.__is_buffering:
+            return
+
+        if self.__change_count >= self.flush_count or time.monotonic() - self.__last_flush_time >= self.flush_interval:
+            self.flush()
+
+    def __to_row_values(self, number:int) -> list:
+        """
+        保存先に書き込む行の値（HEADERの順の文字列。メモがない場合はメモの列を省く）
+        """
+        row = [str(self.__columns[column][number]) for column in COLUMN_TYPES]
+        memo = self.__columns[MEMO_COLUMN][number]
+        if isinstance(memo, str):
+            row.append(memo)
+        return row
+
+def _to_memo(value):
+    """
+    メモの値を、文字列かメモがない場合の NaN にそろえる（数字だけのメモは、CSVファイルから数値として読み込まれるので文字列に戻す）
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return math.nan
+    return str(value)
+
+@atexit.register
+def _flush_open_tables():
+    """
+    終了時に、まだ書き込んでいないトレード履歴の変更を書き込む
+    """
+    for table in list(_open_tables):
+        try:
+            table.flush()
+        except Exception:
+            print(f"トレード履歴の書き込みに失敗しました: {traceback.format_exc()}")
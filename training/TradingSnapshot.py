@@ -0,0 +1,88 @@
+from datetime import date
+
+import CurrentTradingInfo as cti
+import ShortTrading as st
+import LongTrading as lt
+
+# 1取引後のトレードの状態を保存するスナップショット。取り消し（巻き戻し）用に多数保持するため、__slots__で省メモリにする
+class TradingSnapshot:
+
+    __slots__ = (
+        'row_number',           # トレード履歴上の行番号
+        'trading_date',         # 取引の日付
+        'stock_price',          # 取引の株価
+        'short_lot',            # 売りロット数
+        'short_profit',         # ショートトレードの損益
+        'short_number',         # 売りの総株数
+        'short_total_amount',   # 売り保有の総額
+        'long_lot',             # 買いロット数
+        'long_profit',          # ロングトレードの損益
+        'long_number',          # 買いの総株数
+        'long_total_amount',    # 買い保有の総額
+        'lot_size',             # ロットサイズ
+        'stock_code',           # 銘柄コード
+        'assets',               # 総資産
+    )
+
+    row_number:int
+    trading_date:date
+    stock_price:float
+    short_lot:int
+    short_profit:float
+    short_number:int
+    short_total_amount:float
+    long_lot:int
+    long_profit:float
+    long_number:int
+    long_total_amount:float
+    lot_size:int
+    stock_code:str
+    assets:float
+
+    def __init__(self, row_number:int, trading_info:cti.CurrentTradingInfoModel) -> None:
+        """
+        取引の情報からスナップショットを作成する
+        Args:
+            row_number (int): トレード履歴上の行番号
+            trading_info (CurrentTradingInfoModel): 取引の情報
+        Returns:
+            None
+        """
+        self.row_number = row_number
+        self.trading_date = trading_info.trading_date
+        self.stock_price = trading_info.stock_price
+        self.short_lot = trading_info.short_lot
+        self.short_profit = trading_info.short_profit
+        self.short_number = trading_info.short_trading.number_now
+        self.short_total_amount = trading_info.short_trading.total_amount_now
+        self.long_lot = trading_info.long_lot
+        self.long_profit = trading_info.long_profit
+        self.long_number = trading_info.long_trading.number_now
+        self.long_total_amount = trading_info.long_trading.total_amount_now
+        self.lot_size = trading_info.lot_size
+        self.stock_code = trading_info.stock_code
+        self.assets = trading_info.assets
+
+    def to_trading_info(self) -> cti.CurrentTradingInfoModel:
+        """
+        スナップショットから取引の情報を復元する
+        Returns:
+            CurrentTradingInfoModel: 取引の情報
+        """
+        trading_info = cti.CurrentTradingInfoModel()
+        trading_info.trading_date = self.trading_date
+        trading_info.stock_price = self.stock_price
+        trading_info.short_lot = self.short_lot
+        trading_info.short_profit = self.short_profit
+        trading_info.short_trading = st.ShortTrading()
+        trading_info.short_trading.number_now = self.short_number
+        trading_info.short_trading.total_amount_now = self.short_total_amount
+        trading_info.long_lot = self.long_lot
+        trading_info.long_profit = self.long_profit
+        trading_info.long_trading = lt.LongTrading()
+        trading_info.long_trading.number_now = self.long_number
+        trading_info.long_trading.total_amount_now = self.long_total_amount
+        trading_info.lot_size = self.lot_size
+        trading_info.stock_code = self.stock_code
+        trading_info.assets = self.assets
+        return trading_info
@@ -0,0 +1,165 @@
+import pandas as pd
+
+import data_analysis.OutputAnalysis as oa
+
+class TradingSummaryGroup:
+
+    __slots__ = (
+        'code',             # 銘柄コード
+        'start_date',       # 開始日（yyyy-mm-dd形式）
+        'end_date',         # 終了日（yyyy-mm-dd形式）
+        'lot_size',         # ロットサイズ
+        'max_total_lot',    # 合計最大ロット数（売りロット数＋買いロット数の最大値）
+        'first_assets',     # 最初の取引後の総資産
+        'last_assets',      # 最後の取引後の総資産
+    )
+
+    code:str
+    start_date:str
+    end_date:str
+    lot_size:int
+    max_total_lot:int
+    first_assets:float
+    last_assets:float
+
+    def __init__(self, code:str, trading_date:str, lot_size:int, total_lot:int, assets:float) -> None:
+        """
+        サマリーの1区切り（銘柄コード・ロットサイズが同じで、取引日付が前に戻らない連続した取引）
+        Args:
+            code (str): 銘柄コード
+            trading_date (str): 最初の取引の日付（yyyy-mm-dd形式）
+            lot_size (int): ロットサイズ
+            total_lot (int): 最初の取引後の売りロット数＋買いロット数
+            assets (float): 最初の取引後の総資産
+        Returns:
+            None
+        """
+        self.code = code
+        self.start_date = trading_date
+        self.end_date = trading_date
+        self.lot_size = lot_size
+        self.max_total_lot = total_lot
+        self.first_assets = assets
+        self.last_assets = assets
+
+
+class TradingSummary:
+
+    # サマリーの区切り
+    __groups:list
+
+    # 行ごとの、所属する区切りの番号・その行までの合計最大ロット数・取引日付・総資産（取り消しで行を削除した場合に区切りを戻すために使う）
+    __row_group_numbers:list
+    __row_max_total_lots:list
+    __row_dates:list
+    __row_assets:list
+
+    def __init__(self) -> None:
+        """
+        トレード履歴のサマリー（OutputAnalysis.aggregate_csv と同じ集計）を、行の追加のたびに更新しながら保持する。
+        サマリーの表示のたびにトレード履歴全体を読み込んで集計し直さずに済むようにする。
+        Returns:
+            None
+        """
+        self.__groups = []
+        self.__row_group_numbers = []
+        self.__row_max_total_lots = []
+        self.__row_dates = []
+        self.__row_assets = []
+
+    @classmethod
+    def from_dataframe(cls, df:pd.DataFrame) -> 'TradingSummary':
+        """
+        既存のトレード履歴からサマリーを作成する（トレード再開時に1回だけ行う）
+        Args:
+            df (pd.DataFrame): トレード履歴（列はHEADERの順）
+        Returns:
+            TradingSummary: サマリー
+        """
+        summary = cls()
+        for code, trading_date, lot_size, short_lot, long_lot, assets in zip(
+                df['銘柄コード'], df['取引日付'], df['ロットサイズ'], df['売りロット数'], df['買いロット数'], df['総資産']):
+            summary.append(str(code), str(trading_date), int(lot_size), int(short_lot), int(long_lot), float(assets))
+        return summary
+
+    def append(self, code:str, trading_date:str, lot_size:int, short_lot:int, long_lot:int, assets:float) -> None:
+        """
+        トレード履歴に追加した1行をサマリーに反映する。銘柄コード・ロットサイズが変わるか、取引日付が前に戻る場合は新しい区切りにする
+        Args:
+            code (str): 銘柄コード
+            trading_date (str): 取引日付（yyyy-mm-dd形式）
+            lot_size (int): ロットサイズ
+            short_lot (int): 売りロット数
+            long_lot (int): 買いロット数
+            assets (float): 取引後の総資産
+        Returns:
+            None
+        """
+        total_lot = short_lot + long_lot
+        group = self.__groups[-1] if len(self.__groups) > 0 else None
+
+        if group is None or group.code != code or group.lot_size != lot_size or group.end_date > trading_date:
+            group = TradingSummaryGroup(code, trading_date, lot_size, total_lot, assets)
+            self.__groups.append(group)
+        else:
+            group.end_date = trading_date
+            group.max_total_lot = max(group.max_total_lot, total_lot)
+            group.last_assets = assets
+
+        self.__row_group_numbers.append(len(self.__groups) - 1)
+        self.__row_max_total_lots.append(group.max_total_lot)
+        self.__row_dates.append(trading_date)
+        self.__row_assets.append(assets)
+
+    def truncate(self, number:int) -> None:
+        """
+        指定した番号より後の行をサマリーから除く（トレード履歴の truncate に合わせて呼び出す）
+        Args:
+            number (int): 残す最後の行の番号
+        Returns:
+            None
+        """
+        if number + 1 >= len(self.__row_dates):
+            return
+
+        del self.__row_group_numbers[number + 1:]
+        del self.__row_max_total_lots[number + 1:]
+        del self.__row_dates[number + 1:]
+        del self.__row_assets[number + 1:]
+
+        if number < 0:
+            self.__groups = []
+            return
+
+        # 残す最後の行が所属する区切りを、その行の時点の状態に戻す
+        del self.__groups[self.__row_group_numbers[number] + 1:]
+        group = self.__groups[-1]
+        group.end_date = self.__row_dates[number]
+        group.max_total_lot = self.__row_max_total_lots[number]
+        group.last_assets = self.__row_assets[number]
+
+    def count(self) -> int:
+        """
+        サマリーに反映した行数を取得する
+        Returns:
+            int: 行数
+        """
+        return len(self.__row_dates)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        サマリーを OutputAnalysis.summarize_trading_history と同じ形式の DataFrame で取得する
+        Returns:
+            pd.DataFrame: 区切りごとのサマリー（銘柄コード, 開始日, 終了日, ロットサイズ, 合計最大ロット数, 資産増額）
+        """
+        df_agg = pd.DataFrame({
+            '銘柄コード': [group.code for group in self.__groups],
+            '開始日': pd.to_datetime([group.start_date for group in self.__groups]),
+            '終了日': pd.to_datetime([group.end_date for group in self.__groups]),
+            'ロットサイズ': pd.Series([group.lot_size for group in self.__groups], dtype='int64'),
+            '合計最大ロット数': pd.Series([group.max_total_lot for group in self.__groups], dtype='int64'),
+            '資産増額': pd.Series([group.last_assets - group.first_assets for group in self.__groups], dtype='float64'),
+        })
+        df_agg['資産増額'] = df_agg['資産増額'].map(oa.format_asset_increase)
+        return df_agg
+
@@ -2,24 +2,15 @@ import argparse
 import datetime as dt
 import sys
 import re
+import time
 import traceback
 import os
 from pathlib import Path
 
-from pandas import DataFrame
-
-from colorama import init
-from termcolor import colored
-
-import Trading as tr
-import StockInfo as si
-import CSVLoader as cl
-import ReopenTradingInfo as rti
-import data_analysis.OutputAnalysis as oa
-import integration.OrdersToTradingView as ottv
-
 # 1取引を行った後のトレード詳細情報を表示する
-def display_order_detail(trading:tr.Trading, message:str):
+def display_order_detail(trading:'tr.Trading', message:str):
+    from colorama import init
+    from termcolor import colored
 
     # 平均単価が0の場合は0で出力する
     avg_short_price = 0
@@ -85,6 +76,30 @@ def display_order_detail(trading:tr.Trading, message:str):
         + '\t\t損益(ロング)：' + colored(f'{trading.current_trading_info.long_profit:,.1f}', on_color=long_profit_color))
     print('------------------------------------------------------------------------------------')
 
+# バッチ実行のコマンドをファイル、または標準入力から読み込む
+def read_batch_commands(source:str) -> list:
+    if source == '-':
+        lines = sys.stdin.readlines()
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+
+    # 空行と「#」以降のコメントは除く
+    commands = []
+    for line in lines:
+        line = line.split('#')[0].strip()
+        if line != '':
+            commands.append(line)
+    return commands
+
+# バッチ実行の結果を表示する
+def display_batch_report(command_count:int, order_count:int, failures:list, elapsed_seconds:float, tradings:list):
+    print('バッチ実行完了：コマンド数：' + str(command_count) + ', 取引数：' + str(order_count)
+        + ', 失敗：' + str(len(failures)) + ', 処理時間：' + f'{elapsed_seconds:,.3f}' + '秒')
+    for command_number, command, message in failures:
+        print(str(command_number) + '行目 ' + command + ' : ' + message.replace(os.linesep, ' '))
+    print('総資産(大引け - 寄付 - 組合せ)：' + ' - '.join(['￥' + f'{trading.current_trading_info.assets:,.1f}' for trading in tradings]))
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='トレード練習ツール(CLI版)')
 
@@ -95,9 +110,31 @@ if __name__ == "__main__":
     parser.add_argument('-a', help='トレード用の想定金額(初期資産)。デフォルトは1000万(円)')
     parser.add_argument('-ro', '--reopen', help='トレード再開モードで起動する', action='store_true')
     parser.add_argument('-i', '--input', help='データの読込元。loc:ローカルファイル(TradingView/チャートギャラリー), yf:yfinance')
+    parser.add_argument('-lb', '--lookback', help='ローカルファイルから読み込む際、トレード開始日付より前に余分に読み込む日数。デフォルトは0日')
+    parser.add_argument('-cm', '--cache_memory', help='読み込んだ株価データをメモリに保持する上限(MB)。デフォルトは512MB')
+    parser.add_argument('-w', '--watchlist', help='起動時にバックグラウンドで先読みする銘柄。銘柄コードを1行ずつ記載したファイルのパス、またはカンマ区切りの銘柄コード')
+    parser.add_argument('-b', '--batch', help='取引などのコマンドを記載したファイル(「-」の場合は標準入力)から読み込み、表示を省いて一括で実行する')
+    parser.add_argument('-st', '--storage', help='トレード履歴の保存形式。csv:CSVファイル, sqlite:SQLiteのデータベース(output/trading_history.db)。デフォルトはcsv', choices=['csv', 'sqlite'])
+    parser.add_argument('-hb', '--history_binary', help='終了時に、トレード履歴をcsvファイルと同じ名前の列指向の圧縮したバイナリファイル(.bin)にも出力する。summary・to_trvなどは、その後にcsvファイルが更新されていなければcsvファイルの代わりにバイナリファイルを読み込む', action='store_true')
+    parser.add_argument('-fc', '--flush_count', help='トレード履歴の変更(追記・メモ・取り消し)を保存先にまとめて書き込む件数。デフォルトは100件')
+    parser.add_argument('-fi', '--flush_interval', help='トレード履歴の変更を保存先にまとめて書き込む間隔(秒)。前回の書き込みからこの秒数が経過した後の変更で書き込む。終了時にも書き込む。デフォルトは5秒')
+    parser.add_argument('-p', '--profile', nargs='?', const='', help='コマンドごとに処理の区分（データ読込・各注文・履歴の読み書き・表示）の時間とメモリ使用量を計測し、statsコマンドで表示する。計測結果はファイル名を指定した場合はそのファイル、省略した場合はoutput/profile_<練習開始日時>.jsonlに出力する')
 
     args = parser.parse_args()
 
+    # pandasなど読み込みに時間がかかるライブラリを使うモジュールは、引数の解析後に読み込む（-h の表示などを待たせないため）
+    from pandas import DataFrame
+
+    import Trading as tr
+    import OrderExecution as oe
+    import StockInfo as si
+    import StockInfoCache as sic
+    import CommandProfiler as cprf
+    import CSVLoader as cl
+    import ReopenTradingInfo as rti
+    import data_analysis.OutputAnalysis as oa
+    import integration.OrdersToTradingView as ottv
+
     # 各引数のデフォルト値を定義する
     start_date_str = '20010101' if args.s == None else args.s
     end_date = dt.datetime.now().date() if args.e == None else dt.datetime.strptime(args.e, '%Y%m%d').date()
@@ -107,6 +144,13 @@ if __name__ == "__main__":
     assets_open = assets_close
     assets_opcl = assets_close    # 翌日寄付で注文・大引で手仕舞いの方式の資産
     input_data = 'loc' if args.input == None else args.input   # デフォルトではローカルファイルからデータを取得する
+    lookback_days = 0 if args.lookback == None else int(args.lookback)
+    storage_type = tr.Trading.STORAGE_TYPE_CSV if args.storage == None else args.storage
+    history_flush_count = None if args.flush_count == None else int(args.flush_count)
+    history_flush_interval = None if args.flush_interval == None else float(args.flush_interval)
+
+    # 読み込んだ株価データのキャッシュ。銘柄可変モードで一度読み込んだ銘柄に戻る場合はファイルやネットワークから読み込み直さない
+    stock_info_cache = sic.StockInfoCache() if args.cache_memory == None else sic.StockInfoCache(int(float(args.cache_memory) * 1024 * 1024))
 
     mode = ''
     code = args.code
@@ -190,7 +234,7 @@ if __name__ == "__main__":
                         output_str = oa.aggregate_csv(csv_path, output_to_file)
                         print(output_str)
                         if output_to_file:
-                            os.startfile(str(csv_path).replace('_history_', '_summary_'))
+                            os.startfile(str(oa.get_summary_path(csv_path)))
                     else:
                         print('コマンドが不正です。')
 
@@ -221,8 +265,27 @@ if __name__ == "__main__":
     if training_start_datetime_str == None:
         training_start_datetime_str = dt.datetime.now().strftime('%Y%m%d%H%M%S')
 
+    # コマンドごとの処理時間・メモリ使用量の計測。-p を付けた場合だけ行う（起動時の読み込みも1つのコマンドとして計測する）
+    profiler = cprf.CommandProfiler()
+    if args.profile != None:
+        trace_path = args.profile if args.profile != '' else os.path.join('output', 'profile_' + training_start_datetime_str + '.jsonl')
+        profiler = cprf.CommandProfiler(True, trace_path)
+    profiler.begin_command('(起動)')
+
+    # ウォッチリストの銘柄をバックグラウンドで先読みする
+    if args.watchlist != None:
+        watchlist_codes = []
+        if os.path.isfile(args.watchlist):
+            with open(args.watchlist, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.split('#')[0].strip()
+                    watchlist_codes.extend([c.strip() for c in line.split(',') if c.strip() != ''])
+        else:
+            watchlist_codes = [c.strip() for c in args.watchlist.split(',') if c.strip() != '']
+
+        prefetch_count = stock_info_cache.prefetch(watchlist_codes, start_date, end_date, input_data, lookback_days)
+        print('ウォッチリストの' + str(prefetch_count) + '銘柄をバックグラウンドで読み込みます。')
 
-    # モード共通の変数を用意する
     stock_info:si.StockInfo = None
     stock_data:DataFrame = None
     trading_close:tr.Trading = None
@@ -235,12 +298,14 @@ if __name__ == "__main__":
     else:
 
         print('データ読み込み中。。。')
-        stock_info = si.StockInfo(code, start_date, end_date, input_data)
+        with profiler.phase(cprf.PHASE_LOAD):
+            stock_info = stock_info_cache.get(code, start_date, end_date, input_data, lookback_days)
         print('データ読み込み完了。')
 
         # 取得できた株価データの範囲を確認するためにCLIでDataFrameを表示する
         stock_data = stock_info.stock_data_df
-        print(stock_data)
+        with profiler.phase(cprf.PHASE_RENDER):
+            print(stock_data)
 
         # トレードパラメータの表示、兼入力引数に関する動作確認
         print('code=' + code)
@@ -251,16 +316,48 @@ if __name__ == "__main__":
         print()
 
     # トレーディングオブジェクトの初期化
-    trading_close = tr.Trading(stock_info, training_start_datetime_str, assets_close, 'close', start_date_str, mode)
-    trading_next_open = tr.Trading(stock_info, training_start_datetime_str, assets_open, 'open', start_date_str, mode)
-    trading_opcl = tr.Trading(stock_info, training_start_datetime_str, assets_opcl, 'opcl', start_date_str, mode)
+    trading_close = tr.Trading(stock_info, training_start_datetime_str, assets_close, 'close', start_date_str, mode, storage_type,
+                               history_flush_count=history_flush_count, history_flush_interval=history_flush_interval,
+                               history_binary=args.history_binary)
+    trading_next_open = tr.Trading(stock_info, training_start_datetime_str, assets_open, 'open', start_date_str, mode, storage_type,
+                               history_flush_count=history_flush_count, history_flush_interval=history_flush_interval,
+                               history_binary=args.history_binary)
+    trading_opcl = tr.Trading(stock_info, training_start_datetime_str, assets_opcl, 'opcl', start_date_str, mode, storage_type,
+                               history_flush_count=history_flush_count, history_flush_interval=history_flush_interval,
+                               history_binary=args.history_binary)
+    trading_close.profiler = profiler
+    trading_next_open.profiler = profiler
+    trading_opcl.profiler = profiler
 
     # 取引入力における日付の年の部分。Noneでなければ設定されているとする。その場合は年の入力を省くことができる。
     trading_date_year:str = None
 
+    # バッチ実行の場合は、コマンドをまとめて読み込み、表示を省いて実行する。トレード履歴もまとめて書き込む
+    batch_commands:list = None
+    batch_command_number = 0
+    batch_order_count = 0
+    batch_failures = []
+    batch_start_time = time.perf_counter()
+    original_stdout = sys.stdout
+    if args.batch != None:
+        batch_commands = read_batch_commands(args.batch)
+        trading_close.set_history_buffering(True)
+        trading_next_open.set_history_buffering(True)
+        trading_opcl.set_history_buffering(True)
+        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+
     # トレード開始。取引するたびに一回入力する
     while True:
-        input_str = input("★ コマンド：")
+        # 前のコマンドの計測を終える（入力待ちの時間は含めない）
+        profiler.end_command(stock_info_cache.current_bytes)
+
+        if batch_commands is not None:
+            # すべてのコマンドを実行したら終了する
+            input_str = batch_commands[batch_command_number] if batch_command_number < len(batch_commands) else 'exit'
+            batch_command_number = batch_command_number + 1
+        else:
+            input_str = input("★ コマンド：")
+        profiler.begin_command(input_str)
         print()
 
         # 取引以外の操作
@@ -337,12 +434,14 @@ if __name__ == "__main__":
                     code = command_list[1]
 
                     print('データ読み込み中。。。')
-                    stock_info = si.StockInfo(code, start_date, end_date, input_data)
+                    with profiler.phase(cprf.PHASE_LOAD):
+                        stock_info = stock_info_cache.get(code, start_date, end_date, input_data, lookback_days)
                     print('データ読み込み完了。')
 
                     # 取得できた株価データの範囲を確認するためにCLIでDataFrameを表示する
                     stock_data = stock_info.stock_data_df
-                    print(stock_data)
+                    with profiler.phase(cprf.PHASE_RENDER):
+                        print(stock_data)
 
                     # トレードパラメータの表示、兼入力引数に関する動作確認
                     print('code=' + code)
@@ -494,12 +593,12 @@ if __name__ == "__main__":
                     base_date:dt.date
                     base_date = dt.datetime.strptime(base_date_str, '%Y%m%d')
 
-                    stock_data = stock_info.stock_data_df[stock_info.stock_data_df.index == base_date.strftime('%Y-%m-%d')]
-                    if len(stock_data) == 0:
+                    bar_position = stock_info.find_bar_position(base_date)
+                    if bar_position < 0:
                         print('入力された日付のデータはありません。その日は祝日か、取得期間外の日付かもしれません。')
                         continue
 
-                    stock_price = float(stock_data['Close'].iloc[0]) # 計算基準日の終値で計算する（ロット再計算しようと思う時、翌日の始値がわからないので）
+                    stock_price = stock_info.get_price(bar_position, 'Close') # 計算基準日の終値で計算する（ロット再計算しようと思う時、翌日の始値がわからないので）
                     assets = min(trading_close.current_trading_info.assets, 
                                  trading_next_open.current_trading_info.assets, 
                                  trading_opcl.current_trading_info.assets)
@@ -522,7 +621,7 @@ if __name__ == "__main__":
 
         # 現在実施中のトレードに対して、ここまでのサマリーを確認・ファイルに出力する
         elif input_str.startswith('summary'):
-            csv_path:Path = None
+            trading_for_summary:tr.Trading = None
             output_to_file = False
             line_number = 10
             valid_input = True
@@ -532,11 +631,11 @@ if __name__ == "__main__":
 
                 if len(input_commands) > 1:
                     if input_commands[1] == 'close':
-                        csv_path = trading_close.trading_history_csv
+                        trading_for_summary = trading_close
                     elif input_commands[1] == 'opcl':
-                        csv_path = trading_opcl.trading_history_csv
+                        trading_for_summary = trading_opcl
                     elif input_commands[1] == 'open':
-                        csv_path = trading_next_open.trading_history_csv
+                        trading_for_summary = trading_next_open
                     else:
                         valid_input = False
                     
@@ -549,15 +648,17 @@ if __name__ == "__main__":
                             else:
                                 valid_input = False 
                 else:
-                    csv_path = trading_close.trading_history_csv
+                    trading_for_summary = trading_close
             else:
                 valid_input = False
 
             if valid_input:
-                output_str = oa.aggregate_csv(csv_path, output_to_file, line_number)
+                # サマリーは取引のたびに更新しているので、トレード履歴のcsvファイルを読み込み直さずに表示する
+                csv_path = trading_for_summary.trading_history_csv
+                output_str = oa.output_summary(trading_for_summary.get_summary_dataframe(), csv_path, output_to_file, line_number)
                 print(output_str)
                 if output_to_file:
-                    os.startfile(str(csv_path).replace('_history_', '_summary_'))
+                    os.startfile(str(oa.get_summary_path(csv_path)))
             else:
                 print('コマンドは不正です。')
             
@@ -591,134 +692,112 @@ if __name__ == "__main__":
                 print('日付のフォーマットが不正です。yyyymmdd形式で入力してください。')
                 continue
 
+            trading_close.sync_history_file()
             orders_str = ottv.extract_trading_history(trading_close.trading_history_csv, code_for_trv,
                                                                  start_date_for_trv, end_date_for_trv)
             print(orders_str)
             continue
 
-        # アプリを終了させるコマンド
-        elif input_str == "exit":
-            sys.exit()
+        # 取引履歴の全銘柄分を、銘柄ごとにTradingViewのチャート上の表示用の文字列のファイルに出力するコマンド
+        elif input_str == 'to_trv_all' or input_str.startswith('to_trv_all '):
+            start_date_for_trv = None
+            end_date_for_trv = None
+            output_dir_for_trv = None
+            input_commands = input_str.split()
+            if len(input_commands) in (3, 4):
+                start_date_for_trv = input_commands[1]
+                end_date_for_trv = input_commands[2]
+                output_dir_for_trv = input_commands[3] if len(input_commands) == 4 else None
+            elif len(input_commands) == 2:
+                output_dir_for_trv = input_commands[1]
+            elif len(input_commands) != 1:
+                print('コマンドは不正です。')
+                continue
 
-        # 上記の条件分岐に該当しない場合、取引操作として処理する
+            # 日付の入力チェック（桁数だけ）
+            if start_date_for_trv is not None and (not re.compile('[0-9]{8}').search(start_date_for_trv) \
+                or not re.compile('[0-9]{8}').search(end_date_for_trv)):
+                print('日付のフォーマットが不正です。yyyymmdd形式で入力してください。')
+                continue
 
-        # 銘柄コードが指定されているかをチェックする
-        if code is None or code == '' or stock_info is None:
-            print('トレード対象の銘柄を指定されていません。')
-            continue
+            trading_close.sync_history_file()
+            csv_path = trading_close.trading_history_csv
+            if output_dir_for_trv is None:
+                output_dir_for_trv = str(csv_path.with_suffix('')).replace('trading_history_', 'trv_orders_')
 
-        # 入力チェック
-        trading_operation = input_str.split()
-        if len(trading_operation) < 2 or len(trading_operation) > 3:
-            print('取引情報の入力は不正です。')
-            continue
+            try:
+                output_files = ottv.export_trading_histories(csv_path, output_dir_for_trv, start_date_for_trv, end_date_for_trv)
+            except Exception as e:
+                print(e)
+                continue
 
-        trading_date_str = trading_operation[0] if trading_date_year == None else trading_date_year + trading_operation[0]
-        stock_lots_str = trading_operation[1]
+            if len(output_files) == 0:
+                print('該当するデータがありません')
+            else:
+                print(f"{len(output_files)}銘柄の履歴文字列を出力しました: {output_dir_for_trv}")
+            continue
 
-        # 日付の入力チェック（桁数だけ）
-        if not re.compile('[0-9]{8}').search(trading_date_str):
-            print('日付のフォーマットは不正です。')
+        # 株価データのキャッシュの状況を表示するコマンド
+        elif input_str == "cache":
+            print(stock_info_cache.get_stats_message())
+            print()
             continue
 
-        # ロットの入力チェック
-        stock_lots = stock_lots_str.split('-')
-        if len(stock_lots) != 2:
-            print('ロット数の入力は不正です。')
+        # コマンドごとの処理時間・メモリ使用量の計測結果を表示するコマンド
+        elif input_str == "stats":
+            print(profiler.get_stats_message())
+            print()
             continue
 
-        try:
-            trading_date = dt.datetime.strptime(trading_date_str, '%Y%m%d')
-            short_lot = int(stock_lots[0])
-            long_lot = int(stock_lots[1])
-
-            # 取引ごとの入力に関する動作確認
-            # print('trading_date:' + str(trading_date.date()))
-            # print('short_lot:' + str(short_lot))
-            # print('long_lot:' + str(long_lot))
-
-            # 日付とロット以外の情報を入力された場合、株価の上書き処理を実施する
-            stock_price:dict = {'Close':-1, 'Open':-1}
-            if len(trading_operation) > 2:  
-                stock_price_str = trading_operation[2]
-                stock_price_arr = stock_price_str.split(':')
-                
-                if len(stock_price_arr) == 2:
-                    try:
-                        stock_price['Close'] = float(stock_price_arr[0])
-                    except ValueError:
-                        pass  # 値を付与しない               
-                    try:
-                        stock_price['Open'] = float(stock_price_arr[1])
-                    except ValueError:
-                        pass  # 値を付与しない
-                else:
-                    print('注文株価指定の入力は不正です。')
-                    continue
+        # アプリを終了させるコマンド
+        elif input_str == "exit":
+            stock_info_cache.shutdown()
+            trading_close.close()
+            trading_next_open.close()
+            trading_opcl.close()
+            profiler.end_command(stock_info_cache.current_bytes)
+            profiler.close()
+
+            if batch_commands is not None:
+                sys.stdout.close()
+                sys.stdout = original_stdout
+                display_batch_report(min(batch_command_number, len(batch_commands)), batch_order_count, batch_failures,
+                                     time.perf_counter() - batch_start_time, [trading_close, trading_next_open, trading_opcl])
+                if profiler.enabled:
+                    print(profiler.get_stats_message())
+            sys.exit()
 
-            print('■ 大引け注文：')
-            trading_close_message = trading_close.one_order(trading_date, short_lot, long_lot, lot_size, 
-                trading_close.ORDER_TIME_CLOSE, stock_price['Close'])
+        # 上記の条件分岐に該当しない場合、取引操作として処理する
+        if batch_commands is not None:
+            batch_order_count = batch_order_count + 1
 
-            if trading_close_message[0] == 'failure':
-                print(trading_close_message[1])
-                print('Info:大引注文に失敗のため、他の注文も実行しませんでした。')
-            else:
-                display_order_detail(trading_close, trading_close_message[1])
-                
-                print('■ 翌日寄付注文：')
-                trading_next_open_messege = trading_next_open.one_order(trading_date, short_lot, long_lot, lot_size, 
-                    trading_next_open.ORDER_TIME_NEXT_OPEN, stock_price['Open'])
-
-                if trading_next_open_messege[0] == 'failure':
-                    print(trading_next_open_messege[1])
-                    trading_close.reset_trading_info(-1)
-                    print('Info:翌日寄付注文に失敗のため、大引注文を1取引分巻き戻し、組合せ注文を実行しませんでした。')
-                else:
-                    display_order_detail(trading_next_open, trading_next_open_messege[1])
-
-                    print('■ 組合せ注文：')
-
-                    # 注文タイミングの設定
-                    order_time = trading_opcl.ORDER_TIME_NEXT_OPEN
-                    current_short_number = trading_opcl.current_trading_info.short_trading.number_now
-                    current_long_number = trading_opcl.current_trading_info.long_trading.number_now
-
-                    if short_lot == 0 and long_lot == 0:    # 玉持ちで全部手仕舞った場合
-                        order_time = trading_opcl.ORDER_TIME_CLOSE
-                    elif ( short_lot == long_lot ):  # スクエアにした場合
-                        order_time = trading_opcl.ORDER_TIME_NEXT_OPEN
-                    elif ( current_short_number != 0 and current_long_number != 0) \
-                        and (short_lot == 0 or long_lot == 0 ):     # 売買の片方を全部手仕舞い、もう片方は維持する場合
-                        short_number = short_lot * lot_size
-                        long_number = long_lot * lot_size
-                        if short_number == current_short_number or long_number == current_long_number:
-                            order_time = trading_opcl.ORDER_TIME_NEXT_OPEN
-
-                    # 上記以外の場合は初期値にする
-                    trading_opcl_messege = trading_opcl.one_order(trading_date, short_lot, long_lot, lot_size, 
-                        order_time, stock_price['Close'] if order_time == trading_opcl.ORDER_TIME_CLOSE else stock_price['Open'])
-
-                    if trading_opcl_messege[0] == 'failure':
-                        print(trading_opcl_messege[1])
-                        trading_close.reset_trading_info(-1)
-                        trading_next_open.reset_trading_info(-1)
-                        print('Info:組合せ文に失敗のため、他の注文を1取引分巻き戻しました。')
-                    else:
-                        display_order_detail(trading_opcl, trading_opcl_messege[1])
+        # 銘柄コードが指定されているかをチェックする
+        if code is None or code == '' or stock_info is None:
+            print('トレード対象の銘柄を指定されていません。')
+            if batch_commands is not None:
+                batch_failures.append((batch_command_number, input_str, 'トレード対象の銘柄を指定されていません。'))
+            continue
 
-                        # すべての注文が終わった後に指定された株価でメモリに保存されている株データを上書きする
-                        # 株価指定が必要な場合はほとんどデータに誤りがあったため
-                        # 今後データ誤り以外、株価指定が必要な場面があったら、この部分の処理を修正する
-                        if stock_price['Close'] >= 0:
-                            stock_info.stock_data_df.loc[[trading_date.strftime('%Y-%m-%d')], ['Close']] = stock_price['Close']
+        try:
+            order, error_message = oe.parse_order_command(input_str, trading_date_year)
+            if order is None:
+                print(error_message)
+                if batch_commands is not None:
+                    batch_failures.append((batch_command_number, input_str, error_message))
+                continue
 
-                        if stock_price['Open'] >= 0:
-                            stock_info.stock_data_df.loc[[trading_next_open.current_trading_info.trading_date.strftime('%Y-%m-%d')], ['Open']] = stock_price['Open']
+            # バッチ実行の場合は注文ごとの結果を表示しない
+            is_success, error_message = oe.execute_order(trading_close, trading_next_open, trading_opcl, stock_info,
+                order['trading_date'], order['short_lot'], order['long_lot'], lot_size, order['stock_price'],
+                display_order_detail if batch_commands is None else None)
+            if not is_success and batch_commands is not None:
+                batch_failures.append((batch_command_number, input_str, error_message))
 
         except Exception as e:
             print('入力不正です。')
             print(traceback.format_exc())
+            if batch_commands is not None:
+                batch_failures.append((batch_command_number, input_str, '入力不正です。' + str(e)))
 
         print()   
         # 取引記録のファイル出力に関する動作確認
@@ -0,0 +1,190 @@
+import argparse
+import contextlib
+import datetime as dt
+import glob
+import importlib.util
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Tuple
+
+import pandas as pd
+
+import StockInfo as si
+import VectorizedSimulation as vs
+import data_analysis.OutputAnalysis as oa
+
+# シミュレーションの方式
+ENGINE_VECTOR = 'vector'    # NumPyの配列演算でまとめて計算する（VectorizedSimulation.simulate）
+ENGINE_TRADING = 'trading'  # CLIと同じく Trading で1件ずつ実行する（VectorizedSimulation.run_with_trading）
+
+# 各プロセスで読み込んだ売買ルールのスクリプト（ファイルのパス → モジュール）
+_rule_modules = {}
+
+def find_universe_codes(base_dir:str=os.path.join('input', 'data')) -> list:
+    """
+    ローカルファイル（TradingViewのCSVファイル・チャートギャラリーのテキストファイル）がある銘柄コードを取得する
+    Args:
+        base_dir (str, optional): ローカルファイルのフォルダ. Defaults to 'input/data'.
+    Returns:
+        list: 銘柄コード（TradingView形式。例：東証の場合は"TSE_XXXX"）の昇順のリスト
+    """
+    codes = set()
+
+    # TradingViewのCSVファイルは「<銘柄コード>, <足の種類>.csv」の形式
+    for file_path in glob.glob(os.path.join(base_dir, 'trv', '*.csv')):
+        codes.add(re.split(r'[, ]', Path(file_path).stem)[0])
+
+    # チャートギャラリーのテキストファイルは「<銘柄コード>.txt」の形式
+    for file_path in glob.glob(os.path.join(base_dir, 'chg', '*.txt')):
+        codes.add(Path(file_path).stem)
+
+    return sorted(codes)
+
+def run_symbol(task:dict) -> Tuple[pd.DataFrame, str]:
+    """
+    1銘柄について、売買ルールのスクリプトで注文を作成してトレードのシミュレーションを行い、注文方式ごとにサマリーを作成する
+    （プロセスプールのワーカーで実行する）
+    Args:
+        task (dict): code, rule_path, start_date, end_date, lookback_days, lot_size, assets, allow_over_assets, engine
+    Returns:
+        Tuple[pd.DataFrame, str]: サマリー（OutputAnalysis.aggregate_csv と同じ列に注文方式を加えたもの）, 失敗した場合のメッセージ。失敗した場合、サマリーは None
+    """
+    try:
+        # ローカルファイルが見つからない場合のメッセージなどは、銘柄ごとに表示せずに失敗のメッセージにまとめる
+        with contextlib.redirect_stdout(io.StringIO()):
+            stock_info = si.StockInfo(task['code'], task['start_date'], task['end_date'], 'loc',
+                                      lookback_days=task['lookback_days'])
+        if stock_info.price_series is None or len(stock_info.price_series) == 0:
+            return None, 'データがありません。'
+
+        rule = _load_rule(task['rule_path'])
+        targets = rule.get_targets(stock_info.stock_data_df)
+
+        # 余分に読み込んだ期間（開始日より前・終了日より後）の注文は行わない
+        trading_dates = pd.DatetimeIndex(targets.index)
+        is_in_range = (trading_dates >= pd.Timestamp(task['start_date'])) & (trading_dates <= pd.Timestamp(task['end_date']))
+        targets = targets[is_in_range]
+
+        if task['engine'] == ENGINE_TRADING:
+            with contextlib.redirect_stdout(io.StringIO()):
+                histories = vs.run_with_trading(stock_info, targets, task['lot_size'], task['assets'], task['allow_over_assets'])
+        else:
+            histories = vs.simulate(stock_info, targets, task['lot_size'], task['assets'], task['allow_over_assets']).histories
+
+        summaries = []
+        for mode in vs.MODES:
+            if len(histories[mode]) == 0:
+                continue
+            summary = oa.summarize_trading_history(histories[mode])
+            summary['注文方式'] = mode
+            summaries.append(summary)
+
+        if len(summaries) == 0:
+            return None, '取引がありません。'
+
+        return pd.concat(summaries, ignore_index=True), ''
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def run_universe(codes:list, rule_path:str, start_date:dt.date, end_date:dt.date, lookback_days:int=0, lot_size:int=100,
+                 assets:float=10000000, allow_over_assets:bool=False, engine:str=ENGINE_VECTOR,
+                 max_workers:int=None) -> Tuple[pd.DataFrame, list]:
+    """
+    複数の銘柄について、同じ売買ルールのシミュレーションをプロセスプールで並列に行い、サマリーを1つの表にまとめる
+    Args:
+        codes (list): 銘柄コードのリスト
+        rule_path (str): 売買ルールのスクリプト（get_targets(stock_data_df) で保有ロット数の目標を返す）
+        start_date (date): トレードの開始日
+        end_date (date): トレードの終了日
+        lookback_days (int, optional): 開始日より前に余分に読み込む日数（指標の計算用）. Defaults to 0.
+        lot_size (int, optional): 売買ルールがロットサイズを返さない場合のロットサイズ. Defaults to 100.
+        assets (float, optional): トレード開始時の資産額. Defaults to 10000000.
+        allow_over_assets (bool, optional): 保有総額が総資産を超える注文を許可する場合はTrue. Defaults to False.
+        engine (str, optional): シミュレーションの方式（vector/trading）. Defaults to 'vector'.
+        max_workers (int, optional): プロセス数. Defaults to None(CPUのコア数).
+    Returns:
+        Tuple[pd.DataFrame, list]: 全銘柄のサマリー, 失敗した銘柄の (銘柄コード, メッセージ) のリスト
+    """
+    rule_path = os.path.abspath(rule_path)
+    tasks = [{'code': code, 'rule_path': rule_path, 'start_date': start_date, 'end_date': end_date,
+              'lookback_days': lookback_days, 'lot_size': lot_size, 'assets': assets,
+              'allow_over_assets': allow_over_assets, 'engine': engine} for code in codes]
+
+    max_workers = os.cpu_count() if max_workers is None else max_workers
+    # 1銘柄あたりの処理は短いので、プロセス間のやり取りを減らすためにまとめて渡す
+    chunksize = max(1, len(tasks) // (max_workers * 4))
+
+    summaries = []
+    failures = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for i, (code, (summary, message)) in enumerate(zip(codes, executor.map(run_symbol, tasks, chunksize=chunksize))):
+            if summary is None:
+                failures.append((code, message))
+            else:
+                summaries.append(summary)
+
+            if (i + 1) % 100 == 0:
+                print(f"{i + 1}/{len(codes)}銘柄完了")
+
+    if len(summaries) == 0:
+        return pd.DataFrame(columns=['銘柄コード', '開始日', '終了日', 'ロットサイズ', '合計最大ロット数', '資産増額', '注文方式']), failures
+
+    return pd.concat(summaries, ignore_index=True), failures
+
+def _load_rule(rule_path:str):
+    """
+    売買ルールのスクリプトを読み込む（プロセスごとに1回だけ）
+    """
+    rule = _rule_modules.get(rule_path)
+    if rule is None:
+        spec = importlib.util.spec_from_file_location(Path(rule_path).stem, rule_path)
+        rule = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(rule)
+        _rule_modules[rule_path] = rule
+    return rule
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="input/data の全銘柄に対して同じ売買ルールのシミュレーションを並列に行い、サマリーを1つの表にまとめます")
+    parser.add_argument('-r', '--rule', required=True, help='売買ルールのスクリプト。get_targets(stock_data_df) で、日付をインデックスとした short_lot・long_lot（任意で lot_size）の DataFrame を返す')
+    parser.add_argument('-s', help='トレードの開始日(YYYYMMDD)。デフォルトは20010101')
+    parser.add_argument('-e', help='トレードの終了日(YYYYMMDD)。デフォルトは本日')
+    parser.add_argument('-l', help='ロットサイズ。デフォルトは100')
+    parser.add_argument('-a', help='トレード開始時の資産額。デフォルトは10,000,000')
+    parser.add_argument('-lb', '--lookback', help='開始日より前に余分に読み込む日数（指標の計算用）。デフォルトは0日')
+    parser.add_argument('-c', '--codes', help='対象の銘柄コード（カンマ区切り）。デフォルトは input/data/trv・input/data/chg の全銘柄')
+    parser.add_argument('-oa', '--overassets', action='store_true', help='保有総額が総資産を超える注文を許可する（CLIの allow_over_assets=true と同じ）')
+    parser.add_argument('-en', '--engine', choices=[ENGINE_VECTOR, ENGINE_TRADING], help='シミュレーションの方式。vector:配列演算でまとめて計算, trading:CLIと同じく1件ずつ実行。デフォルトはvector')
+    parser.add_argument('-j', '--jobs', help='並列に実行するプロセス数。デフォルトはCPUのコア数')
+    parser.add_argument('-n', '--lines', help='画面に表示するサマリーの件数。デフォルトは20件')
+    args = parser.parse_args()
+
+    start_date = dt.datetime.strptime('20010101' if args.s == None else args.s, '%Y%m%d').date()
+    end_date = dt.datetime.now().date() if args.e == None else dt.datetime.strptime(args.e, '%Y%m%d').date()
+    codes = find_universe_codes() if args.codes == None else [c.strip() for c in args.codes.split(',') if c.strip() != '']
+
+    started_at = dt.datetime.now()
+    print(f"{len(codes)}銘柄のシミュレーションを開始します。")
+    summary_df, failures = run_universe(codes, args.rule, start_date, end_date,
+        lookback_days=0 if args.lookback == None else int(args.lookback),
+        lot_size=100 if args.l == None else int(args.l),
+        assets=10000000 if args.a == None else float(args.a),
+        allow_over_assets=args.overassets,
+        engine=ENGINE_VECTOR if args.engine == None else args.engine,
+        max_workers=None if args.jobs == None else int(args.jobs))
+
+    # 全銘柄のサマリーをCSVファイルに出力する（個別のサマリーファイルと同じく資産増額の「¥」は付けない）
+    output_path = Path('output').joinpath('universe_summary_' + Path(args.rule).stem + '_' + start_date.strftime('%Y%m%d')
+                                         + '_' + started_at.strftime('%Y%m%d%H%M%S') + '.csv')
+    output_df = summary_df.copy()
+    output_df['資産増額'] = output_df['資産増額'].str.replace('¥', '')
+    output_df.to_csv(output_path, index=False, encoding='shift-jis')
+
+    line_number = 20 if args.lines == None else int(args.lines)
+    print(summary_df.head(line_number).to_string())
+    print(f"成功：{len(codes) - len(failures)}銘柄、失敗：{len(failures)}銘柄、処理時間：{(dt.datetime.now() - started_at).total_seconds():.1f}秒")
+    for code, message in failures:
+        print(f"  {code}: {message}")
+    print(f"サマリーを出力しました: {output_path}")
@@ -0,0 +1,300 @@
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import date
+
+import numpy as np
+
+import PriceDataCache as pdc
+import PriceDataParser as pdpsr
+import PriceSeries as ps
+
+class UniverseStore:
+
+    # ストアのファイル
+    store_path:str
+
+    # ストアの形式のバージョン。形式を変えた場合は上げて、古いストアを使わないようにする
+    FORMAT_VERSION = 1
+
+    # ファイルの先頭の識別子と、ヘッダー（JSON）の長さを表すバイト数
+    MAGIC = b'UNIVSTOR'
+    HEADER_LENGTH_BYTES = 8
+
+    # 列のブロックの先頭の位置を揃えるバイト数
+    ALIGNMENT = 64
+
+    # 列とその型（ファイル内の並び順）
+    COLUMN_DTYPES = {
+        'day_numbers': np.int64,
+        'Open': np.float64,
+        'High': np.float64,
+        'Low': np.float64,
+        'Close': np.float64,
+        'Volume': np.int64,
+    }
+
+    def __init__(self, store_path:str=None) -> None:
+        """
+        ローカルの株価データ（input/data/trv・input/data/chg のエクスポートファイル）の全銘柄を1つのバイナリファイルにまとめたストア。
+        列ごとに全銘柄のデータを連続して格納し、銘柄コード（XXXX.T）ごとの行の範囲を索引に持つ。
+        ファイルは読み取り専用のメモリマップで開き、銘柄のデータはコピーせずに切り出すので、
+        複数のプロセス（CLI・プールのワーカー）がOSのページキャッシュ上の1つのデータを共有できる。
+        Args:
+            store_path (str, optional): ストアのファイル. Defaults to 'input/cache/universe.bin'.
+        Returns:
+            None
+        """
+        self.store_path = os.path.join('input', 'cache', 'universe.bin') if store_path is None else store_path
+
+        # 開いているストア（ファイルの識別情報、ヘッダー、列ごとのメモリマップ）。
+        # 複数のスレッドから共有されるので、開き直す際は1つのタプルとしてまとめて置き換える（開けなかった場合、ヘッダーと列は None）
+        self.__opened_store:tuple = None
+
+    def build(self, data_dir:str=None) -> dict:
+        """
+        エクスポートファイルをすべて読み込み、ストアを作成する（既存のストアは置き換える）。
+        1銘柄ずつ解析して列ごとの一時ファイルに追記するので、全銘柄のデータをメモリに載せない
+        Args:
+            data_dir (str, optional): trv・chg フォルダがあるフォルダ. Defaults to 'input/data'.
+        Returns:
+            dict: 作成したストアの情報（銘柄数、行数、ファイルサイズ）。既存のストアを置き換えられなかった場合は None
+        """
+        sources = collect_sources(os.path.join('input', 'data') if data_dir is None else data_dir)
+        price_data_cache = pdc.PriceDataCache()
+
+        store_dir = os.path.dirname(os.path.abspath(self.store_path))
+        os.makedirs(store_dir, exist_ok=True)
+
+        codes = {}
+        rows = 0
+        with tempfile.TemporaryDirectory(dir=store_dir) as temp_dir:
+            column_files = {column: open(os.path.join(temp_dir, column), 'wb') for column in self.COLUMN_DTYPES}
+            try:
+                for code, source in sources.items():
+                    series = _read_source(source, price_data_cache)
+                    for column, dtype in self.COLUMN_DTYPES.items():
+                        values = series.day_numbers if column == 'day_numbers' else series.get_column(column)
+                        column_files[column].write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+                    stat = os.stat(source['path'])
+                    codes[code] = {
+                        'start': rows,
+                        'end': rows + len(series),
+                        'source': os.path.abspath(source['path']),
+                        'mtime_ns': stat.st_mtime_ns,
+                        'size': stat.st_size,
+                    }
+                    rows = rows + len(series)
+            finally:
+                for f in column_files.values():
+                    f.close()
+
+            # 列ごとのブロックの位置を決めて、ヘッダーの後ろに順番に連結する
+            header = {'version': self.FORMAT_VERSION, 'rows': rows, 'columns': {}, 'codes': codes}
+            offset = 0
+            for column, dtype in self.COLUMN_DTYPES.items():
+                header['columns'][column] = {'dtype': np.dtype(dtype).str, 'offset': offset}
+                offset = _align(offset + rows * np.dtype(dtype).itemsize, self.ALIGNMENT)
+
+            header_bytes = json.dumps(header).encode('utf-8')
+            data_start = _align(len(self.MAGIC) + self.HEADER_LENGTH_BYTES + len(header_bytes), self.ALIGNMENT)
+
+            # 書き込み途中のファイルを読まれないように、一時ファイルに書いてから置き換える。
+            # POSIXでは、置き換える前に開いていたプロセスは古いファイルをそのまま読み続けられるが、
+            # Windowsでは、既存のストアをメモリマップで開いているプロセス（CLI・UniverseSimulation）があると置き換えられない
+            temp_store_path = os.path.join(temp_dir, 'universe.bin')
+            with open(temp_store_path, 'wb') as f:
+                f.write(self.MAGIC)
+                f.write(len(header_bytes).to_bytes(self.HEADER_LENGTH_BYTES, 'little'))
+                f.write(header_bytes)
+                for column, column_header in header['columns'].items():
+                    f.write(b'\0' * (data_start + column_header['offset'] - f.tell()))
+                    with open(os.path.join(temp_dir, column), 'rb') as column_file:
+                        shutil.copyfileobj(column_file, f)
+            # 本オブジェクトで開いているストアは手放す
+            self.__opened_store = None
+            try:
+                os.replace(temp_store_path, self.store_path)
+            except PermissionError as e:
+                print(f"株価データのストアを置き換えられません。ストアを開いているCLI・UniverseSimulationをすべて終了してから、再度作成してください: {e}")
+                return None
+
+        return {'codes': len(codes), 'rows': rows, 'bytes': os.path.getsize(self.store_path)}
+
+    def open_series(self, code:str, start_date:date=None, end_date:date=None, price_dtype=np.float64) -> ps.PriceSeries:
+        """
+        銘柄の株価データを、ストアのメモリマップから切り出して取得する（price_dtype が float64 の場合はコピーしない）
+        Args:
+            code (str): 銘柄コード（正規化したコード。東証の場合は XXXX.T）
+            start_date (date, optional): 取り出す期間の開始日. Defaults to None(制限なし).
+            end_date (date, optional): 取り出す期間の終了日. Defaults to None(制限なし).
+            price_dtype (optional): 株価の型（np.float64 または np.float32）. Defaults to np.float64.
+        Returns:
+            PriceSeries: 株価データ。ストアがない、銘柄がない、またはストアの作成後にエクスポートファイルが更新された場合は None
+        """
+        opened_store = self.__open()
+        if opened_store is None:
+            return None
+
+        header, columns = opened_store
+        entry = header['codes'].get(code)
+        if entry is None or not _is_source_unchanged(entry):
+            return None
+
+        start = entry['start']
+        end = entry['end']
+        day_numbers = columns['day_numbers'][start:end]
+
+        # 期間が指定された場合は、二分探索で該当する範囲だけを取り出す
+        range_start = 0 if start_date is None else int(day_numbers.searchsorted(ps.PriceSeries.to_day_number(start_date), side='left'))
+        range_end = len(day_numbers) if end_date is None else int(day_numbers.searchsorted(ps.PriceSeries.to_day_number(end_date), side='right'))
+        rows = slice(start + range_start, start + max(range_start, range_end))
+
+        prices = []
+        for column in ps.PriceSeries.PRICE_COLUMNS:
+            values = columns[column][rows]
+            prices.append(values if values.dtype == price_dtype else values.astype(price_dtype))
+        return ps.PriceSeries(columns['day_numbers'][rows], *prices, columns[ps.PriceSeries.VOLUME_COLUMN][rows])
+
+    def get_codes(self) -> list:
+        """
+        ストアに含まれる銘柄コードの一覧を取得する
+        Returns:
+            list: 銘柄コード。ストアがない場合は空のリスト
+        """
+        opened_store = self.__open()
+        if opened_store is None:
+            return []
+
+        header, _ = opened_store
+        return list(header['codes'].keys())
+
+    def __open(self) -> tuple:
+        """
+        ストアのファイルをメモリマップで開く。開いた後にファイルが置き換えられた場合は開き直す。
+        呼び出し元は、戻り値のヘッダーと列の組だけを使う（途中で他のスレッドが開き直しても、同じファイルのヘッダーと列を使うため）
+        Returns:
+            tuple: (ヘッダー, 列ごとのメモリマップ)。ストアがない、または開けない場合は None
+        """
+        try:
+            stat = os.stat(self.store_path)
+        except OSError:
+            self.__opened_store = None
+            return None
+
+        file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        opened_store = self.__opened_store
+        if opened_store is not None and opened_store[0] == file_id:
+            return None if opened_store[1] is None else opened_store[1:]
+
+        try:
+            with open(self.store_path, 'rb') as f:
+                if f.read(len(self.MAGIC)) != self.MAGIC:
+                    raise ValueError('ストアの形式が正しくありません')
+                header_length = int.from_bytes(f.read(self.HEADER_LENGTH_BYTES), 'little')
+                header = json.loads(f.read(header_length).decode('utf-8'))
+            if header.get('version') != self.FORMAT_VERSION:
+                raise ValueError(f"ストアの形式のバージョンが異なります: {header.get('version')}")
+
+            data_start = _align(len(self.MAGIC) + self.HEADER_LENGTH_BYTES + header_length, self.ALIGNMENT)
+            rows = header['rows']
+            buffer = np.memmap(self.store_path, dtype=np.uint8, mode='r') if rows > 0 else None
+            columns = {}
+            for column, dtype in self.COLUMN_DTYPES.items():
+                if buffer is None:
+                    columns[column] = np.empty(0, dtype=dtype)
+                    continue
+                begin = data_start + header['columns'][column]['offset']
+                columns[column] = buffer[begin:begin + rows * np.dtype(dtype).itemsize].view(dtype)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"株価データのストアを開けません。エクスポートファイルから読み込みます: {e}")
+            # 同じファイルを何度も開こうとしないように、開けなかったことを記録する
+            self.__opened_store = (file_id, None, None)
+            return None
+
+        self.__opened_store = (file_id, header, columns)
+        return header, columns
+
+def collect_sources(data_dir:str) -> dict:
+    """
+    エクスポートファイルを銘柄コードごとに1つ選ぶ（StockInfo と同じく、TradingViewのCSVを優先し、複数ある場合は更新時刻が最新のもの）
+    Args:
+        data_dir (str): trv・chg フォルダがあるフォルダ
+    Returns:
+        dict: 銘柄コード（正規化したコード） → {'path': ファイルのパス, 'type': 'trv' または 'chg', 'tv_code': TradingView形式のコード}
+    """
+    sources = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, 'chg', '*.txt'))):
+        tv_code = _get_tv_code(path)
+        sources[normalize_code(tv_code)] = {'path': path, 'type': 'chg', 'tv_code': tv_code}
+
+    trv_sources = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, 'trv', '*.csv'))):
+        tv_code = _get_tv_code(path)
+        code = normalize_code(tv_code)
+        if code not in trv_sources or os.path.getmtime(path) > os.path.getmtime(trv_sources[code]['path']):
+            trv_sources[code] = {'path': path, 'type': 'trv', 'tv_code': tv_code}
+    sources.update(trv_sources)
+
+    return dict(sorted(sources.items()))
+
+def normalize_code(code:str) -> str:
+    """
+    東証銘柄の証券コードをyfinance形式（XXXX.T）に正規化する。それ以外は変換しないまま返す
+    """
+    match = re.fullmatch(r'(TSE_)?(\d{4})(\.T)?', code)
+    if match:
+        return f"{match.group(2)}.T"
+    return code
+
+def _get_tv_code(path:str) -> str:
+    """
+    エクスポートファイルの名前からTradingView形式の証券コードを取り出す（例："TSE_7203, 1D.csv" → "TSE_7203"）
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    match = re.match(r'TSE_\d{4}', stem)
+    if match:
+        return match.group(0)
+    return re.split(r'[,\s]', stem, maxsplit=1)[0]
+
+def _read_source(source:dict, price_data_cache:pdc.PriceDataCache) -> ps.PriceSeries:
+    """
+    エクスポートファイルを読み込む（解析済みのキャッシュがあればそちらを使う）
+    """
+    df = price_data_cache.load(source['path'])
+    if df is None:
+        if source['type'] == 'trv':
+            df = pdpsr.read_trv_csv(source['path'], source['tv_code'])
+        else:
+            df = pdpsr.read_chg_txt(source['path'])
+    return ps.PriceSeries.from_dataframe(df)
+
+def _is_source_unchanged(entry:dict) -> bool:
+    """
+    ストアの作成後に、銘柄のエクスポートファイルが更新されていないかを判定する
+    """
+    try:
+        stat = os.stat(entry['source'])
+    except OSError:
+        return False
+    return stat.st_mtime_ns == entry['mtime_ns'] and stat.st_size == entry['size']
+
+def _align(value:int, alignment:int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+# 全銘柄のストアを作成する
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='ローカルの株価データの全銘柄を、メモリマップで共有できる1つのファイルにまとめます')
+    parser.add_argument('-d', '--data_dir', type=str, help='trv・chg フォルダがあるフォルダ（デフォルト：input/data）')
+    parser.add_argument('-o', '--output', type=str, help='ストアのファイル（デフォルト：input/cache/universe.bin）')
+    args = parser.parse_args()
+
+    result = UniverseStore(args.output).build(args.data_dir)
+    if result is not None:
+        print(f"{result['codes']}銘柄・{result['rows']:,}行のストアを作成しました（{result['bytes'] / 1024 / 1024:,.1f}MB）: "
+              + f"{UniverseStore(args.output).store_path}")
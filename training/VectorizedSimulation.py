@@ -0,0 +1,361 @@
+import tempfile
+from datetime import datetime
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+import AmountChecker as amchkr
+import OrderExecution as oe
+import StockInfo as si
+import Trading as tr
+import TradingHistoryStorage as ths
+
+# 注文方式（Trading の identifier と同じ）
+MODE_CLOSE = 'close'
+MODE_NEXT_OPEN = 'open'
+MODE_OPCL = 'opcl'
+MODES = [MODE_CLOSE, MODE_NEXT_OPEN, MODE_OPCL]
+
+# 注文が成立しなかった理由
+REJECT_REASON_NO_DATA = 'no_data'           # 取引日付（または翌営業日）の株価データがない
+REJECT_REASON_INVALID_LOT = 'invalid_lot'   # ロット数が負数
+REJECT_REASON_AMOUNT_OVER = 'amount_over'   # 総資産超過のチェックが通らない
+
+# 数値の列（検証で誤差を許容して比較する列）
+_NUMERIC_COLUMNS = ['株価', '売り平均単価', '売り損益', '買い平均単価', '買い損益', '総資産']
+
+class SimulationResult:
+
+    # 注文方式 → トレード履歴（Trading が出力するcsvファイルと同じ列。取引が発生した注文だけ）
+    histories:dict
+
+    # 注文方式 → 全注文後の状態（assets, short_number, short_total_amount, long_number, long_total_amount）
+    final_states:dict
+
+    # 入力した注文ごとに、成立した場合はTrue
+    accepted:np.ndarray
+
+    # 成立しなかった注文（取引日付, 売りロット数, 買いロット数, 理由）
+    rejected_orders:pd.DataFrame
+
+    def __init__(self, histories:dict, final_states:dict, accepted:np.ndarray, rejected_orders:pd.DataFrame) -> None:
+        """
+        一括シミュレーションの結果
+        Args:
+            histories (dict): 注文方式 → トレード履歴
+            final_states (dict): 注文方式 → 全注文後の状態
+            accepted (np.ndarray): 注文ごとに成立した場合はTrue
+            rejected_orders (pd.DataFrame): 成立しなかった注文
+        Returns:
+            None
+        """
+        self.histories = histories
+        self.final_states = final_states
+        self.accepted = accepted
+        self.rejected_orders = rejected_orders
+
+    def get_final_assets(self, mode:str) -> float:
+        """
+        全注文後の総資産を取得する
+        Args:
+            mode (str): 注文方式（close/open/opcl）
+        Returns:
+            float: 総資産
+        """
+        return self.final_states[mode]['assets']
+
+
+def simulate(stock_info:si.StockInfo, targets:pd.DataFrame, lot_size:int=100, assets=0.0,
+             allow_over_assets:bool=False) -> SimulationResult:
+    """
+    取引後の保有ロット数の目標（日付 → 空売りロット数・買いロット数）から、大引け・翌日寄付・組合せの3方式のトレードを
+    NumPyの配列演算でまとめて計算する。Trading.one_order を注文ごとに呼び出す場合と同じ結果（約定・損益・平均単価・総資産）になる。
+    3方式のいずれかで注文が成立しない場合は、CLI（OrderExecution.execute_order）と同じく、その注文を3方式とも行わない。
+    Args:
+        stock_info (StockInfo): トレード対象銘柄の情報
+        targets (pd.DataFrame): 注文の一覧（インデックスが取引日付、列が short_lot・long_lot。lot_size の列がある場合は注文ごとのロットサイズ）。注文の順に並べる
+        lot_size (int, optional): targets に lot_size の列がない場合のロットサイズ. Defaults to 100.
+        assets (float or dict, optional): トレード開始時の資産額。注文方式ごとに変える場合は 注文方式 → 資産額 の辞書. Defaults to 0.0.
+        allow_over_assets (bool, optional): 保有総額が総資産を超える注文を許可する場合はTrue（CLIの allow_over_assets=true と同じ）. Defaults to False.
+    Returns:
+        SimulationResult: シミュレーションの結果
+    """
+    order_count = len(targets)
+    trading_dates = pd.DatetimeIndex(targets.index)
+    short_lots = targets['short_lot'].to_numpy(dtype=np.int64)
+    long_lots = targets['long_lot'].to_numpy(dtype=np.int64)
+    if 'lot_size' in targets.columns:
+        lot_sizes = targets['lot_size'].to_numpy(dtype=np.int64)
+    else:
+        lot_sizes = np.full(order_count, lot_size, dtype=np.int64)
+    short_numbers = short_lots * lot_sizes
+    long_numbers = long_lots * lot_sizes
+
+    # 注文方式ごとの約定株価・約定日を求める
+    close_positions = stock_info.find_bar_positions(trading_dates)
+    next_open_positions = stock_info.find_next_bar_positions(trading_dates)
+    has_data = (close_positions >= 0) & (next_open_positions >= 0)
+    close_positions = np.where(has_data, close_positions, 0)
+    next_open_positions = np.where(has_data, next_open_positions, 0)
+
+    close_prices = stock_info.get_prices(close_positions, 'Close')
+    next_open_prices = stock_info.get_prices(next_open_positions, 'Open')
+    close_days = stock_info.get_bar_day_numbers(close_positions)
+    next_open_days = stock_info.get_bar_day_numbers(next_open_positions)
+
+    # 組合せ注文は、全部手仕舞う場合だけ大引けで、それ以外は翌日寄付で注文する（OrderExecution.get_opcl_order_time と同じ）
+    is_opcl_close = (short_lots == 0) & (long_lots == 0)
+    prices = {
+        MODE_CLOSE: close_prices,
+        MODE_NEXT_OPEN: next_open_prices,
+        MODE_OPCL: np.where(is_opcl_close, close_prices, next_open_prices),
+    }
+    days = {
+        MODE_CLOSE: close_days,
+        MODE_NEXT_OPEN: next_open_days,
+        MODE_OPCL: np.where(is_opcl_close, close_days, next_open_days),
+    }
+
+    reasons = np.full(order_count, '', dtype=object)
+    reasons[~has_data] = REJECT_REASON_NO_DATA
+    is_valid_lot = (short_lots >= 0) & (long_lots >= 0)
+    reasons[has_data & ~is_valid_lot] = REJECT_REASON_INVALID_LOT
+    accepted = has_data & is_valid_lot
+
+    # 総資産超過のチェックは注文前の状態に依存するため、最初に成立しない注文を除いてから、それ以降を計算し直す。
+    # それより前の注文の結果は変わらないので、確定させて次の計算の初期状態にする
+    states = {}
+    for mode in MODES:
+        initial_assets = assets[mode] if isinstance(assets, dict) else assets
+        states[mode] = {'assets': float(initial_assets), 'short_number': 0, 'short_total_amount': 0.0,
+                        'long_number': 0, 'long_total_amount': 0.0}
+    fixed_parts = {mode: [] for mode in MODES}
+    start = 0
+    while True:
+        order_positions = np.flatnonzero(accepted[start:]) + start
+        results = {mode: _run_orders(prices[mode][order_positions], short_numbers[order_positions],
+                                     long_numbers[order_positions], states[mode]) for mode in MODES}
+
+        rejected = np.zeros(len(order_positions), dtype=bool)
+        for mode in MODES:
+            rejected = rejected | _check_amount(results[mode], allow_over_assets)
+
+        if not rejected.any():
+            for mode in MODES:
+                fixed_parts[mode].append((order_positions, results[mode]))
+            break
+
+        first_rejected = int(np.argmax(rejected))
+        for mode in MODES:
+            fixed_result = {key: values[:first_rejected] for key, values in results[mode].items()}
+            fixed_parts[mode].append((order_positions[:first_rejected], fixed_result))
+            states[mode] = _get_last_state(fixed_result, states[mode])
+
+        rejected_position = order_positions[first_rejected]
+        accepted[rejected_position] = False
+        reasons[rejected_position] = REJECT_REASON_AMOUNT_OVER
+        start = rejected_position + 1
+
+    histories = {}
+    final_states = {}
+    for mode in MODES:
+        order_positions = np.concatenate([positions for positions, _ in fixed_parts[mode]])
+        result = {key: np.concatenate([part[key] for _, part in fixed_parts[mode]]) for key in _RESULT_KEYS}
+        final_states[mode] = _get_last_state(result, states[mode])
+        histories[mode] = _to_history(stock_info.code, order_positions, result, days[mode], prices[mode],
+                                      lot_sizes, short_lots, long_lots)
+
+    rejected_positions = np.flatnonzero(~accepted)
+    rejected_orders = pd.DataFrame({
+        '取引日付': trading_dates[rejected_positions].strftime('%Y-%m-%d'),
+        '売りロット数': short_lots[rejected_positions],
+        '買いロット数': long_lots[rejected_positions],
+        '理由': reasons[rejected_positions],
+    })
+
+    return SimulationResult(histories, final_states, accepted, rejected_orders)
+
+
+def run_with_trading(stock_info:si.StockInfo, targets:pd.DataFrame, lot_size:int=100, assets:float=0.0,
+                     allow_over_assets:bool=False) -> dict:
+    """
+    simulate と同じ注文を、CLIと同じく Trading で1件ずつ実行する
+    Args:
+        stock_info (StockInfo): トレード対象銘柄の情報
+        targets (pd.DataFrame): 注文の一覧（simulate と同じ形式）
+        lot_size (int, optional): targets に lot_size の列がない場合のロットサイズ. Defaults to 100.
+        assets (float, optional): トレード開始時の資産額. Defaults to 0.0.
+        allow_over_assets (bool, optional): 保有総額が総資産を超える注文を許可する場合はTrue. Defaults to False.
+    Returns:
+        dict: 注文方式 → トレード履歴
+    """
+    # Trading は注文ごとにトレード履歴を出力するので、一時フォルダに出力させる
+    with tempfile.TemporaryDirectory() as output_dir:
+        training_start_datetime = datetime.now().strftime('%Y%m%d%H%M%S')
+        tradings = {}
+        for mode in MODES:
+            trading = tr.Trading(stock_info, training_start_datetime, assets, mode, output_dir=output_dir)
+            trading.action_mode = trading.ACTION_MODE_WARNING if allow_over_assets else trading.ACTION_MODE_FORBIDDEN
+            trading.set_history_buffering(True)
+            tradings[mode] = trading
+
+        has_lot_size = 'lot_size' in targets.columns
+        for trading_date, row in zip(pd.DatetimeIndex(targets.index), targets.itertuples(index=False)):
+            if row.short_lot < 0 or row.long_lot < 0:
+                # CLIでは負数のロット数は入力できないので、simulate と同じく注文を行わない
+                continue
+            oe.execute_order(tradings[MODE_CLOSE], tradings[MODE_NEXT_OPEN], tradings[MODE_OPCL], stock_info,
+                             trading_date.to_pydatetime(), int(row.short_lot), int(row.long_lot),
+                             int(row.lot_size) if has_lot_size else lot_size, {'Close': -1, 'Open': -1})
+
+        histories = {}
+        for mode in MODES:
+            histories[mode] = tradings[mode].history_storage.to_dataframe()
+            tradings[mode].close()
+
+    return histories
+
+
+def verify_with_trading(stock_info:si.StockInfo, targets:pd.DataFrame, lot_size:int=100, assets:float=0.0,
+                        allow_over_assets:bool=False, rtol:float=1e-9) -> Tuple[bool, str]:
+    """
+    同じ注文を Trading で1件ずつ実行した結果（トレード履歴）と、simulate の結果が一致するかを検証する
+    Args:
+        stock_info (StockInfo): トレード対象銘柄の情報
+        targets (pd.DataFrame): 注文の一覧（simulate と同じ形式）
+        lot_size (int, optional): targets に lot_size の列がない場合のロットサイズ. Defaults to 100.
+        assets (float, optional): トレード開始時の資産額. Defaults to 0.0.
+        allow_over_assets (bool, optional): 保有総額が総資産を超える注文を許可する場合はTrue. Defaults to False.
+        rtol (float, optional): 数値を比較する際の相対誤差. Defaults to 1e-9.
+    Returns:
+        Tuple[bool, str]: 一致した場合はTrue, 一致しなかった場合の内容
+    """
+    result = simulate(stock_info, targets, lot_size, assets, allow_over_assets)
+    expected_histories = run_with_trading(stock_info, targets, lot_size, assets, allow_over_assets)
+
+    for mode in MODES:
+        expected = expected_histories[mode]
+        actual = result.histories[mode]
+        if len(expected) != len(actual):
+            return False, f"{mode}: 取引の件数が一致しません（Trading: {len(expected)}, 一括計算: {len(actual)}）"
+
+        for column in ths.HEADER[:-1]:
+            expected_values = expected[column].to_numpy()
+            actual_values = actual[column].to_numpy()
+            if column in _NUMERIC_COLUMNS:
+                is_equal = np.isclose(expected_values.astype(np.float64), actual_values, rtol=rtol, atol=1e-6)
+            else:
+                is_equal = expected_values.astype(str) == actual_values.astype(str)
+
+            if not is_equal.all():
+                row_number = int(np.argmin(is_equal))
+                return False, f"{mode}: {row_number}行目の{column}が一致しません" \
+                    + f"（Trading: {expected_values[row_number]}, 一括計算: {actual_values[row_number]}）"
+
+    return True, ''
+
+
+# _run_orders の結果の配列
+_RESULT_KEYS = ['assets', 'assets_before',
+                'short_number', 'short_order_number', 'short_total_amount', 'short_amount_before', 'short_profit',
+                'long_number', 'long_order_number', 'long_total_amount', 'long_amount_before', 'long_profit']
+
+# 成立する注文を順に実行した結果を、注文ごとの配列で計算する
+def _run_orders(prices:np.ndarray, short_numbers:np.ndarray, long_numbers:np.ndarray, state:dict) -> dict:
+    result = {'short_number': short_numbers, 'long_number': long_numbers}
+    result['short_order_number'], result['short_total_amount'], result['short_amount_before'], result['short_profit'] \
+        = _run_side(prices, short_numbers, state['short_number'], state['short_total_amount'], True)
+    result['long_order_number'], result['long_total_amount'], result['long_amount_before'], result['long_profit'] \
+        = _run_side(prices, long_numbers, state['long_number'], state['long_total_amount'], False)
+
+    result['assets'] = state['assets'] + np.cumsum(result['short_profit'] + result['long_profit'])
+    result['assets_before'] = np.concatenate(([state['assets']], result['assets'][:-1]))[:len(prices)]
+
+    # 総資産超過のチェック用に注文額も持っておく
+    result['short_order_amount'] = result['short_order_number'] * prices
+    result['long_order_amount'] = result['long_order_number'] * prices
+    return result
+
+# 空売り・買いの片方について、注文ごとの注文株数・保有総額（注文後・注文前）・損益を計算する
+# 増やす場合は 株数×株価 を加算し、減らす場合は平均単価を変えずに 残りの株数/元の株数 の比率で保有総額を減らす
+# （ShortTrading/LongTrading と同じ）。保有総額は 総額 = 比率 × 前回の総額 + 加算額 の線形漸化式になる
+def _run_side(prices:np.ndarray, numbers:np.ndarray, initial_number:int, initial_total_amount:float,
+              is_short:bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    previous_numbers = np.concatenate(([initial_number], numbers[:-1]))[:len(numbers)]
+    order_numbers = numbers - previous_numbers
+
+    ratios = np.where(order_numbers < 0, numbers / np.maximum(previous_numbers, 1), 1.0)
+    additions = np.where(order_numbers > 0, order_numbers * prices, 0.0)
+    total_amounts = _solve_linear_recurrence(ratios, additions, initial_total_amount)
+
+    previous_total_amounts = np.concatenate(([initial_total_amount], total_amounts[:-1]))[:len(numbers)]
+    average_prices = np.where(previous_numbers > 0, previous_total_amounts / np.maximum(previous_numbers, 1), 0.0)
+    if is_short:
+        profits = np.where(order_numbers < 0, (average_prices - prices) * -order_numbers, 0.0)
+    else:
+        profits = np.where(order_numbers < 0, (prices - average_prices) * -order_numbers, 0.0)
+
+    return order_numbers, total_amounts, previous_total_amounts, profits
+
+# x[i] = a[i] * x[i-1] + b[i] を、隣接する式の合成を倍々に広げる走査（log2(n)回の配列演算）で解く
+# 比率の積は0に近づいても割り算をしないので、長い区間でも桁あふれしない
+def _solve_linear_recurrence(a:np.ndarray, b:np.ndarray, x0:float) -> np.ndarray:
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    shift = 1
+    while shift < len(a):
+        b[shift:] = a[shift:] * b[:-shift] + b[shift:]
+        a[shift:] = a[shift:] * a[:-shift]
+        shift = shift * 2
+    return a * x0 + b
+
+# 注文ごとに総資産超過のチェック（AmountChecker.check_amount と同じ条件）を行い、成立しない注文をTrueにする
+def _check_amount(result:dict, allow_over_assets:bool) -> np.ndarray:
+    short_amounts = result['short_amount_before'] + result['short_order_amount']
+    long_amounts = result['long_amount_before'] + result['long_order_amount']
+    assets_before = result['assets_before']
+
+    rejected = short_amounts + long_amounts >= assets_before * amchkr.AmountChecker.MARGIN_TRADING_LIMIT_RATE
+    if not allow_over_assets:
+        rejected = rejected | (short_amounts > assets_before) | (long_amounts > assets_before)
+    return rejected
+
+# 最後の注文後の状態を取得する。注文がない場合は元の状態のまま
+def _get_last_state(result:dict, state:dict) -> dict:
+    if len(result['assets']) == 0:
+        return state
+
+    return {
+        'assets': float(result['assets'][-1]),
+        'short_number': int(result['short_number'][-1]),
+        'short_total_amount': float(result['short_total_amount'][-1]),
+        'long_number': int(result['long_number'][-1]),
+        'long_total_amount': float(result['long_total_amount'][-1]),
+    }
+
+# 取引が発生した注文を、Trading が出力するトレード履歴と同じ形式にする
+def _to_history(code:str, order_positions:np.ndarray, result:dict, days:np.ndarray, prices:np.ndarray,
+                lot_sizes:np.ndarray, short_lots:np.ndarray, long_lots:np.ndarray) -> pd.DataFrame:
+    short_numbers = result['short_number']
+    long_numbers = result['long_number']
+    is_filled = (result['short_order_number'] != 0) | (result['long_order_number'] != 0)
+
+    filled = order_positions[is_filled]
+    short_average_prices = np.where(short_numbers > 0, result['short_total_amount'] / np.maximum(short_numbers, 1), 0.0)
+    long_average_prices = np.where(long_numbers > 0, result['long_total_amount'] / np.maximum(long_numbers, 1), 0.0)
+
+    return pd.DataFrame({
+        '銘柄コード': code,
+        '取引日付': days[filled].astype('datetime64[D]').astype(str),
+        '株価': prices[filled],
+        'ロットサイズ': lot_sizes[filled],
+        '売りロット数': short_lots[filled],
+        '売り平均単価': short_average_prices[is_filled],
+        '売り損益': result['short_profit'][is_filled],
+        '買いロット数': long_lots[filled],
+        '買い平均単価': long_average_prices[is_filled],
+        '買い損益': result['long_profit'][is_filled],
+        '総資産': result['assets'][is_filled],
+        'メモ': np.nan,
+    }, columns=ths.HEADER)
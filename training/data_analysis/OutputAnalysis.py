@@ -6,7 +6,7 @@ def aggregate_csv(csv_path: Path, output_to_file: bool, line_number: int = -1) -
     """
     指定されたトレード履歴のCSVファイルに対して所定の規則で集計する。
     Args:
-        csv_path (Path): 集計対象のCSVファイル
+        csv_path (Path): 集計対象のCSVファイル（同じトレード履歴のバイナリファイルも可）
         output_to_file (bool): 集計結果をCSVファイルに出力するか。Trueの場合は出力する。
         line_number (int): 戻り値の文字列に含まれるサマリーの件数。ファイル出力には影響しない。マイナスの整数を指定した場合(デフォルトでもある)は全件表示になる。
     Returns:
@@ -16,11 +16,74 @@ def aggregate_csv(csv_path: Path, output_to_file: bool, line_number: int = -1) -
     if csv_path is None:
         return '対象ファイルが設定されていません。'
 
-    # csvファイルを読み込む
-    df = pd.read_csv(csv_path, encoding="shift-jis")
+    # csvファイルを読み込む（最新のバイナリファイルがある場合はそちらを読み込む）
+    df = read_trading_history(csv_path)
 
+    df_agg = summarize_trading_history(df)
+
+    return output_summary(df_agg, csv_path, output_to_file, line_number)
+
+def read_trading_history(csv_path: Path) -> pd.DataFrame:
+    """
+    トレード履歴を読み込む。最新のバイナリファイル（TradingHistoryBinary）がある場合はそちらを読み込む。
+    Args:
+        csv_path (Path): トレード履歴のCSVファイル（同じトレード履歴のバイナリファイルも可）
+    Returns:
+        pd.DataFrame: トレード履歴
+    """
+    try:
+        # TradingHistoryBinary は training フォルダのモジュールなので、training フォルダが sys.path にない場合はCSVファイルだけを読み込む
+        import TradingHistoryBinary as thb
+    except ImportError:
+        return pd.read_csv(csv_path, encoding="shift-jis")
+
+    return thb.read_trading_history(csv_path)
+
+def output_summary(df_agg: pd.DataFrame, csv_path: Path, output_to_file: bool, line_number: int = -1) -> str:
+    """
+    集計したサマリーを画面表示用の文字列にし、指定された場合はCSVファイルにも出力する。
+    Args:
+        df_agg (pd.DataFrame): サマリー（summarize_trading_history の戻り値と同じ形式）
+        csv_path (Path): 集計対象のトレード履歴のCSVファイル（出力先のファイル名に使う）
+        output_to_file (bool): 集計結果をCSVファイルに出力するか。Trueの場合は出力する。
+        line_number (int): 戻り値の文字列に含まれるサマリーの件数。ファイル出力には影響しない。マイナスの整数を指定した場合(デフォルトでもある)は全件表示になる。
+    Returns:
+        画面表示用の文字列
+    """
+    # CSVファイルに出力
+    if output_to_file:
+        df_agg = df_agg.copy()
+        df_agg["資産増額"] = df_agg["資産増額"].str.replace("¥", "")
+        df_agg.to_csv(get_summary_path(csv_path), index=False, encoding="shift-jis")
+
+    dataframe_for_show = df_agg
+
+    # 全件表示するかを判断する
+    if line_number >= 0:
+        dataframe_for_show = dataframe_for_show.tail(line_number)
+
+    return dataframe_for_show.to_string()
+
+def get_summary_path(csv_path: Path) -> Path:
+    """
+    サマリーを出力するCSVファイルのパスを取得する。
+    Args:
+        csv_path (Path): 集計対象のトレード履歴のCSVファイル（またはバイナリファイル）
+    Returns:
+        Path: トレード履歴のファイル名の _history_ を _summary_ にしたCSVファイル
+    """
+    return Path(str(csv_path).replace('_history_', '_summary_')).with_suffix('.csv')
+
+def summarize_trading_history(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    トレード履歴を所定の規則で集計する（銘柄コード・ロットサイズが変わるか、取引日付が前に戻るところで区切る）。
+    Args:
+        df (pd.DataFrame): トレード履歴（トレード履歴のCSVファイルと同じ列）
+    Returns:
+        pd.DataFrame: 区切りごとのサマリー（銘柄コード, 開始日, 終了日, ロットサイズ, 合計最大ロット数, 資産増額）
+    """
     # 銘柄コードと取引日付と買いロット数と売りロット数と総資産の列だけを抽出する
-    df = df[["銘柄コード", "取引日付", "ロットサイズ", "売りロット数", "買いロット数", "総資産"]]
+    df = df[["銘柄コード", "取引日付", "ロットサイズ", "売りロット数", "買いロット数", "総資産"]].copy()
     
     # 取引日付をdatetime型に変換する
     df["取引日付"] = pd.to_datetime(df["取引日付"])
@@ -33,18 +96,16 @@ def aggregate_csv(csv_path: Path, output_to_file: bool, line_number: int = -1) -
     # グループ変更があったときにグループ番号を増やす列を追加する
     df["グループ番号"] = df["グループ変更"].cumsum()
     
-    # グループ番号ごとに最初と最後の取引日付と買いロット数と売りロット数と総資産を集約する
+    # グループ番号ごとに最初と最後の取引日付と総資産を集約する
     df_agg = df.groupby("グループ番号").agg({
         "銘柄コード": "first", 
         "取引日付": ["first", "last"], 
         "ロットサイズ": "first",
-        "買いロット数": list, 
-        "売りロット数": list, 
         "総資産": ["first", "last"]
     })
 
     # 列名を整理する
-    df_agg.columns = ["銘柄コード", "開始日", "終了日", "ロットサイズ", "買いロット数リスト", "売りロット数リスト", "最初の総資産", "最後の総資産"]
+    df_agg.columns = ["銘柄コード", "開始日", "終了日", "ロットサイズ", "最初の総資産", "最後の総資産"]
     df_agg = df_agg.reset_index(drop=True)
 
     # 行ごとに買いロット数と売りロット数との合計を計算する
@@ -58,18 +119,17 @@ def aggregate_csv(csv_path: Path, output_to_file: bool, line_number: int = -1) -
 
     # 資産増額を計算する
     df_agg["資産増額"] = df_agg["最後の総資産"] - df_agg["最初の総資産"]
-    df_agg["資産増額"] = df_agg["資産増額"].map(lambda x: f"¥{int(x):,}" if x >= 0 else f"-¥{abs(int(x)):,}")
-    df_agg = df_agg.drop(["買いロット数リスト", "売りロット数リスト", "最初の総資産", "最後の総資産"], axis=1)
-
-    # CSVファイルに出力
-    if output_to_file:
-        df_agg["資産増額"] = df_agg["資産増額"].str.replace("¥", "")
-        df_agg.to_csv(str(csv_path).replace('_history_', '_summary_'), index=False, encoding="shift-jis")
-
-    dataframe_for_show = df_agg
+    df_agg["資産増額"] = df_agg["資産増額"].map(format_asset_increase)
+    df_agg = df_agg.drop(["最初の総資産", "最後の総資産"], axis=1)
 
-    # 全件表示するかを判断する
-    if line_number >= 0:
-        dataframe_for_show = dataframe_for_show.tail(line_number)
+    return df_agg
 
-    return dataframe_for_show.to_string()
+def format_asset_increase(amount: float) -> str:
+    """
+    サマリーの資産増額を表示用の文字列（¥を付けた円単位）にする。
+    Args:
+        amount (float): 資産増額
+    Returns:
+        表示用の文字列
+    """
+    return f"¥{int(amount):,}" if amount >= 0 else f"-¥{abs(int(amount)):,}"
@@ -0,0 +1,256 @@
+import argparse
+import datetime as dt
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Tuple
+
+import pandas as pd
+
+# 注文方式と、レポートの列名に付ける表示名
+MODE_NAMES = {'close': '大引け', 'open': '寄付', 'opcl': '組合せ'}
+
+class SessionReportCache:
+
+    # キャッシュファイル
+    cache_path:Path
+
+    # キャッシュの形式のバージョン。集計内容を変えた場合は上げて、古いキャッシュを使わないようにする
+    CACHE_FORMAT_VERSION = 1
+
+    CACHE_FILE_NAME = 'session_report_cache.json'
+
+    def __init__(self, cache_path:Path) -> None:
+        """
+        トレード履歴のcsvファイルごとの集計結果のキャッシュ。
+        csvファイルのサイズ・更新時刻に紐付けて、一致しない場合（ファイルが更新された場合）は使わない。
+        Args:
+            cache_path (Path): キャッシュファイル
+        Returns:
+            None
+        """
+        self.cache_path = Path(cache_path)
+
+    def load(self) -> dict:
+        """
+        キャッシュを読み込む
+        Returns:
+            dict: csvファイル名 → 集計結果。キャッシュがない、または読み込めない場合は空
+        """
+        if not self.cache_path.is_file():
+            return {}
+
+        try:
+            with self.cache_path.open('r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if cache.get('version') != self.CACHE_FORMAT_VERSION:
+            return {}
+
+        return cache.get('files', {})
+
+    def save(self, entries:dict) -> None:
+        """
+        キャッシュを書き込む。書き込み途中のファイルを読まれないように、一時ファイルに書いてから置き換える
+        Args:
+            entries (dict): csvファイル名 → 集計結果
+        Returns:
+            None
+        """
+        tmp_path = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        try:
+            with tmp_path.open('w', encoding='utf-8') as f:
+                json.dump({'version': self.CACHE_FORMAT_VERSION, 'files': entries}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            # キャッシュがなくても次回に集計し直すだけなので、メッセージを表示するだけにする
+            print(f"集計結果のキャッシュの保存に失敗しました: {e}")
+
+    @staticmethod
+    def get_valid_entry(entries:dict, csv_path:Path) -> dict:
+        """
+        csvファイルに対応した集計結果を、csvファイルが更新されていない場合だけ取得する
+        Args:
+            entries (dict): load() で読み込んだキャッシュ
+            csv_path (Path): トレード履歴のcsvファイル
+        Returns:
+            dict: 集計結果。記録がない、または古い場合は None
+        """
+        entry = entries.get(Path(csv_path).name)
+        if entry is None:
+            return None
+
+        stat = os.stat(csv_path)
+        if entry.get('size') != stat.st_size or entry.get('mtime_ns') != stat.st_mtime_ns:
+            return None
+
+        return entry
+
+
+def analyze_history_file(csv_path:str) -> dict:
+    """
+    トレード履歴のcsvファイル1つを集計する（プロセスプールのワーカーで実行する）
+    Args:
+        csv_path (str): トレード履歴のcsvファイル
+    Returns:
+        dict: 集計結果（size, mtime_ns, orders, first_date, last_date, initial_assets, final_assets, max_total_lot, codes）。
+              codes は 銘柄コード → 銘柄ごとの集計結果（orders, profit, max_total_lot, first_date, last_date）
+    """
+    stat = os.stat(csv_path)
+    entry = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'orders': 0, 'codes': {}}
+
+    df = pd.read_csv(csv_path, encoding='shift-jis',
+                     usecols=['銘柄コード', '取引日付', '売りロット数', '売り損益', '買いロット数', '買い損益', '総資産'])
+    if len(df) == 0:
+        return entry
+
+    df['合計ロット数'] = df['売りロット数'] + df['買いロット数']
+    df['損益'] = df['売り損益'] + df['買い損益']
+
+    entry['orders'] = len(df)
+    entry['first_date'] = str(df['取引日付'].iloc[0])
+    entry['last_date'] = str(df['取引日付'].iloc[-1])
+    # トレード開始時の資産は履歴にないので、最初の取引後の総資産からその取引の損益を引いて求める
+    entry['initial_assets'] = float(df['総資産'].iloc[0] - df['損益'].iloc[0])
+    entry['final_assets'] = float(df['総資産'].iloc[-1])
+    entry['max_total_lot'] = int(df['合計ロット数'].max())
+
+    df_code = df.groupby('銘柄コード', sort=False).agg(
+        orders=('取引日付', 'size'), profit=('損益', 'sum'), max_total_lot=('合計ロット数', 'max'),
+        first_date=('取引日付', 'first'), last_date=('取引日付', 'last'))
+    for code, row in df_code.iterrows():
+        entry['codes'][str(code)] = {'orders': int(row['orders']), 'profit': float(row['profit']),
+                                     'max_total_lot': int(row['max_total_lot']),
+                                     'first_date': str(row['first_date']), 'last_date': str(row['last_date'])}
+
+    return entry
+
+def build_report(output_dir:str='output', max_workers:int=None) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+    """
+    output フォルダにある全トレード履歴のcsvファイルを集計し、セッションごと・銘柄ごとのレポートを作成する。
+    前回から更新されていないファイルはキャッシュした集計結果を使い、更新されたファイルだけを並列に読み込む
+    Args:
+        output_dir (str, optional): トレード履歴のフォルダ. Defaults to 'output'.
+        max_workers (int, optional): プロセス数. Defaults to None(CPUのコア数).
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame, int]: セッションごとのレポート, 銘柄ごとのレポート, 読み込んだファイル数
+    """
+    # ファイル名は　trading_history_[銘柄コード]_[株データの開始日]_[トレード練習実施開始日時分秒]_[close/open/opcl].csv　の前提
+    csv_files = []
+    for file in sorted(Path(output_dir).glob('trading_history_*.csv')):
+        file_name_objects = file.stem.split('_')
+        if len(file_name_objects) == 6 and file_name_objects[5] in MODE_NAMES:
+            csv_files.append(file)
+
+    cache = SessionReportCache(Path(output_dir).joinpath(SessionReportCache.CACHE_FILE_NAME))
+    cache_entries = cache.load()
+
+    entries = {}
+    stale_files = []
+    for file in csv_files:
+        entry = SessionReportCache.get_valid_entry(cache_entries, file)
+        if entry is None:
+            stale_files.append(file)
+        else:
+            entries[file.name] = entry
+
+    if len(stale_files) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for file, entry in zip(stale_files, executor.map(analyze_history_file, [str(file) for file in stale_files])):
+                entries[file.name] = entry
+    elif len(stale_files) == 1:
+        # 1ファイルだけの場合はプロセスを起動するより直接読み込んだ方が速い
+        entries[stale_files[0].name] = analyze_history_file(str(stale_files[0]))
+
+    # 削除されたファイルの集計結果はキャッシュから除く
+    if len(stale_files) > 0 or len(cache_entries) != len(entries):
+        cache.save(entries)
+
+    return _build_session_report(csv_files, entries), _build_symbol_report(csv_files, entries), len(stale_files)
+
+def _build_session_report(csv_files:list, entries:dict) -> pd.DataFrame:
+    """
+    セッション（同じ銘柄コード・開始日・練習開始日時の close/open/opcl のファイル）ごとのレポートを作成する
+    """
+    sessions = {}
+    for file in csv_files:
+        file_name_objects = file.stem.split('_')
+        key = (file_name_objects[2], file_name_objects[3], file_name_objects[4])
+        session = sessions.setdefault(key, {'銘柄コード': key[0], '開始日': key[1], '練習開始日時': key[2],
+                                            '最終取引日': None, '取引数': 0, '合計最大ロット数': 0})
+
+        entry = entries[file.name]
+        mode_name = MODE_NAMES[file_name_objects[5]]
+        if entry['orders'] == 0:
+            continue
+
+        session['最終取引日'] = max(session['最終取引日'] or '', entry['last_date'])
+        session['取引数'] = max(session['取引数'], entry['orders'])
+        session['合計最大ロット数'] = max(session['合計最大ロット数'], entry['max_total_lot'])
+        session['最終総資産(' + mode_name + ')'] = entry['final_assets']
+        session['資産増額(' + mode_name + ')'] = entry['final_assets'] - entry['initial_assets']
+
+    columns = ['銘柄コード', '開始日', '練習開始日時', '最終取引日', '取引数', '合計最大ロット数'] \
+        + ['最終総資産(' + name + ')' for name in MODE_NAMES.values()] + ['資産増額(' + name + ')' for name in MODE_NAMES.values()]
+    return pd.DataFrame(list(sessions.values()), columns=columns)
+
+def _build_symbol_report(csv_files:list, entries:dict) -> pd.DataFrame:
+    """
+    銘柄ごと（銘柄可変モードのセッションは取引した銘柄ごと）に全セッションを合算したレポートを作成する
+    """
+    symbols = {}
+    for file in csv_files:
+        file_name_objects = file.stem.split('_')
+        session_key = file_name_objects[2] + file_name_objects[3] + file_name_objects[4]
+        mode_name = MODE_NAMES[file_name_objects[5]]
+
+        for code, code_entry in entries[file.name]['codes'].items():
+            symbol = symbols.setdefault(code, {'銘柄コード': code, 'sessions': {}, '最初の取引日': code_entry['first_date'],
+                                               '最終取引日': code_entry['last_date'], '合計最大ロット数': 0})
+            # 取引数はセッションごとに注文方式の最大の件数を数える（同じ注文を3方式で行うため）
+            symbol['sessions'][session_key] = max(symbol['sessions'].get(session_key, 0), code_entry['orders'])
+            symbol['最初の取引日'] = min(symbol['最初の取引日'], code_entry['first_date'])
+            symbol['最終取引日'] = max(symbol['最終取引日'], code_entry['last_date'])
+            symbol['合計最大ロット数'] = max(symbol['合計最大ロット数'], code_entry['max_total_lot'])
+            column = '資産増額(' + mode_name + ')'
+            symbol[column] = symbol.get(column, 0.0) + code_entry['profit']
+
+    for symbol in symbols.values():
+        sessions = symbol.pop('sessions')
+        symbol['セッション数'] = len(sessions)
+        symbol['取引数'] = sum(sessions.values())
+
+    columns = ['銘柄コード', 'セッション数', '取引数', '最初の取引日', '最終取引日', '合計最大ロット数'] \
+        + ['資産増額(' + name + ')' for name in MODE_NAMES.values()]
+    return pd.DataFrame(sorted(symbols.values(), key=lambda symbol: symbol['銘柄コード']), columns=columns)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="output フォルダの全トレード履歴を集計し、セッションごと・銘柄ごとのレポートを表示します")
+    parser.add_argument('-d', '--dir', help='トレード履歴のフォルダ。デフォルトはoutput')
+    parser.add_argument('-j', '--jobs', help='並列に読み込むプロセス数。デフォルトはCPUのコア数')
+    parser.add_argument('-f', '--file', action='store_true', help='レポートをcsvファイル（session_report_sessions_<実行日時>.csv・session_report_symbols_<実行日時>.csv）にも出力する')
+    args = parser.parse_args()
+
+    output_dir = 'output' if args.dir == None else args.dir
+    started_at = dt.datetime.now()
+    session_df, symbol_df, parsed_count = build_report(output_dir, None if args.jobs == None else int(args.jobs))
+
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', None)
+    pd.set_option('display.float_format', lambda x: f'{x:,.1f}')
+    print('■ セッションごと')
+    print(session_df.to_string())
+    print()
+    print('■ 銘柄ごと')
+    print(symbol_df.to_string())
+    print()
+    print(f"{len(session_df)}セッション（読み込んだファイル：{parsed_count}件、処理時間：{(dt.datetime.now() - started_at).total_seconds():.1f}秒）")
+
+    if args.file:
+        datetime_str = started_at.strftime('%Y%m%d%H%M%S')
+        session_df.to_csv(Path(output_dir).joinpath('session_report_sessions_' + datetime_str + '.csv'), index=False, encoding='shift-jis')
+        symbol_df.to_csv(Path(output_dir).joinpath('session_report_symbols_' + datetime_str + '.csv'), index=False, encoding='shift-jis')
+        print('レポートを出力しました: ' + str(Path(output_dir).joinpath('session_report_*_' + datetime_str + '.csv')))
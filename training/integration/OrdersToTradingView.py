@@ -1,3 +1,6 @@
+import os
+from pathlib import Path
+
 import pandas as pd
 
 def extract_trading_history(file_name: str, stock_code: str, start_date: str, end_date: str) -> str:
@@ -6,7 +9,7 @@ def extract_trading_history(file_name: str, stock_code: str, start_date: str, en
     取引日付:売りロット数-買いロット数という形式の文字列を生成します。
 
     Args:
-        file_name (str): トレード履歴データを含むCSVファイルの名前。
+        file_name (str): トレード履歴データを含むCSVファイル（またはバイナリファイル）の名前。
         stock_code (str): 指定する銘柄コード。
         start_date (str): 期間の開始日（YYYYMMDD形式）。
         end_date (str): 期間の終了日（YYYYMMDD形式）。
@@ -15,32 +18,96 @@ def extract_trading_history(file_name: str, stock_code: str, start_date: str, en
         str: 取引日付:売りロット数-買いロット数形式の文字列。データがない場合は"該当するデータがありません"というメッセージ。
     """
     try:
-        # CSVファイルを読み込む（Shift-JISエンコーディングを使用）
-        df = pd.read_csv(file_name, encoding='shift-jis')
-
-        # 取引日付をdatetime型に変換
-        df['取引日付'] = pd.to_datetime(df['取引日付'])
+        # CSVファイルを読み込む（Shift-JISエンコーディングを使用。最新のバイナリファイルがある場合はそちらを読み込む）
+        df = read_trading_history(file_name, ['銘柄コード', '取引日付', '売りロット数', '買いロット数'])
 
-        # 引数の日付をyyyy-mm-dd形式に変換
-        start_date = pd.to_datetime(start_date, format='%Y%m%d')
-        end_date = pd.to_datetime(end_date, format='%Y%m%d')
+        # 指定した銘柄コードのデータをフィルタリング
+        df = df[df['銘柄コード'] == stock_code]
 
-        # 指定した銘柄コードおよび期間のデータをフィルタリング
-        filtered_df = df[(df['銘柄コード'] == stock_code) & 
-                         (df['取引日付'] >= start_date) & 
-                         (df['取引日付'] <= end_date)]
+        result_str = build_trading_history_strings(df, start_date, end_date).get(stock_code)
 
         # データが存在しない場合の処理
-        if filtered_df.empty:
+        if result_str is None:
             return "該当するデータがありません"
 
-        # 必要な列（取引日付、売りロット数、買いロット数）を抽出
-        filtered_df = filtered_df[['取引日付', '売りロット数', '買いロット数']]
-
-        # 取引日付、売りロット数、買いロット数を順番に抽出し、文字列を生成
-        result_str = ','.join([f"{row['取引日付'].strftime('%Y-%m-%d')}:{row['売りロット数']}-{row['買いロット数']}" 
-                               for index, row in filtered_df.iterrows()])
-
         return result_str
     except Exception as e:
         return str(e)
+
+def read_trading_history(file_name: str, columns: list) -> pd.DataFrame:
+    """
+    トレード履歴の指定した列を読み込みます。最新のバイナリファイル（TradingHistoryBinary）がある場合はそちらを読み込みます。
+
+    Args:
+        file_name (str): トレード履歴データを含むCSVファイル（またはバイナリファイル）の名前。
+        columns (list): 読み込む列。
+
+    Returns:
+        pd.DataFrame: トレード履歴。
+    """
+    try:
+        # TradingHistoryBinary は training フォルダのモジュールなので、training フォルダが sys.path にない場合はCSVファイルだけを読み込む
+        import TradingHistoryBinary as thb
+    except ImportError:
+        return pd.read_csv(file_name, encoding='shift-jis', usecols=columns)
+
+    return thb.read_trading_history(file_name, columns)
+
+def build_trading_history_strings(df: pd.DataFrame, start_date: str = None, end_date: str = None) -> dict:
+    """
+    トレード履歴を銘柄コードごとにまとめて、取引日付:売りロット数-買いロット数という形式の文字列を生成します。
+    銘柄ごとに履歴を絞り込み直さずに、全銘柄分を1回の処理で生成します。
+
+    Args:
+        df (pd.DataFrame): トレード履歴（銘柄コード、取引日付、売りロット数、買いロット数の列が必要）。
+        start_date (str, optional): 期間の開始日（YYYYMMDD形式）。省略した場合は制限なし。
+        end_date (str, optional): 期間の終了日（YYYYMMDD形式）。省略した場合は制限なし。
+
+    Returns:
+        dict: 銘柄コード → 取引日付:売りロット数-買いロット数形式の文字列（履歴に最初に現れた順）。該当する取引がない銘柄は含まない。
+    """
+    # 取引日付をdatetime型に変換
+    trading_dates = pd.to_datetime(df['取引日付'])
+
+    # 指定した期間のデータをフィルタリング
+    is_in_range = pd.Series(True, index=df.index)
+    if start_date is not None:
+        is_in_range &= trading_dates >= pd.to_datetime(start_date, format='%Y%m%d')
+    if end_date is not None:
+        is_in_range &= trading_dates <= pd.to_datetime(end_date, format='%Y%m%d')
+
+    df = df[is_in_range]
+    if df.empty:
+        return {}
+
+    # 取引日付、売りロット数、買いロット数の文字列を列ごとにまとめて生成し、銘柄コードごとに連結する
+    orders = trading_dates[is_in_range].dt.strftime('%Y-%m-%d') + ':' + df['売りロット数'].astype(str) \
+        + '-' + df['買いロット数'].astype(str)
+    return orders.groupby(df['銘柄コード'], sort=False).agg(','.join).to_dict()
+
+def export_trading_histories(file_name: str, output_dir: str, start_date: str = None, end_date: str = None) -> dict:
+    """
+    CSVファイルのトレード履歴を1回だけ読み込み、銘柄コードごとのTradingView表示用の文字列をファイル（<銘柄コード>.txt）に出力します。
+    銘柄可変モードのように1つの履歴に複数銘柄の取引がある場合に使います。
+
+    Args:
+        file_name (str): トレード履歴データを含むCSVファイル（またはバイナリファイル）の名前。
+        output_dir (str): 出力先のフォルダ。存在しない場合は作成します。
+        start_date (str, optional): 期間の開始日（YYYYMMDD形式）。省略した場合は制限なし。
+        end_date (str, optional): 期間の終了日（YYYYMMDD形式）。省略した場合は制限なし。
+
+    Returns:
+        dict: 銘柄コード → 出力したファイルのパス
+    """
+    df = read_trading_history(file_name, ['銘柄コード', '取引日付', '売りロット数', '買いロット数'])
+    orders_by_code = build_trading_history_strings(df, start_date, end_date)
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_files = {}
+    for stock_code, orders_str in orders_by_code.items():
+        output_file = Path(output_dir).joinpath(f"{stock_code}.txt")
+        with output_file.open('w', encoding='utf-8') as f:
+            f.write(orders_str)
+        output_files[stock_code] = output_file
+
+    return output_files
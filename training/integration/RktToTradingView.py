@@ -1,10 +1,20 @@
 import os
 import re
+import numpy as np
 import pandas as pd
-from collections import defaultdict
-from pandas.tseries.offsets import BDay
 import argparse
 
+# 1回に読み込むCSVファイルの行数（ファイル全体をメモリに載せずに順番に集計する）
+CHUNK_SIZE = 100000
+
+# 建玉を増減させる売買区分 → (売建の増減, 買建の増減)
+_POSITION_CHANGES = {
+    "売建": (1, 0),
+    "買建": (0, 1),
+    "買埋": (-1, 0),
+    "売埋": (0, -1),
+}
+
 def _get_target_files(base_folder, start_date, end_date):
     """
     指定された期間に該当するファイルを `input` フォルダから取得する。
@@ -13,11 +23,11 @@ def _get_target_files(base_folder, start_date, end_date):
     input_folder = os.path.join(base_folder, "input")
     files = os.listdir(input_folder)
     target_files = []
-    
+
     # 文字列の日付を `Timestamp` に変換
     start_date = pd.to_datetime(start_date)
     end_date = pd.to_datetime(end_date)
-    
+
     for file in files:
         # ファイル名のフォーマットを正規表現でチェック
         match = re.match(r"trading_history_rkt_(\d{6})_(\d{6})\.csv", file)
@@ -27,87 +37,176 @@ def _get_target_files(base_folder, start_date, end_date):
             # 指定した期間にかかるファイルを選択
             if file_start <= end_date and file_end >= start_date:
                 target_files.append(os.path.join(input_folder, file))
-    
+
     return sorted(target_files)
 
-def process_trade_history(target_code, start_date, end_date):
+def _get_base_folder():
+    """
+    実行スクリプトの場所からベースフォルダを推定する。
+    """
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+def _read_position_changes(file_paths, start_date, end_date, target_codes=None, chunk_size=CHUNK_SIZE):
+    """
+    対象のファイルを分割して読み込み、銘柄コード・日付ごとの建玉の増減を集計する。
+
+    Args:
+        file_paths (list): 対象のファイルのリスト。
+        start_date (str): 集計する開始日 (YYYY-MM-DD 形式)。
+        end_date (str): 集計する終了日 (YYYY-MM-DD 形式)。
+        target_codes (list, optional): 対象の銘柄コード（文字列に変換して比較する）。None の場合は全銘柄。
+        chunk_size (int, optional): 1回に読み込む行数。
+
+    Returns:
+        pd.DataFrame: (コード, 日付) をインデックスとした、売建・買建の増減。
+    """
+    start_day = np.datetime64(start_date, "D")
+    end_day = np.datetime64(end_date, "D")
+
+    if target_codes is not None:
+        target_codes = [str(code) for code in target_codes]
+
+    changes = []
+    for file_path in file_paths:
+        # CSVファイルをUTF-8エンコーディングで、必要な列だけ分割して読み込む
+        # 銘柄コードは文字列として読み込む（英字を含むコード（130Aなど）があると、分割ごとに型が変わり同じ銘柄が別のキーになるため）
+        for df in pd.read_csv(file_path, encoding="utf-8", usecols=["発注/受注日時", "コード", "売買", "約定数量(株/口)"],
+                              dtype={"コード": str}, chunksize=chunk_size):
+            # 建玉が増減しない売買と、指定されていない銘柄コードを除く
+            df = df[df["売買"].isin(_POSITION_CHANGES.keys())]
+            if target_codes is not None:
+                df = df[df["コード"].isin(target_codes)]
+            if df.empty:
+                continue
+
+            # 0:00～9:00 の注文は前営業日、土日の注文も前営業日に変更
+            order_datetimes = pd.to_datetime(df["発注/受注日時"])
+            order_days = order_datetimes.to_numpy().astype("datetime64[D]")
+            is_shifted = ((order_datetimes.dt.hour < 9) | (order_datetimes.dt.weekday >= 5)).to_numpy()
+            days = np.where(is_shifted, np.busday_offset(order_days, -1, roll="forward"), order_days)
+
+            # 指定された期間でフィルタリング
+            is_in_range = (days >= start_day) & (days <= end_day)
+            df = df[is_in_range]
+            if df.empty:
+                continue
+
+            quantities = df["約定数量(株/口)"].astype("int64").to_numpy()
+            sell_signs = df["売買"].map({k: v[0] for k, v in _POSITION_CHANGES.items()}).to_numpy()
+            buy_signs = df["売買"].map({k: v[1] for k, v in _POSITION_CHANGES.items()}).to_numpy()
+
+            # 分割した範囲ごとに日単位まで集計しておき、全体の行数を持たないようにする
+            chunk_changes = pd.DataFrame({
+                "コード": df["コード"].to_numpy(),
+                "日付": days[is_in_range],
+                "売建": sell_signs * quantities,
+                "買建": buy_signs * quantities,
+            }).groupby(["コード", "日付"]).sum()
+            changes.append(chunk_changes)
+
+    if not changes:
+        return pd.DataFrame(columns=["売建", "買建"], index=pd.MultiIndex.from_tuples([], names=["コード", "日付"]))
+
+    # ファイル・分割の境目をまたぐ同じ日の増減を合算する
+    return pd.concat(changes).groupby(level=["コード", "日付"]).sum()
+
+def _build_position_strings(changes):
+    """
+    銘柄コード・日付ごとの建玉の増減から、銘柄コードごとの建玉履歴の文字列を作成する。
+
+    Args:
+        changes (pd.DataFrame): _read_position_changes の結果。
+
+    Returns:
+        dict: 銘柄コード → 日付ごとの建玉履歴を表す文字列。
+    """
+    if changes.empty:
+        return {}
+
+    # 銘柄コードごとの累積で、その日の終わりの建玉数を求める
+    changes = changes.sort_index()
+    totals = changes.groupby(level="コード").cumsum()
+
+    dates = np.datetime_as_string(totals.index.get_level_values("日付").to_numpy().astype("datetime64[D]"))
+    positions = pd.Series(dates, index=totals.index) + ":" + totals["売建"].astype(str) + "-" + totals["買建"].astype(str)
+    return positions.groupby(level="コード", sort=False).agg(",".join).to_dict()
+
+def process_trade_history(target_code, start_date, end_date, base_folder=None):
     """
     指定された銘柄コード・期間に対して、対象のファイルから建玉履歴を集計。
-    
+
     Args:
-        target_code (int): フィルタリング対象の銘柄コード。
+        target_code (int or str): フィルタリング対象の銘柄コード。
         start_date (str): データを取得する開始日 (YYYYMMDD 形式)。
         end_date (str): データを取得する終了日 (YYYYMMDD 形式)。
-    
+        base_folder (str, optional): `input` フォルダがあるフォルダ。None の場合は実行スクリプトの場所から推定。
+
     Returns:
         str: 日付ごとの建玉履歴を表す文字列。
     """
     if target_code is None:
         raise ValueError("target_codeは必須です。")
-    
-    # 実行スクリプトの場所からベースフォルダを推定
-    base_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    
+
     # 日付フォーマットを変換
     start_date = pd.to_datetime(start_date, format="%Y%m%d").strftime("%Y-%m-%d")
     end_date = pd.to_datetime(end_date, format="%Y%m%d").strftime("%Y-%m-%d")
-    
+
     # 対象のファイルリストを取得
-    file_paths = _get_target_files(base_folder, start_date, end_date)
-    
+    file_paths = _get_target_files(_get_base_folder() if base_folder is None else base_folder, start_date, end_date)
+
     if not file_paths:
         return "指定された期間のデータが見つかりませんでした。"
-    
-    position = defaultdict(lambda: {"売建": 0, "買建": 0})
-    
-    for file_path in file_paths:
-        # CSVファイルをUTF-8エンコーディングで読み込む
-        df = pd.read_csv(file_path, encoding="utf-8")
-        df["発注/受注日時"] = pd.to_datetime(df["発注/受注日時"])
-        
-        # 0:00～9:00 の注文は前営業日、土日の注文も前営業日に変更
-        df["日付"] = df["発注/受注日時"].apply(
-            lambda x: (x - BDay(1)).strftime("%Y-%m-%d") if x.hour < 9 or x.weekday() >= 5 else x.strftime("%Y-%m-%d")
-        )
-        
-        # 指定された銘柄コードでフィルタリング
-        df = df[df["コード"] == target_code]
-        
-        # 指定された期間でフィルタリング
-        df = df[(df["日付"] >= start_date) & (df["日付"] <= end_date)]
-        
-        # 日ごとの建玉集計
-        for _, row in df.iterrows():
-            date = row["日付"]
-            qty = int(row["約定数量(株/口)"])
-            if row["売買"] == "売建":
-                position[date]["売建"] += qty
-            elif row["売買"] == "買建":
-                position[date]["買建"] += qty
-            elif row["売買"] == "買埋":
-                position[date]["売建"] -= qty
-            elif row["売買"] == "売埋":
-                position[date]["買建"] -= qty
-    
-    # 日付順に並べて建玉履歴を作成
-    sorted_dates = sorted(position.keys())
-    sell_total, buy_total = 0, 0
-    result = []
-    for date in sorted_dates:
-        sell_total += position[date]["売建"]
-        buy_total += position[date]["買建"]
-        result.append(f"{date}:{sell_total}-{buy_total}")
-    
-    return ",".join(result)
+
+    target_code = str(target_code)
+    changes = _read_position_changes(file_paths, start_date, end_date, target_codes=[target_code])
+    return _build_position_strings(changes).get(target_code, "")
+
+def process_all_trade_histories(start_date, end_date, chunk_size=CHUNK_SIZE, base_folder=None):
+    """
+    指定された期間に対して、対象のファイルを1回だけ読み込み、全銘柄の建玉履歴をまとめて集計。
+
+    Args:
+        start_date (str): データを取得する開始日 (YYYYMMDD 形式)。
+        end_date (str): データを取得する終了日 (YYYYMMDD 形式)。
+        chunk_size (int, optional): 1回に読み込む行数。
+        base_folder (str, optional): `input` フォルダがあるフォルダ。None の場合は実行スクリプトの場所から推定。
+
+    Returns:
+        dict: 銘柄コード（文字列） → 日付ごとの建玉履歴を表す文字列（銘柄コード順）。対象のファイルがない場合は空。
+    """
+    # 日付フォーマットを変換
+    start_date = pd.to_datetime(start_date, format="%Y%m%d").strftime("%Y-%m-%d")
+    end_date = pd.to_datetime(end_date, format="%Y%m%d").strftime("%Y-%m-%d")
+
+    # 対象のファイルリストを取得
+    file_paths = _get_target_files(_get_base_folder() if base_folder is None else base_folder, start_date, end_date)
+
+    changes = _read_position_changes(file_paths, start_date, end_date, chunk_size=chunk_size)
+    return _build_position_strings(changes)
 
 # 動作確認用のコード
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="指定した銘柄コードと期間に基づく建玉履歴を処理します")
-    parser.add_argument("-c", "--code", type=int, required=True, help="銘柄コード")
+    parser.add_argument("-c", "--code", type=str, help="銘柄コード。省略した場合は全銘柄")
     parser.add_argument("-s", "--start_date", type=str, required=True, help="開始日 (YYYYMMDD)")
     parser.add_argument("-e", "--end_date", type=str, required=True, help="終了日 (YYYYMMDD)")
+    parser.add_argument("-o", "--output_dir", type=str, help="全銘柄の場合に、銘柄ごとのファイル（<銘柄コード>.txt）を出力するフォルダ")
     args = parser.parse_args()
-    
+
     # データ処理を実行し、結果を出力
-    output = process_trade_history(args.target_code, args.start_date, args.end_date)
-    print(output)
+    if args.code is not None:
+        output = process_trade_history(args.code, args.start_date, args.end_date)
+        print(output)
+    else:
+        outputs = process_all_trade_histories(args.start_date, args.end_date)
+        if not outputs:
+            print("指定された期間のデータが見つかりませんでした。")
+        for code, output in outputs.items():
+            if args.output_dir is None:
+                print(f"{code}: {output}")
+            else:
+                os.makedirs(args.output_dir, exist_ok=True)
+                with open(os.path.join(args.output_dir, f"{code}.txt"), "w", encoding="utf-8") as f:
+                    f.write(output)
+        if outputs and args.output_dir is not None:
+            print(f"{len(outputs)}銘柄の建玉履歴を出力しました: {args.output_dir}")